@@ -3,18 +3,58 @@ from __future__ import annotations
 import os
 from functools import lru_cache
 from pathlib import Path
+from typing import Any
 
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-# Load .env if present
-load_dotenv()
+
+# Значения читаются из окружения при создании Settings, а не при импорте модуля:
+# .env загружается один раз в get_settings().
+def env(name: str, default: str = "") -> Any:
+    return Field(default_factory=lambda: os.getenv(name, default))
+
+
+def env_bool(name: str, default: bool = False) -> Any:
+    return Field(default_factory=lambda: os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes"))
+
+
+def env_int(name: str, default: int) -> Any:
+    return Field(default_factory=lambda: int(os.getenv(name) or default))
 
 
 class Settings(BaseModel):
     telegram_bot_token: str
-    database_url: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///data/app.db")
-    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    database_url: str = env("DATABASE_URL", "sqlite+aiosqlite:///data/app.db")
+    # Чтение для экспорта/истории/сводок: пусто — основная база, ro — тот же SQLite
+    # только на чтение (WAL), иначе URL реплики
+    database_read_url: str = env("DATABASE_READ_URL")
+    # Кэш скомпилированных SQL-выражений на движок (SQLAlchemy query_cache_size)
+    db_query_cache_size: int = env_int("DB_QUERY_CACHE_SIZE", 500)
+    log_level: str = env("LOG_LEVEL", "INFO")
+    # Логирование: text (dev) | json (prod, JSON-lines с контекстом апдейта)
+    log_format: str = env("LOG_FORMAT", "text")
+    # Писать логи из фонового потока (очередь), не блокируя event loop
+    log_enqueue: bool = env_bool("LOG_ENQUEUE")
+    log_file: str = env("LOG_FILE")
+    log_rotation: str = env("LOG_ROTATION", "50 MB")  # "50 MB" | "00:00" | "1 week"
+    log_retention: str = env("LOG_RETENTION", "14 days")
+    log_compression: str = env("LOG_COMPRESSION", "gz")
+    # Сэмплирование DEBUG по типу апдейта: "message=10,callback_query=5,*=1"
+    log_debug_sampling: str = env("LOG_DEBUG_SAMPLING")
+    # Разбивка времени старта по фазам в логе (INFO)
+    log_startup_timing: bool = env_bool("LOG_STARTUP_TIMING", True)
+    # Профили принтеров для оценки времени по модели: "RA1=bambu,Prusa-MK3=prusa"
+    printer_profiles: str = env("PRINTER_PROFILES")
+    # Экспорт делится на части не больше N МБ (лимит загрузки файлов ботом — 50 МБ)
+    export_part_max_mb: int = env_int("EXPORT_PART_MAX_MB", 49)
+    # Сообщение о прогрессе экспорта обновляется каждые N процентов
+    export_progress_step: int = env_int("EXPORT_PROGRESS_STEP", 10)
+    # Выгрузки по расписанию: "stock:csv.gz@1h, all:xml.gz@03:00, delta:csv@15m" (пусто — выключено)
+    export_schedule: str = env("EXPORT_SCHEDULE")
+    export_dir: str = env("EXPORT_DIR", "data/exports")
+    # Сколько последних прогонов каждого задания хранить на диске
+    export_keep: int = env_int("EXPORT_KEEP", 7)
     admin_tg_ids: list[int] = []
 
 
@@ -23,7 +63,7 @@ def get_settings() -> Settings:
     # Ensure data directory exists
     data_dir = Path("data")
     data_dir.mkdir(parents=True, exist_ok=True)
-    # Re-load .env to ensure vars are present when called from different contexts
+    # Load .env if present (единственная загрузка: результат кэшируется lru_cache)
     load_dotenv(override=False)
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from typing import Any
+
+from sqlalchemy import event, make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
@@ -10,16 +13,64 @@ class Base(DeclarativeBase):
 
 engine: AsyncEngine | None = None
 async_session: async_sessionmaker[AsyncSession] | None = None
+# Тяжёлое чтение (экспорт, история, карточка, сводки). Без DATABASE_READ_URL —
+# тот же движок, что и для записи; запись всегда идёт через async_session
+read_engine: AsyncEngine | None = None
+async_read_session: async_sessionmaker[AsyncSession] | None = None
+
+READ_ONLY_SQLITE = "ro"
+
+
+def setup_engine(database_url: str, read_url: str = "", query_cache_size: int = 500) -> None:
+    """Основной движок и (опционально) движок для чтения.
 
+    read_url: "" — читать через основной; "ro" — тот же файл SQLite только на чтение
+    (mode=ro, PRAGMA query_only; основная база переводится в WAL, чтобы читатели
+    не мешали писателям); иначе — URL реплики.
+    query_cache_size — сколько скомпилированных выражений держит каждый движок.
+    """
+    from .queries import track_cache
 
-def setup_engine(database_url: str) -> None:
-    global engine, async_session
-    engine = create_async_engine(database_url, echo=False, future=True)
+    global engine, async_session, read_engine, async_read_session
+    engine = create_async_engine(database_url, echo=False, future=True, query_cache_size=query_cache_size)
+    track_cache(engine)
     async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    read_engine, async_read_session = engine, async_session
+    if not read_url:
+        return
+    if read_url == READ_ONLY_SQLITE:
+        url = make_url(database_url)
+        if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+            from ..logger import logger
+
+            logger.warning("DATABASE_READ_URL=ro needs a SQLite file database; reads use the primary engine")
+            return
+        _on_connect(engine, "PRAGMA journal_mode=WAL")
+        read_url = url.set(
+            database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"}
+        ).render_as_string(hide_password=False)
+    read_engine = create_async_engine(read_url, echo=False, future=True, query_cache_size=query_cache_size)
+    track_cache(read_engine)
+    if read_engine.dialect.name == "sqlite":
+        _on_connect(read_engine, "PRAGMA query_only=ON")
+    async_read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _on_connect(target: AsyncEngine, pragma: str) -> None:
+    def run(dbapi_conn: Any, _record: Any) -> None:
+        cursor = dbapi_conn.cursor()
+        cursor.execute(pragma)
+        cursor.close()
+
+    event.listen(target.sync_engine, "connect", run)
 
 
 async def init_db() -> None:
     from . import models  # noqa: F401  Ensure models are imported for metadata
+    from .migrations import migrate
     assert engine is not None
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Одна проверка schema_version; миграции применяются, только если база отстаёт
+    applied = await migrate(engine)
+    if applied:
+        from ..logger import logger
+        logger.info("DB migrated: {}", ", ".join(applied))
@@ -0,0 +1,75 @@
+"""Версионные миграции схемы БД.
+
+Каждая миграция — модуль ``vNNNN_<описание>.py`` в этом пакете с функцией
+``upgrade(conn)`` (синхронный Connection, вызывается через run_sync). Применённые
+версии записываются в таблицу schema_version; на старте выполняется один запрос
+к ней, и только если база отстаёт — по очереди применяются недостающие миграции,
+каждая в своей транзакции.
+"""
+from __future__ import annotations
+
+import importlib
+import pkgutil
+from datetime import datetime
+from types import ModuleType
+
+from sqlalchemy import Column, Connection, DateTime, Integer, MetaData, String, Table, func, insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+def _discover() -> list[tuple[int, str, ModuleType]]:
+    found: list[tuple[int, str, ModuleType]] = []
+    for info in pkgutil.iter_modules(__path__):
+        if not (info.name.startswith("v") and info.name[1:5].isdigit()):
+            continue
+        module = importlib.import_module(f"{__name__}.{info.name}")
+        found.append((int(info.name[1:5]), info.name, module))
+    found.sort(key=lambda m: m[0])
+    versions = [v for v, _, _ in found]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return found
+
+
+MIGRATIONS = _discover()
+LATEST = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def read_version(conn: Connection) -> int:
+    """Текущая версия схемы; 0 — таблицы schema_version ещё нет (новая или «старая» база)."""
+    try:
+        with conn.begin_nested():
+            return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+def _apply(conn: Connection, version: int, name: str, module: ModuleType) -> None:
+    schema_version.create(conn, checkfirst=True)
+    module.upgrade(conn)
+    conn.execute(insert(schema_version).values(version=version, name=name, applied_at=datetime.utcnow()))
+
+
+async def migrate(engine: AsyncEngine) -> list[str]:
+    """Довести схему до LATEST. Возвращает имена применённых миграций."""
+    async with engine.connect() as conn:
+        current = await conn.run_sync(read_version)
+    if current >= LATEST:
+        return []
+    applied: list[str] = []
+    for version, name, module in MIGRATIONS:
+        if version <= current:
+            continue
+        async with engine.begin() as conn:
+            await conn.run_sync(_apply, version, name, module)
+        applied.append(name)
+    return applied
@@ -0,0 +1,77 @@
+"""Идемпотентные операции для миграций (sync Connection, вызываются через run_sync).
+
+Все операции можно безопасно применять к базе, где объект уже есть: это нужно,
+потому что свежая база создаётся из актуальных моделей в v0001, а старые базы
+догоняются последующими миграциями.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy import Connection, MetaData, Table, inspect, text
+
+
+def create_tables(conn: Connection, *tables: Table) -> None:
+    for table in tables:
+        table.create(conn, checkfirst=True)
+
+
+def create_index(conn: Connection, name: str, table: str, columns: Iterable[str], unique: bool = False) -> None:
+    cols = ", ".join(columns)
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({cols})"))
+
+
+def drop_index(conn: Connection, name: str) -> None:
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """ALTER TABLE ... ADD COLUMN, если колонки ещё нет. ddl — тип и ограничения: 'INTEGER NULL'."""
+    if not has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def rebuild_table(
+    conn: Connection,
+    table: Table,
+    column_map: dict[str, str] | None = None,
+    where: str | None = None,
+) -> None:
+    """Пересборка таблицы SQLite по актуальному определению модели.
+
+    SQLite не умеет ALTER COLUMN / DROP CONSTRAINT, поэтому изменения типа,
+    NOT NULL, DEFAULT или удаление колонок делаются так: создать новую таблицу,
+    скопировать данные, удалить старую, переименовать новую, пересоздать индексы.
+
+    column_map — новая колонка -> SQL-выражение по старой таблице (для переименований
+    и преобразований); по умолчанию копируются одноимённые колонки. where — фильтр строк.
+    """
+    name = table.name
+    tmp_name = f"_rebuild_{name}"
+    old_cols = {c["name"] for c in inspect(conn).get_columns(name)}
+    mapping = dict(column_map or {})
+    for col in table.columns:
+        if col.name not in mapping and col.name in old_cols:
+            mapping[col.name] = col.name
+
+    tmp = table.to_metadata(MetaData(), name=tmp_name)
+    # Индексы создадим после переименования — с исходными именами
+    tmp.indexes.clear()
+    conn.execute(text(f"DROP TABLE IF EXISTS {tmp_name}"))
+    tmp.create(conn)
+    targets = ", ".join(mapping)
+    sources = ", ".join(mapping.values())
+    sql = f"INSERT INTO {tmp_name} ({targets}) SELECT {sources} FROM {name}"
+    if where:
+        sql += f" WHERE {where}"
+    conn.execute(text(sql))
+    conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(text(f"ALTER TABLE {tmp_name} RENAME TO {name}"))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
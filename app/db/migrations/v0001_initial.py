@@ -0,0 +1,28 @@
+"""Исходная схема (таблицы, которые раньше создавал create_all при старте).
+
+Для баз, созданных до появления миграций, операция ничего не меняет — таблицы уже есть.
+"""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from ..base import Base
+from .ops import create_tables
+
+TABLES = (
+    "users",
+    "printers",
+    "print_jobs",
+    "print_events",
+    "attachments",
+    "repairs",
+    "unit_events",
+    "documents",
+    "units",
+)
+
+
+def upgrade(conn: Connection) -> None:
+    from .. import models  # noqa: F401  Ensure models are imported for metadata
+
+    create_tables(conn, *(Base.metadata.tables[name] for name in TABLES))
@@ -0,0 +1,18 @@
+"""Индексы под горячие запросы хендлеров.
+
+- история блока: WHERE unit_id = ? ORDER BY timestamp DESC
+- /unit <номер>: WHERE number = ? ORDER BY name
+- справочники приёмки: DISTINCT name / DISTINCT type (обход индекса вместо таблицы)
+"""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from .ops import create_index
+
+
+def upgrade(conn: Connection) -> None:
+    create_index(conn, "ix_unit_events_unit_id_timestamp", "unit_events", ["unit_id", "timestamp"])
+    create_index(conn, "ix_units_number_name", "units", ["number", "name"])
+    create_index(conn, "ix_units_name", "units", ["name"])
+    create_index(conn, "ix_units_type", "units", ["type"])
@@ -0,0 +1,11 @@
+"""Результат разбора G-code в заявке на печать: точное время и длина филамента."""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from .ops import add_column
+
+
+def upgrade(conn: Connection) -> None:
+    add_column(conn, "print_jobs", "gcode_time_s", "INTEGER NULL")
+    add_column(conn, "print_jobs", "filament_mm", "FLOAT NULL")
@@ -0,0 +1,22 @@
+"""Индексы под просмотр по машинам (/machine).
+
+- блоки на машине: WHERE machine = ? AND machine_number = ? ORDER BY id
+- номера машин РА: DISTINCT machine_number WHERE machine = ?
+- история выдач: WHERE destination_machine = ? AND destination_machine_number = ?
+  ORDER BY timestamp DESC, id DESC
+"""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from .ops import create_index
+
+
+def upgrade(conn: Connection) -> None:
+    create_index(conn, "ix_units_machine_number", "units", ["machine", "machine_number", "id"])
+    create_index(
+        conn,
+        "ix_unit_events_dest_machine_ts",
+        "unit_events",
+        ["destination_machine", "destination_machine_number", "timestamp", "id"],
+    )
@@ -0,0 +1,26 @@
+"""Ремонт как запись с началом и концом + сводка repair_stats_daily.
+
+- unit_events.repair_id связывает repair_open/repair_close с записью repairs
+- индексы repairs(unit_id, status) — найти открытый ремонт блока, repairs(status) — сколько открыто
+- repair_stats_daily заполняется по уже закрытым ремонтам (до этой версии opened_at
+  ставился в момент закрытия, так что длительность у старых записей ~0)
+"""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from ..base import Base
+from ..rollups import rebuild_repair_stats
+from .ops import add_column, create_index, create_tables
+
+
+def upgrade(conn: Connection) -> None:
+    from .. import models  # noqa: F401  Ensure models are imported for metadata
+
+    add_column(conn, "unit_events", "repair_id", "INTEGER NULL")
+    create_index(conn, "ix_unit_events_repair_id", "unit_events", ["repair_id"])
+    create_index(conn, "ix_repairs_unit_id_status", "repairs", ["unit_id", "status"])
+    create_index(conn, "ix_repairs_status", "repairs", ["status"])
+    create_tables(conn, Base.metadata.tables["repair_stats_daily"])
+
+    rebuild_repair_stats(conn)
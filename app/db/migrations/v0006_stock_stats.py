@@ -0,0 +1,19 @@
+"""Сводки для /stats: stock_counts (остатки по статусу/типу/состоянию) и
+unit_events_daily (события по дням). Заполняются пересчётом по текущим данным,
+дальше ведутся инкрементально в хендлерах приёмки/выдачи/ремонта.
+"""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from ..base import Base
+from ..rollups import rebuild_stock_stats
+from .ops import create_tables
+
+
+def upgrade(conn: Connection) -> None:
+    from .. import models  # noqa: F401  Ensure models are imported for metadata
+
+    create_tables(conn, Base.metadata.tables["stock_counts"], Base.metadata.tables["unit_events_daily"])
+
+    rebuild_stock_stats(conn)
@@ -0,0 +1,19 @@
+"""Дельта-экспорт: курсоры потребителей и индекс по времени событий.
+
+- export_cursors — последний выгруженный UnitEvent.id на потребителя
+- ix_unit_events_timestamp — перевод «изменения с даты» в id события без скана таблицы
+  (сам диапазон событий берётся по первичному ключу unit_events.id)
+"""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from ..base import Base
+from .ops import create_index, create_tables
+
+
+def upgrade(conn: Connection) -> None:
+    from .. import models  # noqa: F401  Ensure models are imported for metadata
+
+    create_index(conn, "ix_unit_events_timestamp", "unit_events", ["timestamp"])
+    create_tables(conn, Base.metadata.tables["export_cursors"])
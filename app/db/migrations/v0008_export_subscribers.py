@@ -0,0 +1,13 @@
+"""Подписчики выгрузок по расписанию (export_subscribers)."""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from ..base import Base
+from .ops import create_tables
+
+
+def upgrade(conn: Connection) -> None:
+    from .. import models  # noqa: F401  Ensure models are imported for metadata
+
+    create_tables(conn, Base.metadata.tables["export_subscribers"])
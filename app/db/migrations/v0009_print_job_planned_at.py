@@ -0,0 +1,10 @@
+"""Плановое начало заявки на печать: порядок очереди принтера, как его посчитал планировщик."""
+from __future__ import annotations
+
+from sqlalchemy import Connection
+
+from .ops import add_column
+
+
+def upgrade(conn: Connection) -> None:
+    add_column(conn, "print_jobs", "planned_at", "DATETIME NULL")
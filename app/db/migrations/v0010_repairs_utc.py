@@ -0,0 +1,32 @@
+"""Время ремонтов в UTC, как у событий и сводок /stats.
+
+До этой версии repairs.opened_at/closed_at писались по локальным часам сервера.
+Записи сдвигаются на текущее смещение локального времени от UTC (переходы на
+летнее время не учитываются), затем repair_stats_daily пересчитывается.
+На сервере в UTC сдвиг нулевой — пересчитывается только сводка.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Connection, bindparam, select, update
+
+from ..models import Repair
+from ..rollups import rebuild_repair_stats
+
+
+def upgrade(conn: Connection) -> None:
+    offset = datetime.now().astimezone().utcoffset()
+    if offset:
+        rows = conn.execute(select(Repair.id, Repair.opened_at, Repair.closed_at)).all()
+        if rows:
+            stmt = (
+                update(Repair.__table__)
+                .where(Repair.__table__.c.id == bindparam("rid"))
+                .values(opened_at=bindparam("opened"), closed_at=bindparam("closed"))
+            )
+            conn.execute(stmt, [
+                {"rid": rid, "opened": opened - offset, "closed": closed - offset if closed else None}
+                for rid, opened, closed in rows
+            ])
+    rebuild_repair_stats(conn)
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import String, func
+from sqlalchemy import Index, String, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
@@ -48,6 +48,10 @@ class PrintJob(Base):
     color: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     copies: Mapped[int] = mapped_column(default=1)
     expected_time_min: Mapped[int | None] = mapped_column(nullable=True)  # Оценка времени печати, мин
+    gcode_time_s: Mapped[int | None] = mapped_column(nullable=True)  # Время печати по G-code, с
+    filament_mm: Mapped[float | None] = mapped_column(nullable=True)  # Расход филамента по G-code, мм
+    # Плановое начало по расписанию (UTC); очередь принтера идёт в этом порядке
+    planned_at: Mapped[datetime | None] = mapped_column(nullable=True)
     status: Mapped[str] = mapped_column(String(32), default="requested", index=True)  # requested|queued|printing|done|failed|canceled
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
 
@@ -76,30 +80,96 @@ class Attachment(Base):
 
 class Repair(Base):
     __tablename__ = "repairs"
+    __table_args__ = (
+        Index("ix_repairs_unit_id_status", "unit_id", "status"),
+        Index("ix_repairs_status", "status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     unit_id: Mapped[int] = mapped_column(index=True)
     opened_at: Mapped[datetime] = mapped_column()
     closed_at: Mapped[datetime | None] = mapped_column(nullable=True)
-    status: Mapped[str] = mapped_column(String(32), default="done")  # open/in_progress/done
+    status: Mapped[str] = mapped_column(String(32), default="done")  # open/done
     summary: Mapped[str | None] = mapped_column(String(1000), nullable=True)  # краткое описание работ/замен
     by_user_id: Mapped[int | None] = mapped_column(nullable=True)
 
 
 class UnitEvent(Base):
     __tablename__ = "unit_events"
+    __table_args__ = (
+        Index("ix_unit_events_unit_id_timestamp", "unit_id", "timestamp"),
+        # Дельта-экспорт с даты: первое событие не раньше timestamp
+        Index("ix_unit_events_timestamp", "timestamp"),
+        Index(
+            "ix_unit_events_dest_machine_ts",
+            "destination_machine", "destination_machine_number", "timestamp", "id",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     unit_id: Mapped[int] = mapped_column(index=True)
-    event_type: Mapped[str] = mapped_column(String(32), index=True)  # received | issued | repair_open | repair_close
+    event_type: Mapped[str] = mapped_column(String(32), index=True)  # received | issued | repair_open | repair_close | machine_set
     by_user_id: Mapped[int | None] = mapped_column(nullable=True)
     by_user_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     destination_machine: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)  # RA1/RA2/RA3
     destination_machine_number: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)  # 105-01
+    repair_id: Mapped[int | None] = mapped_column(nullable=True, index=True)  # для repair_open / repair_close
     timestamp: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
     comment: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
 
 
+class RepairStatDaily(Base):
+    """Сводка ремонтов по дням и типам блоков; ведётся инкрементально (app.db.rollups)."""
+
+    __tablename__ = "repair_stats_daily"
+
+    day: Mapped[date] = mapped_column(primary_key=True)
+    unit_type: Mapped[str] = mapped_column(String(255), primary_key=True)  # "" — тип не указан
+    opened: Mapped[int] = mapped_column(default=0)
+    closed: Mapped[int] = mapped_column(default=0)
+    duration_s: Mapped[int] = mapped_column(default=0)  # сумма длительностей закрытых ремонтов
+
+
+class StockCount(Base):
+    """Сколько блоков в каждом сочетании статус/тип/состояние; ведётся инкрементально (app.db.rollups)."""
+
+    __tablename__ = "stock_counts"
+
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    unit_type: Mapped[str] = mapped_column(String(255), primary_key=True)  # "" — тип не указан
+    condition: Mapped[str] = mapped_column(String(32), primary_key=True)  # "" — состояние не указано
+    count: Mapped[int] = mapped_column(default=0)
+
+
+class UnitEventDaily(Base):
+    """Число событий по блокам за день (UTC, как UnitEvent.timestamp) и типу события."""
+
+    __tablename__ = "unit_events_daily"
+
+    day: Mapped[date] = mapped_column(primary_key=True)
+    event_type: Mapped[str] = mapped_column(String(32), primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+
+
+class ExportCursor(Base):
+    """Докуда потребитель (ERP, пользователь бота) уже забрал дельта-экспорт: последний UnitEvent.id."""
+
+    __tablename__ = "export_cursors"
+
+    consumer: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_event_id: Mapped[int] = mapped_column(default=0)
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
+
+
+class ExportSubscriber(Base):
+    """Кому рассылать выгрузки по расписанию (app.services.export_scheduler)."""
+
+    __tablename__ = "export_subscribers"
+
+    tg_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, server_default=func.now())
+
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -112,11 +182,15 @@ class Document(Base):
 
 class Unit(Base):
     __tablename__ = "units"
+    __table_args__ = (
+        Index("ix_units_number_name", "number", "name"),
+        Index("ix_units_machine_number", "machine", "machine_number", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     number: Mapped[str] = mapped_column(String(64), index=True)  # не уникален, могут быть буквы
-    name: Mapped[str] = mapped_column(String(255))  # Название блока (БУД и т.п.)
-    type: Mapped[str] = mapped_column(String(255))  # Тип: 750-05.01
+    name: Mapped[str] = mapped_column(String(255), index=True)  # Название блока (БУД и т.п.)
+    type: Mapped[str] = mapped_column(String(255), index=True)  # Тип: 750-05.01
     status: Mapped[str] = mapped_column(String(32), index=True, default="received")  # received/in_repair/done/issued + Исправный/Неисправный/Гарантийный как атрибут при приёмке
     condition: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)  # Исправный | Не исправный | Гарантийный
     machine: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)  # РА1 | РА2 | РА3
@@ -0,0 +1,135 @@
+"""Готовые выражения для запросов, которые выполняются почти на каждый апдейт.
+
+select(...) собирается один раз при импорте, значения подставляются через
+bindparam: session.execute(UNIT_BY_ID, {"unit_id": 5}). У готового объекта ключ
+кэша компиляции мемоизирован, так что на каждом вызове нет ни сборки выражения,
+ни обхода его дерева — только поиск в кэше движка (query_cache_size,
+DB_QUERY_CACHE_SIZE). Попадания в кэш по каждому выражению пишутся в DEBUG-лог.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any
+
+from sqlalchemy import Select, bindparam, event, select
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import PrintJob, Unit, UnitEvent, User
+
+# Печатать сводку по кэшу в DEBUG раз в столько выполненных запросов
+STATS_LOG_EVERY = 1000
+
+_names: dict[int, str] = {}
+
+
+def _named(name: str, stmt: Select[Any]) -> Select[Any]:
+    _names[id(stmt)] = name
+    return stmt
+
+
+# ===== Пользователи =====
+
+USER_BY_TG_ID = _named("user_by_tg_id", select(User).where(User.tg_id == bindparam("tg_id")))
+USER_ID_BY_TG_ID = _named("user_id_by_tg_id", select(User.id).where(User.tg_id == bindparam("tg_id")))
+# Кто выполняет действие (services.users.resolve_actor): без загрузки сущности
+USER_ACTOR = _named("user_actor", select(User.id, User.full_name).where(User.tg_id == bindparam("tg_id")))
+USER_STATUS_BY_TG_ID = _named("user_status_by_tg_id", select(User.status).where(User.tg_id == bindparam("tg_id")))
+
+# ===== Блоки =====
+
+UNIT_BY_ID = _named("unit_by_id", select(Unit).where(Unit.id == bindparam("unit_id")))
+# Выбор блока по номеру (карточка, выдача, ремонт)
+UNITS_BY_NUMBER = _named(
+    "units_by_number",
+    select(Unit.id, Unit.name, Unit.type, Unit.status)
+    .where(Unit.number == bindparam("number"))
+    .order_by(Unit.name.asc(), Unit.type.asc()),
+)
+# Колонки services.units.UnitCard
+_UNIT_ROW = (Unit.id, Unit.number, Unit.name, Unit.type, Unit.status, Unit.machine, Unit.machine_number)
+UNIT_CARD = _named("unit_card", select(*_UNIT_ROW).where(Unit.id == bindparam("unit_id")))
+# Поиск по началу номера / названия (inline-режим, services.unit_search): диапазон
+# lo <= x < hi идёт по обычному индексу, в отличие от LIKE 'x%' при BINARY-сравнении
+UNITS_BY_NUMBER_PREFIX = _named(
+    "units_by_number_prefix",
+    select(*_UNIT_ROW)
+    .where(Unit.number >= bindparam("lo"), Unit.number < bindparam("hi"))
+    .order_by(Unit.number, Unit.name, Unit.id)
+    .limit(bindparam("limit")),
+)
+UNITS_BY_NAME_PREFIX = _named(
+    "units_by_name_prefix",
+    select(*_UNIT_ROW)
+    .where(Unit.name >= bindparam("lo"), Unit.name < bindparam("hi"))
+    .order_by(Unit.name, Unit.id)
+    .limit(bindparam("limit")),
+)
+UNIT_HISTORY = _named(
+    "unit_history",
+    select(
+        UnitEvent.id,
+        UnitEvent.timestamp,
+        UnitEvent.event_type,
+        UnitEvent.by_user_name,
+        UnitEvent.destination_machine,
+        UnitEvent.destination_machine_number,
+        UnitEvent.comment,
+    )
+    .where(UnitEvent.unit_id == bindparam("unit_id"))
+    .order_by(UnitEvent.timestamp.desc()),
+)
+
+# ===== Печать =====
+
+PRINT_JOB_BY_ID = _named("print_job_by_id", select(PrintJob).where(PrintJob.id == bindparam("job_id")))
+
+
+# ===== Статистика кэша компиляции =====
+
+_hits: Counter[str] = Counter()
+_misses: Counter[str] = Counter()
+_executed = 0
+
+
+def _statement_name(context: Any) -> str:
+    name = _names.get(id(context.invoked_statement))
+    if name is not None:
+        return name
+    # Остальные запросы — по началу SQL, чтобы было видно, какие промахиваются
+    sql = context.compiled.string if context.compiled is not None else ""
+    return " ".join(sql.split())[:60] or "<raw>"
+
+
+def _after_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    global _executed
+    _executed += 1
+    name = _statement_name(context)
+    if context.cache_hit is CACHE_HIT:
+        _hits[name] += 1
+    else:
+        _misses[name] += 1
+    if _executed % STATS_LOG_EVERY == 0:
+        from ..logger import logger
+
+        logger.opt(lazy=True).debug("SQL compile cache: {}", format_cache_stats)
+
+
+def track_cache(engine: AsyncEngine) -> None:
+    """Считать попадания в кэш компиляции по каждому выражению на этом движке."""
+    if not event.contains(engine.sync_engine, "after_cursor_execute", _after_execute):
+        event.listen(engine.sync_engine, "after_cursor_execute", _after_execute)
+
+
+def cache_stats() -> dict[str, tuple[int, int]]:
+    """Выражение -> (попадания, промахи)."""
+    return {name: (_hits[name], _misses[name]) for name in sorted(_hits.keys() | _misses.keys())}
+
+
+def format_cache_stats() -> str:
+    named = [(n, h, m) for n, (h, m) in cache_stats().items() if n in _names.values()]
+    other_h = sum(h for n, h in _hits.items() if n not in _names.values())
+    other_m = sum(m for n, m in _misses.items() if n not in _names.values())
+    parts = [f"{n} {h * 100 // max(1, h + m)}% ({h}/{h + m})" for n, h, m in named]
+    parts.append(f"other {other_h * 100 // max(1, other_h + other_m)}% ({other_h}/{other_h + other_m})")
+    return ", ".join(parts)
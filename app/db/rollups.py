@@ -0,0 +1,142 @@
+"""Агрегатные таблицы, которые обновляются в той же транзакции, что и данные.
+
+Отчёт тогда читает несколько строк по первичному ключу вместо того, чтобы
+сканировать события. Инкремент — один upsert (INSERT ... ON CONFLICT DO UPDATE
+SET col = col + excluded.col): конкурирующие транзакции не теряют обновления.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Iterable
+
+from sqlalchemy import Connection, Table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import RepairStatDaily, StockCount, UnitEventDaily
+
+
+def _insert(session: AsyncSession, table: Table) -> Any:
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+async def increment(session: AsyncSession, table: Table, key: dict[str, Any], deltas: dict[str, int]) -> None:
+    """Прибавить deltas к строке с первичным ключом key (создать строку, если её нет)."""
+    await increment_many(session, table, list(key), [{**key, **deltas}])
+
+
+async def increment_many(session: AsyncSession, table: Table, key_cols: list[str], rows: list[dict[str, Any]]) -> None:
+    """То же для нескольких строк одним executemany; у всех rows одинаковый набор ключей."""
+    if not rows:
+        return
+    stmt = _insert(session, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_cols,
+        set_={col: table.c[col] + stmt.excluded[col] for col in rows[0] if col not in key_cols},
+    )
+    await session.execute(stmt, rows)
+
+
+# ===== Склад: остатки и события =====
+
+async def stock_moved(
+    session: AsyncSession,
+    units: Iterable[tuple[str | None, str | None]],
+    old_status: str | None,
+    new_status: str | None,
+) -> None:
+    """Блоки (тип, состояние) перешли из old_status в new_status (None — блока не было/больше нет)."""
+    deltas: Counter[tuple[str, str, str]] = Counter()
+    for unit_type, condition in units:
+        if old_status is not None:
+            deltas[(old_status, unit_type or "", condition or "")] -= 1
+        if new_status is not None:
+            deltas[(new_status, unit_type or "", condition or "")] += 1
+    await increment_many(
+        session,
+        StockCount.__table__,
+        ["status", "unit_type", "condition"],
+        [
+            {"status": s, "unit_type": t, "condition": c, "count": n}
+            for (s, t, c), n in deltas.items()
+            if n
+        ],
+    )
+
+
+async def events_logged(session: AsyncSession, event_type: str, n: int = 1, day: date | None = None) -> None:
+    """Учесть n событий event_type; день по умолчанию — как у UnitEvent.timestamp (utcnow)."""
+    await increment(
+        session,
+        UnitEventDaily.__table__,
+        {"day": day or datetime.utcnow().date(), "event_type": event_type},
+        {"count": n},
+    )
+
+
+def rebuild_stock_stats(conn: Connection) -> None:
+    """Пересчитать stock_counts и unit_events_daily по units/unit_events (sync, для миграций/run_sync)."""
+    conn.execute(text("DELETE FROM stock_counts"))
+    conn.execute(text(
+        """
+        INSERT INTO stock_counts (status, unit_type, condition, count)
+        SELECT COALESCE(status, ''), COALESCE(type, ''), COALESCE(condition, ''), COUNT(*)
+        FROM units
+        GROUP BY COALESCE(status, ''), COALESCE(type, ''), COALESCE(condition, '')
+        """
+    ))
+    conn.execute(text("DELETE FROM unit_events_daily"))
+    conn.execute(text(
+        """
+        INSERT INTO unit_events_daily (day, event_type, count)
+        SELECT DATE(timestamp), event_type, COUNT(*)
+        FROM unit_events
+        GROUP BY DATE(timestamp), event_type
+        """
+    ))
+
+
+# ===== Ремонты =====
+
+async def repair_opened(session: AsyncSession, unit_type: str | None, opened_at: datetime) -> None:
+    await increment(
+        session,
+        RepairStatDaily.__table__,
+        {"day": opened_at.date(), "unit_type": unit_type or ""},
+        {"opened": 1},
+    )
+
+
+async def repair_closed(session: AsyncSession, unit_type: str | None, opened_at: datetime, closed_at: datetime) -> None:
+    duration = max(0, int((closed_at - opened_at).total_seconds()))
+    await increment(
+        session,
+        RepairStatDaily.__table__,
+        {"day": closed_at.date(), "unit_type": unit_type or ""},
+        {"closed": 1, "duration_s": duration},
+    )
+
+
+def rebuild_repair_stats(conn: Connection) -> None:
+    """Пересчитать repair_stats_daily целиком по таблице repairs (sync, для миграций/run_sync)."""
+    conn.execute(text("DELETE FROM repair_stats_daily"))
+    conn.execute(text(
+        """
+        INSERT INTO repair_stats_daily (day, unit_type, opened, closed, duration_s)
+        SELECT day, unit_type, SUM(opened), SUM(closed), SUM(duration_s) FROM (
+            SELECT DATE(r.opened_at) AS day, COALESCE(u.type, '') AS unit_type,
+                   1 AS opened, 0 AS closed, 0 AS duration_s
+            FROM repairs r LEFT JOIN units u ON u.id = r.unit_id
+            UNION ALL
+            SELECT DATE(r.closed_at), COALESCE(u.type, ''), 0, 1,
+                   MAX(0, CAST((JULIANDAY(r.closed_at) - JULIANDAY(r.opened_at)) * 86400 AS INTEGER))
+            FROM repairs r LEFT JOIN units u ON u.id = r.unit_id
+            WHERE r.status = 'done' AND r.closed_at IS NOT NULL
+        )
+        GROUP BY day, unit_type
+        """
+    ))
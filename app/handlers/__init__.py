@@ -9,7 +9,11 @@ from .blocks import router as blocks_router
 from .receive import router as receive_router
 from .repair import router as repair_router
 from .issue import router as issue_router
+from .machines import router as machines_router
+from .stats import router as stats_router
+from .exports import router as exports_router
 from .printing import router as printing_router
+from .inline import router as inline_router
 
 
 def setup_routers() -> Router:
@@ -22,6 +26,11 @@ def setup_routers() -> Router:
     root.include_router(receive_router)
     root.include_router(repair_router)
     root.include_router(issue_router)
+    root.include_router(machines_router)
+    root.include_router(stats_router)
+    root.include_router(exports_router)
     root.include_router(printing_router)
+    root.include_router(inline_router)
+    # echo — последним: ловит весь необработанный текст и кнопки
     root.include_router(echo_router)
     return root
@@ -0,0 +1,37 @@
+"""Доступ к данным склада: администраторы и подтверждённые пользователи.
+
+Поиск и карточки через inline-режим видны в любых чатах, поэтому кто спрашивает —
+проверяется. Статус из БД держится ACCESS_TTL секунд: inline-запрос приходит почти
+на каждый символ. Не роутер: хендлеры импортируют is_admin/has_access.
+"""
+from __future__ import annotations
+
+import time
+
+from ..config import get_settings
+from ..db import base as db_base
+from ..services.users import is_active_user
+
+ACCESS_TTL = 60.0
+
+_access: dict[int, tuple[bool, float]] = {}
+
+
+def is_admin(tg_id: int | None) -> bool:
+    return tg_id is not None and tg_id in get_settings().admin_tg_ids
+
+
+async def has_access(tg_id: int | None) -> bool:
+    """Админ или пользователь со статусом active (БД уже инициализирована)."""
+    if tg_id is None:
+        return False
+    if is_admin(tg_id):
+        return True
+    cached = _access.get(tg_id)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    assert db_base.async_read_session is not None
+    async with db_base.async_read_session() as session:
+        allowed = await is_active_user(session, tg_id)
+    _access[tg_id] = (allowed, time.monotonic() + ACCESS_TTL)
+    return allowed
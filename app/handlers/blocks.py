@@ -1,19 +1,36 @@
 from __future__ import annotations
 
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
 from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
+from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from sqlalchemy import select
-
 from ..db import base as db_base
-from ..db.models import Unit, UnitEvent
-from ..keyboards.blocks import blocks_menu_kb, unit_card_kb, back_to_blocks_kb, history_nav_kb, export_menu_kb
+from ..db.queries import UNIT_BY_ID, UNITS_BY_NUMBER
+from ..keyboards.callbacks import UnitAction, UnitCb
+from ..keyboards.blocks import blocks_menu_kb, unit_card_kb, history_nav_kb, export_menu_kb
 from ..config import get_settings
 from ..db.base import setup_engine, init_db
 from ..keyboards.receive import ra_kb, skip_kb
+from ..services.export import (
+    FORMATS as EXPORT_FORMATS,
+    export_delta,
+    first_event_since,
+    get_cursor,
+    last_event_id,
+    save_cursor,
+)
+from ..services.export_tasks import export_tasks
+from ..services.machines import set_unit_machine
+from ..services.units import HistoryEntry, unit_card, unit_history
+from ..services.users import resolve_actor
+from .access import has_access, is_admin
+from .navigation import show, show_markup
 
 router = Router(name=__name__)
 
@@ -40,32 +57,71 @@ async def btn_blocks(message: Message) -> None:
 async def ensure_db() -> None:
     if db_base.async_session is None:
         settings = get_settings()
-        setup_engine(settings.database_url)
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
         await init_db()
 
 
 @router.callback_query(F.data == "blocks:menu")
 async def back_to_menu(callback: CallbackQuery) -> None:
     await callback.answer()
-    await callback.message.edit_text("Раздел: Блоки. Выберите действие:", reply_markup=blocks_menu_kb())
+    await show(callback, "Раздел: Блоки. Выберите действие:", blocks_menu_kb())
 
 
 @router.callback_query(F.data == "blocks:export")
 async def cb_blocks_export(callback: CallbackQuery) -> None:
     await callback.answer()
-    await callback.message.answer("Экспорт XML:", reply_markup=export_menu_kb())
+    await show(callback, "Экспорт: выберите формат и какие блоки выгрузить.", export_menu_kb())
+
 
+@router.callback_query(F.data.startswith("blocks:export:fmt:"))
+async def cb_blocks_export_fmt(callback: CallbackQuery) -> None:
+    await callback.answer()
+    fmt = (callback.data or "").split(":")[-1]
+    if fmt not in EXPORT_FORMATS:
+        return
+    await show_markup(callback, export_menu_kb(fmt))
 
-@router.callback_query(F.data == "blocks:export:stock")
+
+def _callback_fmt(data: str | None) -> str:
+    # blocks:export:stock[:<формат>]; без формата — XML, как раньше
+    parts = (data or "").split(":")
+    return parts[3] if len(parts) > 3 and parts[3] in EXPORT_FORMATS else "xml"
+
+
+@router.callback_query(F.data.startswith("blocks:export:stock"))
 async def cb_blocks_export_stock(callback: CallbackQuery) -> None:
     await callback.answer()
-    await cmd_export_xml(callback.message)
+    await _export_units(callback.message, include_all=False, fmt=_callback_fmt(callback.data))
 
 
-@router.callback_query(F.data == "blocks:export:all")
+@router.callback_query(F.data.startswith("blocks:export:all"))
 async def cb_blocks_export_all(callback: CallbackQuery) -> None:
     await callback.answer()
-    await cmd_export_xml_all(callback.message)
+    await _export_units(callback.message, include_all=True, fmt=_callback_fmt(callback.data))
+
+
+@router.callback_query(F.data.startswith("blocks:export:cancel:"))
+async def cb_blocks_export_cancel(callback: CallbackQuery) -> None:
+    try:
+        task_id = int((callback.data or "").rsplit(":", 1)[-1])
+    except ValueError:
+        await callback.answer()
+        return
+    if await export_tasks.cancel(callback.bot, task_id, callback.message.chat.id, callback.message.message_id):
+        await callback.answer("Экспорт отменён")
+    else:
+        await callback.answer("Экспорт уже завершён")
+
+
+@router.callback_query(F.data.startswith("blocks:export:delta"))
+async def cb_blocks_export_delta(callback: CallbackQuery) -> None:
+    await ensure_db()
+    if not await has_access(callback.from_user.id):
+        await callback.answer(DELTA_DENIED, show_alert=True)
+        return
+    await callback.answer()
+    # Курсор — свой у каждого пользователя, как у /export_delta без имени
+    await _export_delta(callback.message, f"tg{callback.from_user.id}", _callback_fmt(callback.data))
 
 
 @router.message(Command("unit"))
@@ -79,10 +135,9 @@ async def cmd_unit(message: Message) -> None:
 
     await ensure_db()
     items: list[tuple[int, str]] = []
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            q = select(Unit.id, Unit.name, Unit.type, Unit.status).where(Unit.number == number).order_by(Unit.name.asc())
-            rows = await session.execute(q)
+    if db_base.async_read_session is not None:
+        async with db_base.async_read_session() as session:
+            rows = await session.execute(UNITS_BY_NUMBER, {"number": number})
             for r in rows.all():
                 uid, name, type_, status = r
                 label = f"{name or '-'} | {type_ or '-'} | {status}"
@@ -98,28 +153,24 @@ async def cmd_unit(message: Message) -> None:
 
     # Список выбора
     kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=label, callback_data=f"unit:card:{uid}")]
+        [InlineKeyboardButton(text=label, callback_data=UnitCb(action=UnitAction.card, unit_id=uid).pack())]
         for uid, label in items[:10]
     ])
     await message.answer("Выберите блок:", reply_markup=kb)
 
 
-@router.callback_query(F.data.startswith("unit:card:"))
-async def cb_unit_card(callback: CallbackQuery) -> None:
+@router.callback_query(UnitCb.filter(F.action == UnitAction.card))
+async def cb_unit_card(callback: CallbackQuery, callback_data: UnitCb) -> None:
     await callback.answer()
-    try:
-        unit_id = int((callback.data or "").split(":")[-1])
-    except Exception:
-        return
-    await show_unit_card(callback, unit_id)
+    await show_unit_card(callback, callback_data.unit_id)
 
 
 async def show_unit_card(target: Message | CallbackQuery, unit_id: int) -> None:
     await ensure_db()
     unit = None
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            unit = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
+    if db_base.async_read_session is not None:
+        async with db_base.async_read_session() as session:
+            unit = await unit_card(session, unit_id)
     if not unit:
         if isinstance(target, Message):
             await target.answer("Блок не найден")
@@ -135,50 +186,32 @@ async def show_unit_card(target: Message | CallbackQuery, unit_id: int) -> None:
         f"Статус: {unit.status}\n"
         f"Машина: {machine_text}\n"
     )
-    kb = unit_card_kb(unit.id)
-    if isinstance(target, Message):
-        await target.answer(text, reply_markup=kb)
-    else:
-        await target.message.answer(text, reply_markup=kb)
+    await show(target, text, unit_card_kb(unit.id))
 
 
-@router.callback_query(F.data.startswith("unit:history:"))
-async def cb_unit_history(callback: CallbackQuery) -> None:
+@router.callback_query(UnitCb.filter(F.action == UnitAction.history))
+async def cb_unit_history(callback: CallbackQuery, callback_data: UnitCb) -> None:
     await callback.answer()
-    # поддержка форматов: unit:history:<unit_id> и unit:history:<unit_id>:<page>
-    tokens = (callback.data or "").split(":")
-    unit_id = None
-    page = 0
-    try:
-        if len(tokens) >= 3:
-            unit_id = int(tokens[2])
-        if len(tokens) >= 4:
-            page = int(tokens[3])
-    except Exception:
-        unit_id = None
-    if unit_id is None:
-        return
+    unit_id, page = callback_data.unit_id, callback_data.page
     await ensure_db()
-    events: list[UnitEvent] = []
+    # пагинация: по 8 записей на страницу
+    page_size = 8
+    chunk: list[HistoryEntry] = []
+    total = 0
     unit = None
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            unit = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
-            q = select(UnitEvent).where(UnitEvent.unit_id == unit_id).order_by(UnitEvent.timestamp.desc())
-            rows = await session.execute(q)
-            events = rows.scalars().all()
+    if db_base.async_read_session is not None:
+        async with db_base.async_read_session() as session:
+            unit = await unit_card(session, unit_id)
+            if unit is not None:
+                chunk, total = await unit_history(session, unit_id, page, page_size)
     if not unit:
         await callback.message.answer("Блок не найден")
         return
-    if not events:
-        await callback.message.answer("История пуста", reply_markup=back_to_blocks_kb())
+    if not total:
+        await show(callback, f"История блока {unit.name} — {unit.number} пуста.", history_nav_kb(unit.id, 0, False, False))
         return
-    # пагинация: по 8 записей на страницу
-    page_size = 8
-    total = len(events)
     start = page * page_size
     end = start + page_size
-    chunk = events[start:end]
     has_prev = page > 0
     has_next = end < total
 
@@ -188,12 +221,14 @@ async def cb_unit_history(callback: CallbackQuery) -> None:
         "repair_open": "Ремонт начат",
         "repair_close": "Ремонт завершён",
         "issued": "Выдан",
+        "machine_set": "Привязка к машине",
     }
     icons = {
         "received": "📥",
         "repair_open": "🛠",
         "repair_close": "✅",
         "issued": "📤",
+        "machine_set": "🔗",
     }
     lines = [f"История блока {unit.name} — {unit.number} (записи {start+1}-{min(end, total)} из {total}):"]
     for e in chunk:
@@ -202,7 +237,7 @@ async def cb_unit_history(callback: CallbackQuery) -> None:
         ev = labels.get(e.event_type, e.event_type)
         icon = icons.get(e.event_type, '•')
         extra = ''
-        if e.event_type == 'issued':
+        if e.event_type in ('issued', 'machine_set'):
             if e.destination_machine:
                 extra = f" → {e.destination_machine} {e.destination_machine_number or ''}"
             else:
@@ -213,40 +248,33 @@ async def cb_unit_history(callback: CallbackQuery) -> None:
         # Комментарий (например, из repair_close)
         comment = f"\n   ↳ {e.comment}" if e.comment else ''
         lines.append(f"{icon} {ts}: {ev} (кем: {who}){extra}{comment}")
-    kb = history_nav_kb(unit.id, page, has_prev, has_next)
-    await callback.message.answer("\n".join(lines), reply_markup=kb)
+    await show(callback, "\n".join(lines), history_nav_kb(unit.id, page, has_prev, has_next))
 
 
-@router.callback_query(F.data.startswith("unit:machine:clear:"))
-async def cb_unit_machine_clear(callback: CallbackQuery) -> None:
-    await callback.answer()
-    try:
-        unit_id = int((callback.data or "").split(":")[-1])
-    except Exception:
-        return
+@router.callback_query(UnitCb.filter(F.action == UnitAction.machine_clear))
+async def cb_unit_machine_clear(callback: CallbackQuery, callback_data: UnitCb) -> None:
+    unit_id = callback_data.unit_id
     await ensure_db()
     if db_base.async_session is not None:
         async with db_base.async_session() as session:
-            u = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
+            u = (await session.execute(UNIT_BY_ID, {"unit_id": unit_id})).scalar_one_or_none()
             if not u:
+                await callback.answer()
                 await callback.message.answer("Блок не найден")
                 return
-            u.machine = None
-            u.machine_number = None
+            by_user_id, by_user_name = await resolve_actor(session, callback.from_user)
+            await set_unit_machine(session, u, None, None, by_user_id=by_user_id, by_user_name=by_user_name)
             await session.commit()
-    await callback.message.answer("Привязка к машине снята.")
+    # Карточка обновляется на месте, о снятии — всплывающим уведомлением
+    await callback.answer("Привязка к машине снята.")
     await show_unit_card(callback, unit_id)
 
 
-@router.callback_query(F.data.startswith("unit:machine:set:"))
-async def cb_unit_machine_set(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(UnitCb.filter(F.action == UnitAction.machine_set))
+async def cb_unit_machine_set(callback: CallbackQuery, callback_data: UnitCb, state: FSMContext) -> None:
     await callback.answer()
-    try:
-        unit_id = int((callback.data or "").split(":")[-1])
-    except Exception:
-        return
     await state.clear()
-    await state.update_data(edit_unit_id=unit_id)
+    await state.update_data(edit_unit_id=callback_data.unit_id)
     await state.set_state(MachineStates.set_machine)
     await callback.message.answer("Укажите машину (РА1/РА2/РА3) или пропустите:", reply_markup=ra_kb())
 
@@ -285,7 +313,7 @@ async def finalize_machine_update(target: Message | CallbackQuery, state: FSMCon
     await ensure_db()
     if db_base.async_session is not None and isinstance(unit_id, int):
         async with db_base.async_session() as session:
-            u = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
+            u = (await session.execute(UNIT_BY_ID, {"unit_id": unit_id})).scalar_one_or_none()
             if not u:
                 if isinstance(target, Message):
                     await target.answer("Блок не найден")
@@ -293,8 +321,8 @@ async def finalize_machine_update(target: Message | CallbackQuery, state: FSMCon
                     await target.message.answer("Блок не найден")
                 await state.clear()
                 return
-            u.machine = new_machine
-            u.machine_number = new_number
+            by_user_id, by_user_name = await resolve_actor(session, target.from_user)
+            await set_unit_machine(session, u, new_machine, new_number, by_user_id=by_user_id, by_user_name=by_user_name)
             await session.commit()
     msg = "Машина обновлена." if new_machine else "Привязка к машине снята."
     if isinstance(target, Message):
@@ -305,108 +333,162 @@ async def finalize_machine_update(target: Message | CallbackQuery, state: FSMCon
     await state.clear()
 
 
-# ===== XML экспорт списка блоков =====
-
-
-def _unit_to_xml_element(unit: Unit, meta: dict | None = None):
-    # Ленивая локальная зависимость, чтобы не тянуть её наверх
-    import xml.etree.ElementTree as ET
-    el = ET.Element("unit")
-    ET.SubElement(el, "id").text = str(unit.id)
-    ET.SubElement(el, "number").text = unit.number or ""
-    ET.SubElement(el, "name").text = unit.name or ""
-    ET.SubElement(el, "type").text = unit.type or ""
-    ET.SubElement(el, "status").text = unit.status or ""
-    ET.SubElement(el, "machine").text = unit.machine or ""
-    ET.SubElement(el, "machine_number").text = unit.machine_number or ""
-    ET.SubElement(el, "accepted_at").text = unit.accepted_at.strftime('%Y-%m-%dT%H:%M:%S') if unit.accepted_at else ""
-    ET.SubElement(el, "created_at").text = unit.created_at.strftime('%Y-%m-%dT%H:%M:%S') if unit.created_at else ""
-    # Доп. сведения из событий
-    if meta:
-        ET.SubElement(el, "received_by").text = meta.get("received_by", "") or ""
-        ET.SubElement(el, "issued_by").text = meta.get("issued_by", "") or ""
-        ET.SubElement(el, "last_repair_at").text = meta.get("last_repair_at", "") or ""
-        ET.SubElement(el, "last_repair_summary").text = meta.get("last_repair_summary", "") or ""
-    return el
-
-
-async def _export_units_xml(message: Message, include_all: bool = False) -> None:
+# ===== Экспорт списка блоков (XML/CSV, gzip, части до лимита загрузки) =====
+
+
+async def _export_units(message: Message, include_all: bool = False, fmt: str = "xml") -> None:
+    """Поставить полную выгрузку в фон: прогресс и файлы придут в этот чат."""
     await ensure_db()
-    units: list[Unit] = []
-    if db_base.async_session is not None:
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    settings = get_settings()
+    await export_tasks.request(
+        message.bot,
+        message.chat.id,
+        include_all=include_all,
+        fmt=fmt,
+        max_bytes=settings.export_part_max_mb * 1024 * 1024,
+        step=settings.export_progress_step,
+        generated_at=message.date,
+    )
+
+
+def _command_fmt(message: Message, base: str) -> str:
+    # /export_csv gz — сжатый вариант
+    args = (message.text or "").lower().split()[1:]
+    return f"{base}.gz" if "gz" in args or "gzip" in args else base
+
+
+async def _export_delta(
+    message: Message,
+    consumer: str,
+    fmt: str,
+    since_event_id: int | None = None,
+    since: datetime | None = None,
+) -> None:
+    """Блоки, изменившиеся после курсора consumer (или после since_event_id / since).
+
+    Курсор сдвигается после отправки, и только без since: разовый запрос «с такого-то
+    события» не должен отнимать изменения у следующей обычной выгрузки потребителя.
+    """
+    await ensure_db()
+    if db_base.async_session is None or db_base.async_read_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    settings = get_settings()
+    with tempfile.TemporaryDirectory(prefix="export_") as tmp:
+        # Дельта лёгкая (по числу изменений) — общий лимит тяжёлых выгрузок не занимает.
+        # Читается с движка для чтения; курсор пишется в основную базу. Если реплика
+        # отстаёт, курсор тоже отстаёт: события повторятся в следующей дельте, но не потеряются
+        async with db_base.async_read_session() as session:
+            # Верхняя граница фиксируется до выборки: события, записанные во время
+            # выгрузки, попадут в следующую дельту, а не потеряются
+            upto = await last_event_id(session)
+            if since is not None:
+                first = await first_event_since(session, since)
+                after = first - 1 if first is not None else upto
+            elif since_event_id is not None:
+                after = since_event_id
+            else:
+                after = await get_cursor(session, consumer)
+            parts, changed = await export_delta(
+                session,
+                Path(tmp),
+                after_event_id=after,
+                upto_event_id=upto,
+                fmt=fmt,
+                max_bytes=settings.export_part_max_mb * 1024 * 1024,
+                generated_at=message.date,
+            )
+        title = f"Изменения ({consumer}): блоков {changed}, события {after + 1}–{upto}"
+        for i, path in enumerate(parts, 1):
+            caption = title if len(parts) == 1 else f"{title} (часть {i} из {len(parts)})"
+            await message.answer_document(FSInputFile(path, filename=path.name), caption=caption)
+    if since is None and since_event_id is None:
         async with db_base.async_session() as session:
-            q = select(Unit)
-            if not include_all:
-                # На складе: всё, что не выдано
-                from sqlalchemy import not_, literal
-                q = q.where(Unit.status != "issued")
-            q = q.order_by(Unit.number.asc(), Unit.name.asc())
-            rows = await session.execute(q)
-            units = rows.scalars().all()
-
-            # Подтянем события для доп. полей: received_by, issued_by, last_repair
-            unit_ids = [u.id for u in units]
-            metas: dict[int, dict] = {uid: {} for uid in unit_ids}
-            if unit_ids:
-                from sqlalchemy import or_, desc
-                ev_q = (
-                    select(UnitEvent)
-                    .where(UnitEvent.unit_id.in_(unit_ids))
-                    .where(UnitEvent.event_type.in_(["received", "issued", "repair_close"]))
-                    .order_by(UnitEvent.unit_id.asc(), UnitEvent.timestamp.desc())
-                )
-                ev_rows = await session.execute(ev_q)
-                events = ev_rows.scalars().all()
-                # Пробежим и заберём первые подходящие по типу для каждого unit
-                seen_received = set()
-                seen_issued = set()
-                seen_repair = set()
-                for e in events:
-                    uid = e.unit_id
-                    if e.event_type == "received" and uid not in seen_received:
-                        metas.setdefault(uid, {})["received_by"] = e.by_user_name or ""
-                        seen_received.add(uid)
-                    elif e.event_type == "issued" and uid not in seen_issued:
-                        metas.setdefault(uid, {})["issued_by"] = e.by_user_name or ""
-                        seen_issued.add(uid)
-                    elif e.event_type == "repair_close" and uid not in seen_repair:
-                        metas.setdefault(uid, {})["last_repair_at"] = (
-                            e.timestamp.strftime('%Y-%m-%dT%H:%M:%S') if e.timestamp else ""
-                        )
-                        metas[uid]["last_repair_summary"] = e.comment or ""
-                        seen_repair.add(uid)
-
-    # Построим XML
-    import xml.etree.ElementTree as ET
-    root = ET.Element("units")
-    root.set("generated_at", message.date.strftime('%Y-%m-%dT%H:%M:%S') if message.date else "")
-    root.set("scope", "all" if include_all else "in_stock")
-    # Если метаданные собрали
-    try:
-        metas
-    except NameError:
-        metas = {}
-    for u in units:
-        root.append(_unit_to_xml_element(u, metas.get(u.id)))
-    tree = ET.ElementTree(root)
-
-    # Сериализация в память
-    import io
-    bio = io.BytesIO()
-    tree.write(bio, encoding="utf-8", xml_declaration=True)
-    data = bio.getvalue()
-    filename = "units_all.xml" if include_all else "units_in_stock.xml"
-    await message.answer_document(BufferedInputFile(data, filename=filename), caption=("Все блоки" if include_all else "Блоки на складе"))
+            await save_cursor(session, consumer, upto)
+            await session.commit()
+    if not parts:
+        await message.answer(f"Изменений нет ({consumer}): новых событий после №{after} не было.")
+
+
+DELTA_USAGE = (
+    "Использование: /export_delta [потребитель] [csv|xml] [gz] [since=<№ события|ГГГГ-ММ-ДД[THH:MM]>]\n"
+    "Без since — изменения с прошлой выгрузки этого потребителя (время since — UTC), "
+    "с since — разовая выгрузка, курсор не сдвигается. Имя потребителя — только для администратора."
+)
+DELTA_DENIED = "Выгрузка изменений доступна после регистрации: /register"
+
+
+@router.message(Command("export_delta"))
+async def cmd_export_delta(message: Message) -> None:
+    """Дельта-экспорт: блоки, затронутые событиями после курсора потребителя."""
+    if message.from_user is None:
+        return
+    await ensure_db()
+    if not await has_access(message.from_user.id):
+        await message.answer(DELTA_DENIED)
+        return
+    consumer = f"tg{message.from_user.id}"
+    base, gz = "xml", False
+    since_event_id: int | None = None
+    since: datetime | None = None
+    for arg in (message.text or "").split()[1:]:
+        low = arg.lower()
+        if low in ("xml", "csv"):
+            base = low
+        elif low in ("gz", "gzip"):
+            gz = True
+        elif low.startswith("since="):
+            value = arg.split("=", 1)[1]
+            if value.isdigit():
+                since_event_id = int(value)
+            else:
+                since = _parse_since(value)
+                if since is None:
+                    await message.answer(DELTA_USAGE)
+                    return
+        elif len(arg) <= 64:
+            # Курсор внешней системы (erp и т.п.) двигает только администратор
+            if not is_admin(message.from_user.id):
+                await message.answer("Выгрузка для именованного потребителя доступна только администратору.")
+                return
+            consumer = arg
+        else:
+            await message.answer(DELTA_USAGE)
+            return
+    await _export_delta(message, consumer, f"{base}.gz" if gz else base, since_event_id, since)
+
+
+def _parse_since(value: str) -> datetime | None:
+    for fmt in ("%Y-%m-%dT%H:%M", "%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
 
 
 @router.message(Command("export_xml"))
 async def cmd_export_xml(message: Message) -> None:
     """Экспорт XML списка блоков на складе (все, кроме выданных)."""
-    await _export_units_xml(message, include_all=False)
+    await _export_units(message, include_all=False, fmt=_command_fmt(message, "xml"))
 
 
 @router.message(Command("export_xml_all"))
 async def cmd_export_xml_all(message: Message) -> None:
     """Экспорт XML полного списка блоков (все статусы)."""
-    await _export_units_xml(message, include_all=True)
+    await _export_units(message, include_all=True, fmt=_command_fmt(message, "xml"))
+
+
+@router.message(Command("export_csv"))
+async def cmd_export_csv(message: Message) -> None:
+    """Экспорт CSV списка блоков на складе."""
+    await _export_units(message, include_all=False, fmt=_command_fmt(message, "csv"))
+
 
+@router.message(Command("export_csv_all"))
+async def cmd_export_csv_all(message: Message) -> None:
+    """Экспорт CSV полного списка блоков."""
+    await _export_units(message, include_all=True, fmt=_command_fmt(message, "csv"))
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from aiogram import Router, F
 from aiogram.filters import StateFilter
-from aiogram.types import Message
+from aiogram.types import CallbackQuery, Message
+
+from ..keyboards.callbacks import is_stale
 
 router = Router(name=__name__)
 
@@ -11,3 +13,13 @@ router = Router(name=__name__)
 async def echo_text(message: Message) -> None:
     # Простое эхо на любые текстовые сообщения, не перехваченные другими хендлерами
     await message.answer(f"Эхо: {message.text}")
+
+
+@router.callback_query()
+async def unhandled_callback(callback: CallbackQuery) -> None:
+    # Кнопки без своего хендлера: "noop", кнопки завершённых сценариев, истёкшие
+    # токены callback_data. Отвечаем, чтобы у кнопки не крутились «часики»
+    if is_stale(callback.data):
+        await callback.answer("Кнопка устарела — откройте меню заново.", show_alert=True)
+    else:
+        await callback.answer()
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from ..db import base as db_base
+from ..db.models import ExportSubscriber
+from ..config import get_settings
+from ..db.base import setup_engine, init_db
+from ..services.export import Progress
+from ..services.export_scheduler import export_scheduler
+from ..services.export_tasks import export_tasks
+
+router = Router(name=__name__)
+
+
+async def ensure_db() -> None:
+    if db_base.async_session is None:
+        settings = get_settings()
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
+        await init_db()
+
+
+def _is_admin(message: Message) -> bool:
+    return message.from_user is not None and message.from_user.id in get_settings().admin_tg_ids
+
+
+@router.message(Command("export_schedule"))
+async def cmd_export_schedule(message: Message) -> None:
+    """Задания выгрузок по расписанию: ближайший запуск и результат последнего."""
+    if not _is_admin(message):
+        await message.answer("Команда доступна только администратору.")
+        return
+    await ensure_db()
+    subscribed = False
+    if db_base.async_session is not None:
+        async with db_base.async_session() as session:
+            subscribed = await session.get(ExportSubscriber, message.from_user.id) is not None
+    if not export_scheduler.jobs:
+        lines = ["Выгрузки по расписанию не настроены (EXPORT_SCHEDULE)."]
+    else:
+        lines = [f"Выгрузки по расписанию (каталог {export_scheduler.directory}):"]
+        for job, when in export_scheduler.schedule():
+            last = f"{job.last_run.strftime('%d-%m %H:%M')} — {job.last_result}" if job.last_run else "ещё не было"
+            lines.append(f"• {job.name}: следующая {when.strftime('%d-%m %H:%M')}, последняя: {last}")
+    lines.append("")
+    lines.append("Вы подписаны на рассылку." if subscribed else "Вы не подписаны: /export_subscribe")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("export_subscribe"))
+async def cmd_export_subscribe(message: Message) -> None:
+    if not _is_admin(message):
+        await message.answer("Команда доступна только администратору.")
+        return
+    await ensure_db()
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    async with db_base.async_session() as session:
+        if await session.get(ExportSubscriber, message.from_user.id) is None:
+            session.add(ExportSubscriber(tg_id=message.from_user.id, created_at=datetime.utcnow()))
+            await session.commit()
+    await message.answer("Выгрузки по расписанию будут приходить сюда. Отписаться: /export_unsubscribe")
+
+
+@router.message(Command("export_unsubscribe"))
+async def cmd_export_unsubscribe(message: Message) -> None:
+    if message.from_user is None:
+        return
+    await ensure_db()
+    if db_base.async_session is None:
+        return
+    async with db_base.async_session() as session:
+        sub = await session.get(ExportSubscriber, message.from_user.id)
+        if sub is not None:
+            await session.delete(sub)
+            await session.commit()
+    await message.answer("Рассылка выгрузок отключена.")
+
+
+@router.message(Command("export_run"))
+async def cmd_export_run(message: Message) -> None:
+    """Выгрузить задание расписания сейчас: /export_run stock-csv.gz (файлы — вызвавшему).
+
+    Идёт фоном, как выгрузки по кнопкам: прогресс, отмена, общая очередь export_slots.
+    В каталог расписания не пишется и курсор дельты задания не сдвигает — подписчики
+    получат те же изменения в очередной рассылке.
+    """
+    if not _is_admin(message):
+        await message.answer("Команда доступна только администратору.")
+        return
+    args = (message.text or "").split()[1:]
+    jobs = {job.name: job for job in export_scheduler.jobs}
+    job = jobs.get(args[0]) if args else None
+    if job is None:
+        names = ", ".join(jobs) or "нет заданий"
+        await message.answer(f"Использование: /export_run <задание>. Задания: {names}")
+        return
+    await ensure_db()
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    when = datetime.now()
+
+    async def build(directory: Path, counted: Progress, progress: Progress) -> list[Path]:
+        parts, _, _ = await export_scheduler.export(job, directory, when, counted=counted, progress=progress)
+        return parts
+
+    await export_tasks.start(
+        message.bot,
+        message.chat.id,
+        ("job", job.name),
+        f"Задание {job.name}",
+        job.fmt,
+        build,
+        step=get_settings().export_progress_step,
+    )
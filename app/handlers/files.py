@@ -3,6 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 
 from aiogram import Router, F
+from aiogram.filters import StateFilter
 from aiogram.types import Message
 from aiogram import Bot
 
@@ -14,7 +15,8 @@ router = Router(name=__name__)
 file_service = FileService()
 
 
-@router.message(F.document)
+# Только вне сценариев: файлы внутри FSM (модель в /print, фото) обрабатывают их хендлеры
+@router.message(StateFilter(None), F.document)
 async def handle_document(message: Message, bot: Bot) -> None:
     doc = message.document
     assert doc is not None
@@ -41,7 +43,7 @@ async def handle_document(message: Message, bot: Bot) -> None:
     await message.answer(f"Файл сохранён: {filename}")
 
 
-@router.message(F.photo)
+@router.message(StateFilter(None), F.photo)
 async def handle_photo(message: Message, bot: Bot) -> None:
     # Берём фото максимального размера
     photo = message.photo[-1]
@@ -15,19 +15,36 @@ async def cmd_help(message: Message) -> None:
         "• /help — эта справка.\n\n"
         "Управление блоками:\n"
         "• /blocks — открыть раздел 'Блоки' с кнопками (Принять, Выдать, Ремонт).\n"
-        "• /unit <номер> — показать карточку блока по номеру (если несколько — будет выбор).\n\n"
+        "• /receive_batch — пакетная приёмка: список блоков текстом или CSV, одно подтверждение.\n"
+        "• /issue_batch — выдать несколько готовых блоков на одну машину (номера списком, выбор галочками).\n"
+        "• /machine [РА] [номер] — блоки на машине и история выдач на неё (например: /machine РА2 113-02).\n"
+        "• /repair_stats [дней] — сводка ремонтов по типам блоков: сколько начато/завершено, среднее время.\n"
+        "• /stats — сводка склада: остатки по статусам, типам и состоянию, принято/выдано за неделю.\n"
+        "• /unit <номер> — показать карточку блока по номеру (если несколько — будет выбор).\n"
+        "• @имя_бота <начало номера или названия> в любом чате — поиск блоков; "
+        "«Открыть карточку» ведёт в чат с ботом.\n\n"
         "Регистрация пользователей:\n"
         "• /register — отправить ФИО для регистрации.\n"
-        "• /approve <tg_id> — (админ) активировать пользователя.\n\n"
+        "• /approve <tg_id> — (админ) активировать пользователя.\n"
+        "• /stats_rebuild — (админ) пересчитать сводки /stats и /repair_stats с нуля.\n"
+        "• /export_schedule, /export_subscribe, /export_run <задание> — (админ) выгрузки по расписанию.\n\n"
         "3D-печать:\n"
         "• /print — создать заявку на печать (STL/3MF, фото, принтер, время печати).\n"
         "• /printers — список принтеров и статус обслуживания.\n"
         "• /add_printer <имя> — добавить принтер.\n"
-        "• /maint <имя> <минут> — перевести принтер в обслуживание на N минут.\n\n"
+        "• /maint <имя> <минут> — перевести принтер в обслуживание на N минут.\n"
+        "• /queue — очередь печати с ETA по принтерам (распределяет новые заявки).\n"
+        "• /job <id> done|failed|canceled — завершить заявку; следующая в очереди уходит в печать.\n\n"
         "Экспорт:\n"
         "• /export_xml — экспорт XML списка блоков на складе (без выданных).\n"
-        "• /export_xml_all — экспорт XML всех блоков.\n\n"
+        "• /export_xml_all — экспорт XML всех блоков.\n"
+        "• /export_csv, /export_csv_all — то же в CSV (разделитель ';', открывается в Excel).\n"
+        "• Добавьте gz для сжатого файла: /export_csv_all gz. Большой экспорт приходит несколькими частями.\n"
+        "• Выгрузка идёт в фоне: прогресс — в сообщении, там же кнопка отмены.\n"
+        "• /export_delta [потребитель] [csv] [gz] [since=№|дата] — только блоки, изменившиеся с прошлой выгрузки "
+        "этого потребителя (выданные помечены change=delete). Именованный потребитель — только админ; "
+        "с since выгрузка разовая, курсор не сдвигается.\n\n"
         "Подсказки:\n"
         "• Отправляйте документы/фото — бот их сохранит.\n"
-        "• Раздел 'Блоки' поддерживает историю событий, быстрые действия и экспорт XML.\n"
+        "• Раздел 'Блоки' поддерживает историю событий, быстрые действия и экспорт (XML/CSV, gzip).\n"
     )
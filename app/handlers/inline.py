@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from html import escape
+
+from aiogram import Router
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+)
+from aiogram.utils.deep_linking import create_deep_link
+
+from ..db import base as db_base
+from ..config import get_settings
+from ..db.base import setup_engine, init_db
+from ..services.unit_search import unit_search
+from ..services.units import UnitCard
+from .access import has_access
+
+router = Router(name=__name__)
+
+# Inline-режим: «@бот 105» в любом чате — блоки, у которых номер или название
+# начинается с 105; статья открывает карточку в личке с ботом (/start unit_<id>).
+# Включается у @BotFather: /setinline.
+# Сколько Telegram держит ответ у себя; is_personal — отдельно для каждого
+# пользователя, иначе кэш Telegram раздал бы результаты и тем, у кого нет доступа
+INLINE_CACHE_TIME = 30
+DEEP_LINK_PREFIX = "unit_"
+
+
+async def ensure_db() -> None:
+    if db_base.async_session is None:
+        settings = get_settings()
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
+        await init_db()
+
+
+def _article(unit: UnitCard, username: str) -> InlineQueryResultArticle:
+    machine = f"{unit.machine} {unit.machine_number or ''}".strip() if unit.machine else "без привязки"
+    summary = f"{unit.type or '-'} | {unit.status} | машина: {machine}"
+    link = create_deep_link(username, "start", f"{DEEP_LINK_PREFIX}{unit.id}")
+    return InlineQueryResultArticle(
+        id=str(unit.id),
+        title=f"{unit.number} — {unit.name or '-'}",
+        description=summary,
+        input_message_content=InputTextMessageContent(
+            message_text=escape(f"Блок {unit.number} — {unit.name or '-'}\n{summary}")
+        ),
+        reply_markup=InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text="🗂 Открыть карточку", url=link)]]
+        ),
+    )
+
+
+@router.inline_query()
+async def inline_units(query: InlineQuery) -> None:
+    await ensure_db()
+    if not await has_access(query.from_user.id):
+        await query.answer(
+            [],
+            cache_time=INLINE_CACHE_TIME,
+            is_personal=True,
+            button=InlineQueryResultsButton(text="Поиск доступен после регистрации", start_parameter="register"),
+        )
+        return
+    found = await unit_search.search(query.from_user.id, query.query)
+    if found is None:
+        return  # пользователь уже набрал следующий символ — отвечать будем на него
+    username = (await query.bot.me()).username or ""
+    await query.answer(
+        [_article(u, username) for u in found], cache_time=INLINE_CACHE_TIME, is_personal=True
+    )
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import List, Optional
 
 from aiogram import Router, F
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
@@ -10,14 +12,21 @@ from aiogram.types import CallbackQuery, Message
 from sqlalchemy import select
 
 from ..db import base as db_base
-from ..db.models import Unit, User, UnitEvent
-from ..keyboards.receive import choices_paged_kb, ra_kb, skip_kb
+from ..db.queries import UNIT_BY_ID, UNITS_BY_NUMBER
+from ..keyboards.callbacks import ChoiceAction, ChoiceCb, UnitAction, UnitCb
+from ..keyboards.receive import choices_paged_kb, choices_toggle_kb, ra_kb, skip_kb
 from ..config import get_settings
 from ..keyboards import main_menu_kb
 from ..db.base import setup_engine, init_db
+from ..services.batch_issue import MAX_ISSUE_UNITS, find_by_numbers, issue_units, parse_numbers
+from ..services.users import resolve_actor
+from .navigation import show_markup
 
 router = Router(name=__name__)
 
+# Сколько строк списка блоков показывать в одном сообщении
+ISSUE_MESSAGE_LINES = 30
+
 
 class IssueStates(StatesGroup):
     number = State()
@@ -25,12 +34,14 @@ class IssueStates(StatesGroup):
     destination_machine = State()
     destination_number = State()
     confirm = State()
+    batch_numbers = State()
+    batch_choice = State()
 
 
 async def ensure_db() -> None:
     if db_base.async_session is None:
         settings = get_settings()
-        setup_engine(settings.database_url)
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
         await init_db()
 
 
@@ -53,12 +64,7 @@ async def set_number(message: Message, state: FSMContext) -> None:
     items: List[tuple[int, str, str]] = []
     if db_base.async_session is not None:
         async with db_base.async_session() as session:
-            q = (
-                select(Unit.id, Unit.name, Unit.type, Unit.status)
-                .where(Unit.number == number)
-                .order_by(Unit.name.asc(), Unit.type.asc())
-            )
-            rows = await session.execute(q)
+            rows = await session.execute(UNITS_BY_NUMBER, {"number": number})
             for r in rows.all():
                 unit_id, name, type_, status = r
                 label = f"{name or '-'} | {type_ or '-'} | {status}"
@@ -74,21 +80,17 @@ async def set_number(message: Message, state: FSMContext) -> None:
     await message.answer("Выберите блок для выдачи:", reply_markup=choices_paged_kb([i[2] for i in items], "issue:unit", page=0, page_size=5))
 
 
-@router.callback_query(F.data.startswith("unit:issue:"))
-async def start_issue_from_card(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(UnitCb.filter(F.action == UnitAction.issue))
+async def start_issue_from_card(callback: CallbackQuery, callback_data: UnitCb, state: FSMContext) -> None:
     """Старт выдачи из карточки блока по unit_id."""
     await callback.answer()
-    try:
-        unit_id = int((callback.data or "").split(":")[-1])
-    except Exception:
-        await callback.message.answer("Некорректный идентификатор блока")
-        return
+    unit_id = callback_data.unit_id
 
     await ensure_db()
     status_ok = False
     if db_base.async_session is not None:
         async with db_base.async_session() as session:
-            u = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
+            u = (await session.execute(UNIT_BY_ID, {"unit_id": unit_id})).scalar_one_or_none()
             if u and u.status == "done":
                 status_ok = True
     if not status_ok:
@@ -101,26 +103,22 @@ async def start_issue_from_card(callback: CallbackQuery, state: FSMContext) -> N
     await callback.message.answer("Укажите место назначения (РА1/РА2/РА3) или пропустите:", reply_markup=ra_kb())
 
 
-@router.callback_query(IssueStates.unit_choice, F.data.startswith("issue:unit:page:"))
-async def unit_page(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(IssueStates.unit_choice, ChoiceCb.filter((F.scope == "issue:unit") & (F.action == ChoiceAction.page)))
+async def unit_page(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     labels: List[str] = data.get("unit_labels", [])
-    try:
-        page = int((callback.data or "").split(":")[-1])
-    except ValueError:
-        page = 0
-    await callback.message.edit_reply_markup(reply_markup=choices_paged_kb(labels, "issue:unit", page=page, page_size=5))
+    await show_markup(callback, choices_paged_kb(labels, "issue:unit", page=callback_data.page, page_size=5))
 
 
-@router.callback_query(IssueStates.unit_choice, F.data.startswith("issue:unit:idx:"))
-async def unit_pick(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(IssueStates.unit_choice, ChoiceCb.filter((F.scope == "issue:unit") & (F.action == ChoiceAction.idx)))
+async def unit_pick(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     unit_ids: List[int] = data.get("unit_ids", [])
     unit_names: List[str] = data.get("unit_names", [])
     try:
-        idx = int((callback.data or "").split(":")[-1])
+        idx = callback_data.idx
         unit_id = unit_ids[idx]
     except Exception:
         await callback.message.answer("Ошибка выбора. Повторите ввод номера.")
@@ -132,7 +130,7 @@ async def unit_pick(callback: CallbackQuery, state: FSMContext) -> None:
     unit_label = unit_names[idx] if 0 <= idx < len(unit_names) else "-"
     if db_base.async_session is not None:
         async with db_base.async_session() as session:
-            u = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
+            u = (await session.execute(UNIT_BY_ID, {"unit_id": unit_id})).scalar_one_or_none()
             if u and u.status == "done":
                 status_ok = True
                 unit_label = f"{u.name or '-'} | {u.type or '-'} | готов"
@@ -180,10 +178,11 @@ async def issue_set_machine_number(message: Message, state: FSMContext) -> None:
 
 async def ask_issue_confirm(target_message: Message | CallbackQuery, state: FSMContext) -> None:
     data = await state.get_data()
-    unit_id = data.get("unit_id")
     dest_machine = data.get("dest_machine")
     dest_number = data.get("dest_machine_number")
     label = f"Назначение: {dest_machine or '—'} {dest_number or ''}".strip()
+    if data.get("issue_ids"):
+        label = f"Блоков: {len(data['issue_ids'])}. {label}"
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="✅ Выдать", callback_data="issue:confirm:yes")],
@@ -207,74 +206,168 @@ async def issue_cancel(callback: CallbackQuery, state: FSMContext) -> None:
 async def issue_confirm(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
-    unit_id: Optional[int] = data.get("unit_id")
-    if not isinstance(unit_id, int):
+    # Один блок (unit_id) или несколько (issue_ids) — выдаются одинаково, одной транзакцией
+    unit_ids: List[int] = list(data.get("issue_ids") or [])
+    if not unit_ids and isinstance(data.get("unit_id"), int):
+        unit_ids = [data["unit_id"]]
+    if not unit_ids:
         await callback.message.answer("Ошибка состояния. Начните заново.")
         await state.clear()
         return
+    dest_machine: Optional[str] = data.get("dest_machine")
+    dest_number: Optional[str] = data.get("dest_machine_number")
+    # Сразу выходим из состояния: повторное нажатие не создаст вторую пачку событий
+    await state.clear()
 
     await ensure_db()
-    issued_at_str = None
-    issued_unit = None
-    issued_by = None
-    dest_machine = None
-    dest_number = None
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            u = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
-            if not u:
-                await callback.message.answer("Блок не найден.")
-                await state.clear()
-                return
-            u.status = "issued"
-            # Определим выдавшего пользователя и фамилию
-            by_user = None
-            by_name = None
-            if callback.from_user is not None:
-                user = (await session.execute(select(User).where(User.tg_id == callback.from_user.id))).scalar_one_or_none()
-                if user:
-                    by_user = user.id
-                    if user.full_name:
-                        by_name = user.full_name.split()[0]
-                if by_name is None:
-                    # fallback к данным Telegram
-                    ln = callback.from_user.last_name or ""
-                    fn = callback.from_user.first_name or ""
-                    by_name = (ln or fn) or None
-            # Достаем назначение из state
-            data = await state.get_data()
-            dest_machine = data.get("dest_machine")
-            dest_number = data.get("dest_machine_number")
-            # Пишем событие
-            evt = UnitEvent(
-                unit_id=unit_id,
-                event_type="issued",
-                by_user_id=by_user,
-                by_user_name=by_name,
-                destination_machine=dest_machine,
-                destination_machine_number=dest_number,
+    if db_base.async_session is None:
+        await callback.message.answer("База данных не инициализирована.")
+        return
+    async with db_base.async_session() as session:
+        by_user, by_name = await resolve_actor(session, callback.from_user)
+        issued, skipped = await issue_units(
+            session,
+            unit_ids,
+            by_user_id=by_user,
+            by_user_name=by_name,
+            machine=dest_machine,
+            machine_number=dest_number,
+        )
+        await session.commit()
+    issued_at_str = datetime.now().strftime('%d-%m-%Y %H:%M')
+
+    if not issued:
+        if skipped:
+            await callback.message.answer(
+                "Блоки не выданы: ремонт не завершён (статус не 'done').", reply_markup=main_menu_kb()
             )
-            session.add(evt)
-            await session.commit()
-            # Подготовим данные для карточки
-            issued_unit = u
-            issued_by = by_name
-            from datetime import datetime as _dt
-            issued_at_str = _dt.now().strftime('%d-%m-%Y %H:%M')
-
-    # Итоговая карточка
-    if issued_unit is not None:
+        else:
+            await callback.message.answer("Блок не найден.", reply_markup=main_menu_kb())
+        return
+
+    if len(unit_ids) == 1:
+        u = issued[0]
         lines = [
             "Выдача оформлена:",
-            f"Название: {issued_unit.name}",
-            f"Тип: {issued_unit.type}",
-            f"Номер: {issued_unit.number}",
+            f"Название: {u.name}",
+            f"Тип: {u.type}",
+            f"Номер: {u.number}",
             f"Статус: issued",
-            f"Куда: {dest_machine or '—'} {dest_number or ''}",
-            f"Кто выдал: {issued_by or '—'}",
-            f"Время: {issued_at_str or ''}",
         ]
-        await callback.message.answer("\n".join(lines), reply_markup=main_menu_kb())
     else:
-        await callback.message.answer("Блок выдан. Статус: issued", reply_markup=main_menu_kb())
+        lines = [f"Выдача оформлена, блоков: {len(issued)}"]
+        lines += [f"• {u.label}" for u in issued[:ISSUE_MESSAGE_LINES]]
+        if len(issued) > ISSUE_MESSAGE_LINES:
+            lines.append(f"… и ещё {len(issued) - ISSUE_MESSAGE_LINES}")
+    lines += [
+        f"Куда: {dest_machine or '—'} {dest_number or ''}",
+        f"Кто выдал: {by_name or '—'}",
+        f"Время: {issued_at_str}",
+    ]
+    if skipped:
+        lines.append("Не выданы (статус не 'done'): " + ", ".join(f"{u.number} ({u.status})" for u in skipped))
+    await callback.message.answer("\n".join(lines), reply_markup=main_menu_kb())
+
+
+# ===== Выдача нескольких блоков =====
+
+ISSUE_BATCH_HELP = (
+    "Выдача нескольких блоков на одну машину.\n"
+    "Отправьте номера блоков через пробел, запятую или каждый с новой строки "
+    f"(не больше {MAX_ISSUE_UNITS})."
+)
+
+
+@router.callback_query(F.data == "blocks:issue_batch")
+async def start_issue_batch(callback: CallbackQuery, state: FSMContext) -> None:
+    await callback.answer()
+    await state.clear()
+    await state.set_state(IssueStates.batch_numbers)
+    await callback.message.answer(ISSUE_BATCH_HELP)
+
+
+@router.message(Command("issue_batch"))
+async def cmd_issue_batch(message: Message, state: FSMContext) -> None:
     await state.clear()
+    await state.set_state(IssueStates.batch_numbers)
+    await message.answer(ISSUE_BATCH_HELP)
+
+
+@router.message(IssueStates.batch_numbers, F.text)
+async def issue_batch_numbers(message: Message, state: FSMContext) -> None:
+    numbers = parse_numbers(message.text or "")
+    if not numbers:
+        await message.answer("Не вижу номеров. Отправьте список ещё раз:")
+        return
+    if len(numbers) > MAX_ISSUE_UNITS:
+        await message.answer(f"Слишком много номеров: {len(numbers)}. Не больше {MAX_ISSUE_UNITS} за раз.")
+        return
+
+    await ensure_db()
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        await state.clear()
+        return
+    async with db_base.async_session() as session:
+        found = await find_by_numbers(session, numbers)
+
+    ready = [u for u in found if u.status == "done"]
+    found_numbers = {u.number for u in found}
+    notes: List[str] = []
+    missing = [n for n in numbers if n not in found_numbers]
+    if missing:
+        notes.append("Не найдены: " + ", ".join(missing))
+    not_ready = [u for u in found if u.status != "done"]
+    if not_ready:
+        notes.append("Не готовы к выдаче: " + ", ".join(f"{u.number} ({u.status})" for u in not_ready))
+    if not ready:
+        await message.answer("\n".join(["Нет блоков, готовых к выдаче (статус 'done')."] + notes + ["Отправьте другой список:"]))
+        return
+
+    # Отмечаем сразу только однозначные номера; если под одним номером несколько
+    # готовых блоков (разные названия), нужный выбирают вручную
+    per_number: dict[str, int] = {}
+    for u in ready:
+        per_number[u.number] = per_number.get(u.number, 0) + 1
+    selected = [i for i, u in enumerate(ready) if per_number[u.number] == 1]
+    labels = [u.label for u in ready]
+    await state.update_data(
+        issue_choice_ids=[u.id for u in ready],
+        issue_choice_labels=labels,
+        issue_selected=selected,
+    )
+    await state.set_state(IssueStates.batch_choice)
+    text = [f"Готовы к выдаче: {len(ready)}. Отметьте блоки и нажмите «Далее»."] + notes
+    await message.answer("\n".join(text), reply_markup=choices_toggle_kb(labels, selected, "issue:multi", page=0))
+
+
+@router.callback_query(IssueStates.batch_choice, ChoiceCb.filter(F.scope == "issue:multi"))
+async def issue_batch_choice(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
+    data = await state.get_data()
+    labels: List[str] = data.get("issue_choice_labels", [])
+    ids: List[int] = data.get("issue_choice_ids", [])
+    selected = set(data.get("issue_selected", []))
+    action, page = callback_data.action, callback_data.page
+    if action == ChoiceAction.tgl and 0 <= callback_data.idx < len(ids):
+        selected ^= {callback_data.idx}
+    elif action == ChoiceAction.all:
+        selected = set(range(len(ids)))
+    elif action == ChoiceAction.none:
+        selected = set()
+    elif action == ChoiceAction.done:
+        if not selected:
+            await callback.answer("Не выбрано ни одного блока", show_alert=True)
+            return
+        await callback.answer()
+        await state.update_data(issue_ids=[ids[i] for i in sorted(selected)])
+        await state.set_state(IssueStates.destination_machine)
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.message.answer(
+            f"Выбрано блоков: {len(selected)}. Укажите место назначения (РА1/РА2/РА3) или пропустите:",
+            reply_markup=ra_kb(),
+        )
+        return
+
+    await callback.answer()
+    await state.update_data(issue_selected=sorted(selected))
+    await show_markup(callback, choices_toggle_kb(labels, selected, "issue:multi", page=page))
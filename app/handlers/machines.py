@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, Message
+
+from ..db import base as db_base
+from ..config import get_settings
+from ..db.base import setup_engine, init_db
+from ..keyboards.callbacks import MachineCb, MachineView
+from ..keyboards.machines import machine_history_kb, machine_numbers_kb, machine_units_kb, machines_kb
+from ..services.machines import MACHINES, machine_issues, machine_numbers, machine_units, normalize_machine
+from .navigation import show
+
+router = Router(name=__name__)
+
+PAGE_SIZE = 10
+
+
+async def ensure_db() -> None:
+    if db_base.async_session is None:
+        settings = get_settings()
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
+        await init_db()
+
+
+def _ra(machine: str) -> str:
+    return machine.replace("RA", "РА")
+
+
+@router.message(Command("machine"))
+async def cmd_machine(message: Message) -> None:
+    """/machine — выбор РА; /machine РА2 — номера машин; /machine РА2 113-02 — блоки на машине."""
+    args = (message.text or "").split(maxsplit=2)[1:]
+    if not args:
+        await message.answer("Выберите машину:", reply_markup=machines_kb(MACHINES))
+        return
+    machine = normalize_machine(args[0])
+    if machine is None:
+        await message.answer("Использование: /machine <РА1|РА2|РА3> [номер]. Пример: /machine РА2 113-02")
+        return
+    if len(args) == 1:
+        await show_numbers(message, machine, None)
+    else:
+        await show_units(message, machine, args[1].strip(), 0)
+
+
+@router.callback_query(F.data == "blocks:machines")
+async def cb_machines(callback: CallbackQuery) -> None:
+    await callback.answer()
+    await show(callback, "Выберите машину:", machines_kb(MACHINES))
+
+
+@router.callback_query(MachineCb.filter())
+async def cb_machine_nav(callback: CallbackQuery, callback_data: MachineCb) -> None:
+    await callback.answer()
+    machine = callback_data.machine
+    if machine not in MACHINES:
+        return
+    if callback_data.view == MachineView.numbers:
+        await show_numbers(callback, machine, callback_data.number or None)
+    elif callback_data.view == MachineView.units:
+        await show_units(callback, machine, callback_data.number, callback_data.cursor)
+    else:
+        await show_history(callback, machine, callback_data.number, callback_data.cursor or None)
+
+
+async def show_numbers(target: Message | CallbackQuery, machine: str, after: str | None) -> None:
+    await ensure_db()
+    if db_base.async_session is None:
+        return
+    async with db_base.async_session() as session:
+        numbers, has_next = await machine_numbers(session, machine, after, PAGE_SIZE)
+    if not numbers and after is None:
+        await show(target, f"{_ra(machine)}: нет блоков с привязкой к номеру машины.", machines_kb(MACHINES))
+        return
+    await show(target, f"{_ra(machine)}: выберите номер машины:", machine_numbers_kb(machine, numbers, has_next))
+
+
+async def show_units(target: Message | CallbackQuery, machine: str, number: str, after_id: int) -> None:
+    await ensure_db()
+    if db_base.async_session is None:
+        return
+    async with db_base.async_session() as session:
+        units, has_next = await machine_units(session, machine, number, after_id, PAGE_SIZE)
+    title = f"Машина {_ra(machine)} {number}"
+    if not units:
+        text = f"{title}: привязанных блоков нет." if after_id == 0 else f"{title}: больше блоков нет."
+    else:
+        lines = [f"{title} — блоки:"]
+        lines += [f"• {u.number} | {u.name or '-'} | {u.type or '-'} | {u.status}" for u in units]
+        text = "\n".join(lines)
+    last_id = units[-1].id if units else None
+    await show(target, text, machine_units_kb(machine, number, last_id, has_next, at_start=after_id == 0))
+
+
+async def show_history(target: Message | CallbackQuery, machine: str, number: str, before_event_id: int | None) -> None:
+    await ensure_db()
+    if db_base.async_session is None:
+        return
+    async with db_base.async_session() as session:
+        issues, has_next = await machine_issues(session, machine, number, before_event_id, PAGE_SIZE)
+    title = f"Машина {_ra(machine)} {number}"
+    if not issues:
+        text = f"{title}: выдач не было." if before_event_id is None else f"{title}: более ранних выдач нет."
+    else:
+        lines = [f"{title} — история выдач:"]
+        for e in issues:
+            ts = e.timestamp.strftime('%d-%m-%Y %H:%M') if e.timestamp else ''
+            lines.append(f"📤 {ts}: {e.number} | {e.name or '-'} | {e.type or '-'} (кем: {e.by_user_name or '—'})")
+        text = "\n".join(lines)
+    last_event_id = issues[-1].event_id if issues else None
+    await show(target, text, machine_history_kb(machine, number, last_event_id, has_next, at_start=before_event_id is None))
@@ -0,0 +1,91 @@
+"""Навигация правкой сообщения на месте.
+
+Карточки, история, меню и листание списков по кнопкам не шлют новое сообщение
+на каждый клик: правится сообщение с нажатой кнопкой (editMessageText или
+editMessageReplyMarkup). Новое сообщение уходит, только если править нельзя:
+ответ на команду, сообщение недоступно боту или старше EDIT_MAX_AGE, в нём нет
+текста (фото, документ), Telegram отказал в правке. Если показанное уже совпадает
+с новым (повторное нажатие той же кнопки) — запроса к API нет вовсе.
+
+Не роутер: хендлеры импортируют show/show_markup.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+
+from ..logger import logger
+
+# Старые сообщения Telegram править не даёт (в группах — 48 ч)
+EDIT_MAX_AGE = timedelta(hours=48)
+
+
+def _editable(target: Message | CallbackQuery, need_text: bool = True) -> Message | None:
+    if isinstance(target, Message):
+        return None  # команда или текст — отвечаем новым сообщением
+    msg = target.message
+    if not isinstance(msg, Message) or (need_text and msg.text is None):
+        return None
+    if datetime.now(timezone.utc) - msg.date > EDIT_MAX_AGE:
+        return None
+    return msg
+
+
+def _same_markup(shown: InlineKeyboardMarkup | None, kb: InlineKeyboardMarkup | None) -> bool:
+    # Пришедшая с апдейтом разметка привязана к боту (приватные поля) — сравниваем данные
+    if shown is None or kb is None:
+        return shown is kb
+    return shown.model_dump(exclude_none=True) == kb.model_dump(exclude_none=True)
+
+
+def _not_modified(exc: TelegramBadRequest) -> bool:
+    return "message is not modified" in str(exc)
+
+
+async def _send(target: Message | CallbackQuery, text: str, kb: InlineKeyboardMarkup | None) -> None:
+    if isinstance(target, Message):
+        await target.answer(text, reply_markup=kb)
+    elif target.message is not None:
+        await target.bot.send_message(target.message.chat.id, text, reply_markup=kb)
+    else:
+        await target.bot.send_message(target.from_user.id, text, reply_markup=kb)
+
+
+async def show(target: Message | CallbackQuery, text: str, kb: InlineKeyboardMarkup | None = None) -> None:
+    """Показать экран: правкой сообщения с кнопкой или новым сообщением."""
+    msg = _editable(target)
+    if msg is None:
+        await _send(target, text, kb)
+        return
+    if msg.text == text and _same_markup(msg.reply_markup, kb):
+        return
+    try:
+        await msg.edit_text(text, reply_markup=kb)
+    except TelegramBadRequest as exc:
+        if _not_modified(exc):
+            return
+        logger.debug("Cannot edit message {}, sending a new one: {}", msg.message_id, exc)
+        await _send(target, text, kb)
+
+
+async def show_markup(callback: CallbackQuery, kb: InlineKeyboardMarkup | None) -> None:
+    """Сменить только клавиатуру (страница списка, переключатель формата)."""
+    msg = _editable(callback, need_text=False)
+    if msg is None:
+        # Слишком старое или недоступное: показываем клавиатуру заново с тем же текстом
+        text = callback.message.text if isinstance(callback.message, Message) else None
+        if text:
+            await _send(callback, text, kb)
+        return
+    if _same_markup(msg.reply_markup, kb):
+        return
+    try:
+        await msg.edit_reply_markup(reply_markup=kb)
+    except TelegramBadRequest as exc:
+        if _not_modified(exc):
+            return
+        logger.debug("Cannot edit markup of {}, sending a new message: {}", msg.message_id, exc)
+        if msg.text:
+            await _send(callback, msg.text, kb)
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import math
+import tempfile
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Optional
 
 from aiogram import Router, F
@@ -12,18 +16,29 @@ from aiogram.types import Message, CallbackQuery
 from sqlalchemy import select
 
 from ..db import base as db_base
-from ..db.models import User, PrintJob, PrintEvent, Printer
+from ..db.models import PrintJob, PrintEvent
+from ..db.queries import PRINT_JOB_BY_ID, USER_ID_BY_TG_ID
 from ..config import get_settings
 from ..db.base import setup_engine, init_db
-from ..keyboards.printing import print_confirm_kb
+from ..keyboards.printing import print_confirm_kb, print_time_kb
+from ..logger import logger
+from ..services.print_queue import assign_pending, held_printer, promote_next
+from ..services.gcode import GcodeStats, analyze_gcode
+from ..services.model_analysis import MeshStats, ModelFormatError, analyze_model, estimate_minutes, profile_for
+from ..services.printers import printer_registry
 
 router = Router(name=__name__)
 
+QUEUE_VIEW_PER_PRINTER = 10
+FINAL_JOB_STATUSES = ("done", "failed", "canceled")
+# Bot API отдаёт ботам файлы не больше 20 МБ — большие модели не анализируем
+MAX_ANALYZE_BYTES = 20 * 1024 * 1024
+
 
 async def ensure_db() -> None:
     if db_base.async_session is None:
         settings = get_settings()
-        setup_engine(settings.database_url)
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
         await init_db()
 
 
@@ -40,7 +55,7 @@ async def start_print(message: Message, state: FSMContext) -> None:
     await state.clear()
     await state.set_state(PrintStates.file)
     await message.answer(
-        "Загрузите файл модели для печати (STL или 3MF). Можно переслать как документ."
+        "Загрузите файл модели для печати (STL, 3MF или G-code). Можно переслать как документ."
     )
 
 
@@ -48,16 +63,65 @@ def _is_allowed_model(filename: str | None) -> bool:
     if not filename:
         return False
     fn = filename.lower()
-    return fn.endswith(".stl") or fn.endswith(".3mf")
+    return fn.endswith((".stl", ".3mf", ".gcode"))
+
+
+def _is_gcode(filename: str | None) -> bool:
+    return bool(filename) and filename.lower().endswith(".gcode")
+
+
+async def _analyze_document(message: Message) -> MeshStats | GcodeStats | None:
+    """Скачать файл во временный каталог и разобрать: геометрия STL/3MF или симуляция G-code.
+
+    None — файл слишком большой для Bot API или разобрать не удалось.
+    """
+    doc = message.document
+    if doc is None or (doc.file_size or 0) > MAX_ANALYZE_BYTES:
+        return None
+    tmp_dir = Path("data/tmp")
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        path = Path(tmp) / "model"
+        try:
+            # download пишет на диск потоково, файл целиком в память не читается
+            await message.bot.download(doc, destination=path)
+            if _is_gcode(doc.file_name):
+                return await asyncio.to_thread(analyze_gcode, path)
+            return await asyncio.to_thread(analyze_model, path, doc.file_name)
+        except ModelFormatError as exc:
+            await message.answer(f"Не удалось разобрать модель: {exc}")
+        except Exception:
+            logger.exception("Model analysis failed for {}", doc.file_name)
+    return None
 
 
 @router.message(PrintStates.file, F.document)
 async def got_model_file(message: Message, state: FSMContext) -> None:
     doc = message.document
     if not doc or not _is_allowed_model(doc.file_name):
-        await message.answer("Допустимы только файлы STL или 3MF. Отправьте корректный файл.")
+        await message.answer("Допустимы только файлы STL, 3MF или G-code. Отправьте корректный файл.")
         return
-    await state.update_data(model_file_id=doc.file_id, model_filename=doc.file_name)
+    await state.update_data(
+        model_file_id=doc.file_id,
+        model_filename=doc.file_name,
+        model_stats=None,
+        gcode_time_s=None,
+        filament_mm=None,
+    )
+    stats = await _analyze_document(message)
+    if isinstance(stats, GcodeStats):
+        await state.update_data(gcode_time_s=round(stats.print_time_s), filament_mm=round(stats.filament_mm, 1))
+        await message.answer(
+            f"G-code: {stats.moves} перемещений, время печати ≈ {stats.print_time_min} мин, "
+            f"филамент {stats.filament_mm / 1000:.2f} м."
+        )
+    elif stats is not None:
+        await state.update_data(model_stats=stats.to_dict())
+        sx, sy, sz = stats.size
+        await message.answer(
+            f"Модель: {stats.triangles} треугольников, объём {stats.volume_mm3 / 1000:.1f} см³, "
+            f"габариты {sx:.1f}×{sy:.1f}×{sz:.1f} мм."
+        )
     await state.set_state(PrintStates.photo)
     await message.answer("Прикрепите фото детали (по желанию) или напишите 'пропустить'.")
 
@@ -84,18 +148,45 @@ async def set_printer(message: Message, state: FSMContext) -> None:
     await state.update_data(printer_name=printer_name)
     # Проверим, не на обслуживании ли принтер
     await ensure_db()
+    await printer_registry.ensure_loaded()
     warn = None
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            pr = (
-                await session.execute(select(Printer).where(Printer.name == printer_name))
-            ).scalar_one_or_none()
-            if pr and pr.status == "maintenance":
-                if pr.maintenance_until and pr.maintenance_until > datetime.utcnow():
-                    until = pr.maintenance_until.strftime('%d-%m-%Y %H:%M')
-                    warn = f"Внимание: принтер на обслуживании до {until}."
+    pr = printer_registry.get(printer_name)
+    if pr and pr.status == "maintenance":
+        if pr.maintenance_until and pr.maintenance_until > datetime.utcnow():
+            until = pr.maintenance_until.strftime('%d-%m-%Y %H:%M')
+            warn = f"Внимание: принтер на обслуживании до {until}."
     await state.set_state(PrintStates.time)
-    await message.answer((warn + "\n") if warn else "" + "Укажите ожидаемое время печати в минутах (например, 120).")
+    lines = [warn] if warn else []
+    kb = None
+    data = await state.get_data()
+    if data.get("gcode_time_s") is not None:
+        # Время из G-code не зависит от профиля: скорости и ускорения уже в файле
+        estimate = max(1, math.ceil(data["gcode_time_s"] / 60))
+        await state.update_data(estimated_time_min=estimate)
+        lines.append(f"Время по G-code: {estimate} мин.")
+        kb = print_time_kb(estimate)
+    elif data.get("model_stats"):
+        profile = profile_for(printer_name, get_settings().printer_profiles)
+        estimate = estimate_minutes(MeshStats.from_dict(data["model_stats"]), profile)
+        await state.update_data(estimated_time_min=estimate)
+        lines.append(f"Оценка по модели (профиль {profile.name}): {estimate} мин.")
+        kb = print_time_kb(estimate)
+    lines.append("Укажите ожидаемое время печати в минутах (например, 120).")
+    await message.answer("\n".join(lines), reply_markup=kb)
+
+
+async def _ask_confirm(message: Message, state: FSMContext, minutes: int) -> None:
+    await state.update_data(expected_time_min=minutes)
+    data = await state.get_data()
+    lines = [
+        "Заявка на печать:",
+        f"Файл: {data.get('model_filename')}",
+        f"Принтер: {data.get('printer_name')}",
+        f"Ожидаемое время: {minutes} мин",
+        f"Фото: {'есть' if data.get('photo_file_id') else 'нет'}",
+    ]
+    await state.set_state(PrintStates.confirm)
+    await message.answer("\n".join(lines), reply_markup=print_confirm_kb())
 
 
 @router.message(PrintStates.time, F.text)
@@ -108,18 +199,17 @@ async def set_time(message: Message, state: FSMContext) -> None:
     except Exception:
         await message.answer("Введите положительное число минут, например: 90")
         return
-    await state.update_data(expected_time_min=minutes)
-    # Показать подтверждение
-    data = await state.get_data()
-    lines = [
-        "Заявка на печать:",
-        f"Файл: {data.get('model_filename')}",
-        f"Принтер: {data.get('printer_name')}",
-        f"Ожидаемое время: {minutes} мин",
-        f"Фото: {'есть' if data.get('photo_file_id') else 'нет'}",
-    ]
-    await state.set_state(PrintStates.confirm)
-    await message.answer("\n".join(lines), reply_markup=print_confirm_kb())
+    await _ask_confirm(message, state, minutes)
+
+
+@router.callback_query(PrintStates.time, F.data == "print:time:accept")
+async def accept_estimate(callback: CallbackQuery, state: FSMContext) -> None:
+    await callback.answer()
+    minutes = (await state.get_data()).get("estimated_time_min")
+    if not minutes:
+        await callback.message.answer("Оценки нет — введите время в минутах.")
+        return
+    await _ask_confirm(callback.message, state, int(minutes))
 
 
 @router.callback_query(PrintStates.confirm, F.data == "print:confirm:no")
@@ -144,15 +234,14 @@ async def print_confirm(callback: CallbackQuery, state: FSMContext) -> None:
 
     await ensure_db()
     job_id = None
+    assigned = None
     if db_base.async_session is not None:
         async with db_base.async_session() as session:
             by_user_id = None
             if callback.from_user is not None:
-                u = (
-                    await session.execute(select(User).where(User.tg_id == callback.from_user.id))
+                by_user_id = (
+                    await session.execute(USER_ID_BY_TG_ID, {"tg_id": callback.from_user.id})
                 ).scalar_one_or_none()
-                if u:
-                    by_user_id = u.id
             job = PrintJob(
                 user_id=by_user_id,
                 printer_name=printer_name,
@@ -160,6 +249,8 @@ async def print_confirm(callback: CallbackQuery, state: FSMContext) -> None:
                 filename=model_filename,
                 photo_file_id=photo_file_id,
                 expected_time_min=expected_time_min,
+                gcode_time_s=data.get("gcode_time_s"),
+                filament_mm=data.get("filament_mm"),
                 status="requested",
             )
             session.add(job)
@@ -174,22 +265,128 @@ async def print_confirm(callback: CallbackQuery, state: FSMContext) -> None:
             session.add(evt)
             await session.commit()
             job_id = job.id
+            # Сразу распределяем новую (и все ожидающие) заявки по принтерам
+            assignments, _ = await assign_pending(session, by_user_id)
+            await session.commit()
+            assigned = next((a for a in assignments if a.job_id == job_id), None)
     if job_id:
-        await callback.message.answer(
-            f"Заявка на печать создана (ID: {job_id}). Статус: requested."
-        )
+        if assigned:
+            await callback.message.answer(
+                f"Заявка на печать создана (ID: {job_id}). Статус: {assigned.status}.\n"
+                f"Принтер: {assigned.printer_name}, ориентировочно готово: "
+                f"{assigned.end_at.strftime('%d-%m-%Y %H:%M')} UTC"
+            )
+        elif (held := held_printer(printer_name, datetime.utcnow())) is not None:
+            until = f" до {held.maintenance_until.strftime('%d-%m-%Y %H:%M')} UTC" if held.maintenance_until else ""
+            await callback.message.answer(
+                f"Заявка на печать создана (ID: {job_id}). Статус: requested — ждёт принтер "
+                f"{held.name} (обслуживание{until})."
+            )
+        else:
+            await callback.message.answer(
+                f"Заявка на печать создана (ID: {job_id}). Статус: requested (нет готовых принтеров)."
+            )
     await state.clear()
 
 
+@router.message(Command("queue"))
+async def show_queue(message: Message) -> None:
+    """Очередь печати: распределяет ожидающие заявки и показывает ETA по принтерам."""
+    await ensure_db()
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    async with db_base.async_session() as session:
+        assignments, slots = await assign_pending(session)
+        await session.commit()
+        job_ids = [jid for slot in slots for jid, _ in slot.jobs]
+        jobs = {}
+        if job_ids:
+            rows = await session.execute(
+                select(PrintJob.id, PrintJob.filename, PrintJob.status, PrintJob.copies).where(PrintJob.id.in_(job_ids))
+            )
+            jobs = {jid: (fn, st, cp) for jid, fn, st, cp in rows.all()}
+        waiting = (await session.execute(
+            select(PrintJob.id, PrintJob.printer_name).where(PrintJob.status == "requested").order_by(PrintJob.id)
+        )).all()
+    now = datetime.utcnow()
+    held: dict[str, list[int]] = {}
+    for jid, name in waiting:
+        if (printer := held_printer(name, now)) is not None:
+            held.setdefault(printer.name, []).append(jid)
+
+    if not slots:
+        await message.answer("Нет готовых принтеров. Добавьте принтер: /add_printer <имя>")
+        return
+    lines = ["Очередь печати (время UTC):"]
+    if assignments:
+        lines.append(f"Распределено новых заявок: {len(assignments)}")
+    for slot in slots:
+        if not slot.jobs:
+            lines.append(f"🖨 {slot.name} — свободен")
+            continue
+        lines.append(f"🖨 {slot.name} — освободится {slot.free_at.strftime('%d-%m %H:%M')} ({len(slot.jobs)} в работе)")
+        for jid, end in slot.jobs[:QUEUE_VIEW_PER_PRINTER]:
+            fn, st, copies = jobs.get(jid, ("?", "queued", 1))
+            icon = "▶️" if st == "printing" else "⏳"
+            extra = f" ×{copies}" if copies and copies > 1 else ""
+            lines.append(f"   {icon} #{jid} {fn or '—'}{extra} — до {end.strftime('%d-%m %H:%M')}")
+        if len(slot.jobs) > QUEUE_VIEW_PER_PRINTER:
+            lines.append(f"   … ещё {len(slot.jobs) - QUEUE_VIEW_PER_PRINTER}")
+    if waiting:
+        lines.append(f"Ожидают распределения: {len(waiting)}")
+    for name, ids in held.items():
+        lines.append(f"   ждут принтер {name} (обслуживание): " + ", ".join(f"#{jid}" for jid in ids))
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("job"))
+async def set_job_status(message: Message) -> None:
+    # /job <id> done|failed|canceled
+    args = (message.text or "").split()
+    if len(args) < 3 or args[2] not in FINAL_JOB_STATUSES:
+        await message.answer("Использование: /job <id> done|failed|canceled")
+        return
+    try:
+        job_id = int(args[1])
+    except ValueError:
+        await message.answer("ID заявки должен быть числом")
+        return
+    new_status = args[2]
+    await ensure_db()
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    started: list[int] = []
+    async with db_base.async_session() as session:
+        job = (await session.execute(PRINT_JOB_BY_ID, {"job_id": job_id})).scalar_one_or_none()
+        if not job:
+            await message.answer("Заявка не найдена")
+            return
+        by_user_id = None
+        if message.from_user is not None:
+            by_user_id = (
+                await session.execute(USER_ID_BY_TG_ID, {"tg_id": message.from_user.id})
+            ).scalar_one_or_none()
+        job.status = new_status
+        session.add(PrintEvent(job_id=job_id, event_type=new_status, by_user_id=by_user_id))
+        await session.flush()
+        # Принтер освободился — следующая в очереди работа уходит в печать
+        if job.printer_id is not None:
+            started = await promote_next(session, [job.printer_id], by_user_id)
+        await session.commit()
+    text = f"Заявка #{job_id}: {new_status}."
+    if started:
+        text += f" Следующая в печати: #{started[0]}."
+    await message.answer(text)
+
+
 @router.message(Command("printers"))
 async def list_printers(message: Message) -> None:
     await ensure_db()
+    await printer_registry.ensure_loaded()
     lines = ["Принтеры:"]
-    items = []
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            rows = await session.execute(select(Printer))
-            items = rows.scalars().all()
+    items = printer_registry.all()
     if not items:
         lines.append("— нет записей. Добавьте принтер через /add_printer <имя>.")
     else:
@@ -211,17 +408,9 @@ async def add_printer(message: Message) -> None:
         return
     name = args[1].strip()
     await ensure_db()
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            exists = (
-                await session.execute(select(Printer).where(Printer.name == name))
-            ).scalar_one_or_none()
-            if exists:
-                await message.answer("Такой принтер уже есть")
-                return
-            p = Printer(name=name)
-            session.add(p)
-            await session.commit()
+    if await printer_registry.add(name) is None:
+        await message.answer("Такой принтер уже есть")
+        return
     await message.answer("Принтер добавлен")
 
 
@@ -242,20 +431,7 @@ async def set_maintenance(message: Message) -> None:
         return
     until = datetime.utcnow() + timedelta(minutes=mins)
     await ensure_db()
-    ok = False
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            p = (
-                await session.execute(select(Printer).where(Printer.name == name))
-            ).scalar_one_or_none()
-            if not p:
-                await message.answer("Принтер не найден")
-                return
-            p.status = "maintenance"
-            p.maintenance_until = until
-            await session.commit()
-            ok = True
-    if ok:
-        await message.answer(
-            f"Принтер {name} переведён в обслуживание до {until.strftime('%d-%m-%Y %H:%M')}"
-        )
+    if await printer_registry.set_maintenance(name, until) is None:
+        await message.answer("Принтер не найден")
+        return
+    await message.answer(f"Принтер {name} переведён в обслуживание до {until.strftime('%d-%m-%Y %H:%M')}")
@@ -12,19 +12,37 @@ from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove
 from sqlalchemy import select, func
 
 from ..db import base as db_base
-from ..db.models import Unit, User, UnitEvent
-from ..keyboards.receive import status_kb, ra_kb, skip_kb, choices_kb, choices_paged_kb
+from ..db import rollups
+from ..db.models import Unit, UnitEvent
+from ..keyboards.callbacks import ChoiceAction, ChoiceCb
+from ..keyboards.receive import status_kb, ra_kb, skip_kb, choices_kb, choices_paged_kb, batch_confirm_kb
 from ..keyboards import main_menu_kb
 from ..config import get_settings
 from ..db.base import setup_engine, init_db
+from ..services.batch_receive import (
+    MAX_BATCH_ROWS,
+    MAX_CSV_BYTES,
+    BatchRow,
+    decode_csv,
+    find_in_stock,
+    insert_batch,
+    load_dictionaries,
+    parse_batch,
+)
+from ..services.users import resolve_actor
+from .navigation import show, show_markup
 
 router = Router(name=__name__)
 
+# Сколько ошибок/предупреждений показывать в одном сообщении (лимит Telegram — 4096 символов)
+BATCH_MESSAGE_LINES = 20
+
+
 
 async def ensure_db() -> None:
     if db_base.async_session is None:
         settings = get_settings()
-        setup_engine(settings.database_url)
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
         await init_db()
 
 
@@ -39,6 +57,11 @@ class ReceiveStates(StatesGroup):
     machine_number = State()
 
 
+class BatchReceiveStates(StatesGroup):
+    input = State()
+    confirm = State()
+
+
 @router.callback_query(F.data == "blocks:receive")
 async def start_receive(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
@@ -77,33 +100,28 @@ async def set_number(message: Message, state: FSMContext) -> None:
         await message.answer("Введите название блока:")
 
 
-@router.callback_query(ReceiveStates.name_choice, F.data == "recv:name:manual")
+@router.callback_query(ReceiveStates.name_choice, ChoiceCb.filter((F.scope == "recv:name") & (F.action == ChoiceAction.manual)))
 async def name_manual_switch(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     await state.set_state(ReceiveStates.name_manual)
-    await callback.message.edit_text("Введите название блока:")
+    await show(callback, "Введите название блока:")
 
 
-@router.callback_query(ReceiveStates.name_choice, F.data.startswith("recv:name:page:"))
-async def name_page(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(ReceiveStates.name_choice, ChoiceCb.filter((F.scope == "recv:name") & (F.action == ChoiceAction.page)))
+async def name_page(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     names: list[str] = data.get("names_all", [])
-    try:
-        page = int((callback.data or "").split(":")[-1])
-    except ValueError:
-        page = 0
-    await callback.message.edit_reply_markup(reply_markup=choices_paged_kb(names, "recv:name", page=page))
+    await show_markup(callback, choices_paged_kb(names, "recv:name", page=callback_data.page))
 
 
-@router.callback_query(ReceiveStates.name_choice, F.data.startswith("recv:name:idx:"))
-async def name_pick(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(ReceiveStates.name_choice, ChoiceCb.filter((F.scope == "recv:name") & (F.action == ChoiceAction.idx)))
+async def name_pick(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     names: list[str] = data.get("names_all", [])
     try:
-        idx = int((callback.data or "").split(":")[-1])
-        value = names[idx]
+        value = names[callback_data.idx]
     except Exception:
         await callback.message.answer("Ошибка выбора. Введите название вручную:")
         await state.set_state(ReceiveStates.name_manual)
@@ -143,33 +161,28 @@ async def proceed_to_type(target_message: Message, state: FSMContext) -> None:
         await target_message.answer("Введите тип блока:")
 
 
-@router.callback_query(ReceiveStates.type_choice, F.data == "recv:type:manual")
+@router.callback_query(ReceiveStates.type_choice, ChoiceCb.filter((F.scope == "recv:type") & (F.action == ChoiceAction.manual)))
 async def type_manual_switch(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     await state.set_state(ReceiveStates.type_manual)
-    await callback.message.edit_text("Введите тип блока:")
+    await show(callback, "Введите тип блока:")
 
 
-@router.callback_query(ReceiveStates.type_choice, F.data.startswith("recv:type:page:"))
-async def type_page(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(ReceiveStates.type_choice, ChoiceCb.filter((F.scope == "recv:type") & (F.action == ChoiceAction.page)))
+async def type_page(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     types: list[str] = data.get("types_all", [])
-    try:
-        page = int((callback.data or "").split(":")[-1])
-    except ValueError:
-        page = 0
-    await callback.message.edit_reply_markup(reply_markup=choices_paged_kb(types, "recv:type", page=page))
+    await show_markup(callback, choices_paged_kb(types, "recv:type", page=callback_data.page))
 
 
-@router.callback_query(ReceiveStates.type_choice, F.data.startswith("recv:type:idx:"))
-async def type_pick(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(ReceiveStates.type_choice, ChoiceCb.filter((F.scope == "recv:type") & (F.action == ChoiceAction.idx)))
+async def type_pick(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     types: list[str] = data.get("types_all", [])
     try:
-        idx = int((callback.data or "").split(":")[-1])
-        value = types[idx]
+        value = types[callback_data.idx]
     except Exception:
         await callback.message.answer("Ошибка выбора. Введите тип вручную:")
         await state.set_state(ReceiveStates.type_manual)
@@ -246,22 +259,6 @@ async def finish_receive(message: Message, state: FSMContext) -> None:
     machine_number = data.get("machine_number")
     accepted_at = datetime.now()
 
-    # Определяем фамилию автоматически
-    surname: Optional[str] = None
-    await ensure_db()
-    if message.from_user is not None and db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            result = await session.execute(select(User).where(User.tg_id == message.from_user.id))
-            u = result.scalar_one_or_none()
-            if u and u.full_name:
-                parts = u.full_name.strip().split()
-                if parts:
-                    surname = parts[0]
-    if not surname and message.from_user and message.from_user.last_name:
-        surname = message.from_user.last_name
-    if not surname and message.from_user and message.from_user.first_name:
-        surname = message.from_user.first_name  # fallback
-
     await ensure_db()
     if db_base.async_session is None:
         await message.answer("База данных не инициализирована.")
@@ -269,6 +266,7 @@ async def finish_receive(message: Message, state: FSMContext) -> None:
         return
 
     async with db_base.async_session() as session:
+        by_user_id, surname = await resolve_actor(session, message.from_user)
         unit = Unit(
             number=str(number),
             name=str(name),
@@ -281,29 +279,16 @@ async def finish_receive(message: Message, state: FSMContext) -> None:
             master_surname=surname,
         )
         session.add(unit)
-        await session.commit()
-        # Запишем событие 'received'
-        by_user_id: int | None = None
-        by_user_name: str | None = surname
-        if message.from_user is not None:
-            u = (await session.execute(select(User).where(User.tg_id == message.from_user.id))).scalar_one_or_none()
-            if u:
-                by_user_id = u.id
-                if not by_user_name and u.full_name:
-                    parts = u.full_name.strip().split()
-                    if parts:
-                        by_user_name = parts[0]
-            if not by_user_name:
-                ln = message.from_user.last_name or ""
-                fn = message.from_user.first_name or ""
-                by_user_name = (ln or fn) or None
-        evt = UnitEvent(
+        await session.flush()
+        # Событие 'received' — в той же транзакции, что и блок
+        session.add(UnitEvent(
             unit_id=unit.id,
             event_type="received",
             by_user_id=by_user_id,
-            by_user_name=by_user_name,
-        )
-        session.add(evt)
+            by_user_name=surname,
+        ))
+        await rollups.stock_moved(session, [(unit.type, unit.condition)], None, "received")
+        await rollups.events_logged(session, "received")
         await session.commit()
 
     await message.answer(
@@ -320,3 +305,128 @@ async def finish_receive(message: Message, state: FSMContext) -> None:
     )
 
     await state.clear()
+
+
+# ===== Пакетная приёмка =====
+
+BATCH_HELP = (
+    "Пакетная приёмка. Отправьте список блоков — по одному в строке:\n"
+    "номер;название;тип;статус;машина;номер машины\n\n"
+    "Статус (Исправный / Не исправный / Гарантийный / На проверку), машина (РА1/РА2/РА3) "
+    "и номер машины можно не указывать. Можно прислать CSV-файл с теми же колонками.\n"
+    f"Не больше {MAX_BATCH_ROWS} блоков за раз. Пример:\n"
+    "1234;БУД;750-05.01;Исправный;РА1;105-01\n"
+    "1235;БУД;750-05.01"
+)
+
+
+def _limited(lines: list[str]) -> list[str]:
+    if len(lines) <= BATCH_MESSAGE_LINES:
+        return lines
+    return lines[:BATCH_MESSAGE_LINES] + [f"… и ещё {len(lines) - BATCH_MESSAGE_LINES}"]
+
+
+@router.callback_query(F.data == "blocks:receive_batch")
+async def start_batch_receive(callback: CallbackQuery, state: FSMContext) -> None:
+    await callback.answer()
+    await state.clear()
+    await state.set_state(BatchReceiveStates.input)
+    await callback.message.answer(BATCH_HELP, reply_markup=ReplyKeyboardRemove(remove_keyboard=True))
+
+
+@router.message(Command("receive_batch"))
+async def cmd_batch_receive(message: Message, state: FSMContext) -> None:
+    await state.clear()
+    await state.set_state(BatchReceiveStates.input)
+    await message.answer(BATCH_HELP, reply_markup=ReplyKeyboardRemove(remove_keyboard=True))
+
+
+@router.message(BatchReceiveStates.input, F.document)
+async def batch_receive_file(message: Message, state: FSMContext) -> None:
+    doc = message.document
+    if doc is None or not (doc.file_name or "").lower().endswith((".csv", ".txt")):
+        await message.answer("Нужен CSV-файл (.csv или .txt) или список текстом.")
+        return
+    if (doc.file_size or 0) > MAX_CSV_BYTES:
+        await message.answer("Файл слишком большой для пакетной приёмки.")
+        return
+    buf = await message.bot.download(doc)
+    if buf is None:
+        await message.answer("Не удалось скачать файл. Попробуйте ещё раз.")
+        return
+    await _prepare_batch(message, state, decode_csv(buf.read()))
+
+
+@router.message(BatchReceiveStates.input, F.text)
+async def batch_receive_text(message: Message, state: FSMContext) -> None:
+    await _prepare_batch(message, state, message.text or "")
+
+
+async def _prepare_batch(message: Message, state: FSMContext, text: str) -> None:
+    """Разобрать список, сверить со справочниками и показать одну сводку на подтверждение."""
+    await ensure_db()
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        await state.clear()
+        return
+    async with db_base.async_session() as session:
+        names, types = await load_dictionaries(session)
+        result = parse_batch(text, names, types)
+        in_stock = await find_in_stock(session, result.rows) if result.rows and not result.errors else set()
+
+    if result.errors:
+        await message.answer(
+            "Список не принят, исправьте и отправьте заново:\n" + "\n".join(_limited(result.errors))
+        )
+        return
+
+    warnings = list(result.warnings)
+    warnings += [f"Строка {r.line}: блок {r.number} «{r.name}» уже на складе" for r in result.rows if (r.number, r.name) in in_stock]
+    by_name: dict[str, int] = {}
+    for r in result.rows:
+        by_name[r.name] = by_name.get(r.name, 0) + 1
+    lines = [f"К приёмке блоков: {len(result.rows)}"]
+    lines += [f"• {name}: {count}" for name, count in sorted(by_name.items())]
+    if warnings:
+        lines += ["", "Обратите внимание:"] + _limited(warnings)
+    await state.update_data(batch_rows=result.rows_to_data())
+    await state.set_state(BatchReceiveStates.confirm)
+    await message.answer("\n".join(lines), reply_markup=batch_confirm_kb())
+
+
+@router.callback_query(BatchReceiveStates.confirm, F.data == "recv:batch:cancel")
+async def batch_receive_cancel(callback: CallbackQuery, state: FSMContext) -> None:
+    await callback.answer("Отменено")
+    await state.clear()
+    await callback.message.edit_reply_markup(reply_markup=None)
+
+
+@router.callback_query(BatchReceiveStates.confirm, F.data == "recv:batch:ok")
+async def batch_receive_confirm(callback: CallbackQuery, state: FSMContext) -> None:
+    await callback.answer()
+    data = await state.get_data()
+    rows = [BatchRow(**r) for r in data.get("batch_rows", [])]
+    # Сразу выходим из состояния: повторное нажатие не примет партию дважды
+    await state.clear()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    if not rows:
+        await callback.message.answer("Ошибка состояния. Начните заново.")
+        return
+
+    await ensure_db()
+    if db_base.async_session is None:
+        await callback.message.answer("База данных не инициализирована.")
+        return
+    accepted_at = datetime.now()
+    async with db_base.async_session() as session:
+        by_user_id, surname = await resolve_actor(session, callback.from_user)
+        # Все блоки и события — одна транзакция: либо партия принята целиком, либо никак
+        await insert_batch(session, rows, accepted_at=accepted_at, surname=surname, by_user_id=by_user_id)
+        await session.commit()
+
+    await callback.message.answer(
+        f"Принято на склад блоков: {len(rows)}\n"
+        f"Дата приёмки: {accepted_at.strftime('%d-%m-%Y %H:%M')}\n"
+        f"Принимал: {surname or '—'}",
+        reply_markup=main_menu_kb(),
+    )
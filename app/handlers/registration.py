@@ -8,6 +8,7 @@ from aiogram.types import Message
 
 from ..db.base import async_session
 from ..db.models import User
+from ..db.queries import USER_BY_TG_ID
 from ..config import get_settings
 
 router = Router(name=__name__)
@@ -28,10 +29,7 @@ async def cmd_register(message: Message, state: FSMContext) -> None:
     # Check if already registered
     if async_session is not None:
         async with async_session() as session:
-            existing = await session.scalar(
-                session.query(User).filter(User.tg_id == tg_id)  # type: ignore[attr-defined]
-            )
-            # SQLAlchemy 2.0 style would be select(User)... keeping simple for now
+            existing = await session.scalar(USER_BY_TG_ID, {"tg_id": tg_id})
     
     # Ask full name
     await message.answer("Введите вашу Фамилию и Имя (например: Иванов Иван):")
@@ -63,9 +61,7 @@ async def reg_set_full_name(message: Message, state: FSMContext) -> None:
 
     # Upsert user
     async with async_session() as session:
-        from sqlalchemy import select
-
-        result = await session.execute(select(User).where(User.tg_id == tg_id))
+        result = await session.execute(USER_BY_TG_ID, {"tg_id": tg_id})
         user = result.scalar_one_or_none()
         if user is None:
             user = User(tg_id=tg_id, full_name=full_name, username=username, role=role, status=status)
@@ -111,10 +107,8 @@ async def cmd_approve(message: Message) -> None:
         await message.answer("База данных не инициализирована.")
         return
 
-    from sqlalchemy import select
-
     async with async_session() as session:
-        result = await session.execute(select(User).where(User.tg_id == target_tg_id))
+        result = await session.execute(USER_BY_TG_ID, {"tg_id": target_tg_id})
         user = result.scalar_one_or_none()
         if user is None:
             await message.answer("Пользователь не найден.")
@@ -1,28 +1,33 @@
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
-import io
 from pathlib import Path
 
-import qrcode
-from PIL import Image, ImageDraw, ImageFont
-
 from aiogram import Router, F
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message, BufferedInputFile
 
-from sqlalchemy import select
-
 from ..db import base as db_base
-from ..db.models import Unit, Repair, User, Attachment, UnitEvent
+from ..db.models import Repair, Attachment
+from ..db.queries import UNIT_BY_ID, UNITS_BY_NUMBER
+from ..keyboards.callbacks import ChoiceAction, ChoiceCb, UnitAction, UnitCb
 from ..keyboards.receive import choices_paged_kb
+from ..services.qr import render_repair_qr
+from ..services.repairs import close_repair, find_open_repair, open_repair, repair_stats
+from ..services.users import resolve_actor
 from ..config import get_settings
 from ..db.base import setup_engine, init_db
+from .navigation import show_markup
 
 router = Router(name=__name__)
 
+REPAIR_STATS_DAYS = 30
+REPAIR_STATS_MAX_TYPES = 30
+
 
 class RepairStates(StatesGroup):
     number = State()
@@ -34,7 +39,7 @@ class RepairStates(StatesGroup):
 async def ensure_db() -> None:
     if db_base.async_session is None:
         settings = get_settings()
-        setup_engine(settings.database_url)
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
         await init_db()
 
 
@@ -57,14 +62,9 @@ async def set_number(message: Message, state: FSMContext) -> None:
     items: List[tuple[int, str]] = []
     if db_base.async_session is not None:
         async with db_base.async_session() as session:
-            q = (
-                select(Unit.id, Unit.name, Unit.type)
-                .where(Unit.number == number)
-                .order_by(Unit.name.asc(), Unit.type.asc())
-            )
-            rows = await session.execute(q)
+            rows = await session.execute(UNITS_BY_NUMBER, {"number": number})
             for r in rows.all():
-                unit_id, name, type_ = r
+                unit_id, name, type_, _status = r
                 label = f"{name or '-'} | {type_ or '-'}"
                 items.append((unit_id, label))
 
@@ -78,101 +78,68 @@ async def set_number(message: Message, state: FSMContext) -> None:
     await message.answer("Выберите блок:", reply_markup=choices_paged_kb([i[1] for i in items], "repair:unit", page=0, page_size=5))
 
 
-@router.callback_query(RepairStates.unit_choice, F.data.startswith("repair:unit:page:"))
-async def unit_page(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(RepairStates.unit_choice, ChoiceCb.filter((F.scope == "repair:unit") & (F.action == ChoiceAction.page)))
+async def unit_page(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     labels: List[str] = data.get("unit_labels", [])
-    # page number is last token
-    try:
-        page = int((callback.data or "").split(":")[-1])
-    except ValueError:
-        page = 0
-    await callback.message.edit_reply_markup(reply_markup=choices_paged_kb(labels, "repair:unit", page=page, page_size=5))
+    await show_markup(callback, choices_paged_kb(labels, "repair:unit", page=callback_data.page, page_size=5))
 
 
-@router.callback_query(RepairStates.unit_choice, F.data.startswith("repair:unit:idx:"))
-async def unit_pick(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(RepairStates.unit_choice, ChoiceCb.filter((F.scope == "repair:unit") & (F.action == ChoiceAction.idx)))
+async def unit_pick(callback: CallbackQuery, callback_data: ChoiceCb, state: FSMContext) -> None:
     await callback.answer()
     data = await state.get_data()
     unit_ids: List[int] = data.get("unit_ids", [])
     try:
-        idx = int((callback.data or "").split(":")[-1])
-        unit_id = unit_ids[idx]
+        unit_id = unit_ids[callback_data.idx]
     except Exception:
         await callback.message.answer("Ошибка выбора. Повторите ввод номера.")
         await state.set_state(RepairStates.number)
         return
 
-    await state.update_data(unit_id=unit_id)
-    # Зафиксируем событие начала ремонта
-    await ensure_db()
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            by_user_id = None
-            by_user_name = None
-            if callback.from_user is not None:
-                u = (await session.execute(select(User).where(User.tg_id == callback.from_user.id))).scalar_one_or_none()
-                if u:
-                    by_user_id = u.id
-                    if u.full_name:
-                        by_user_name = (u.full_name.strip().split() or [None])[0]
-                if by_user_name is None:
-                    ln = callback.from_user.last_name or ""
-                    fn = callback.from_user.first_name or ""
-                    by_user_name = (ln or fn) or None
-            evt = UnitEvent(
-                unit_id=unit_id,
-                event_type="repair_open",
-                by_user_id=by_user_id,
-                by_user_name=by_user_name,
-            )
-            session.add(evt)
-            await session.commit()
-
-    # Переходим к вводу неисправности
-    await state.set_state(RepairStates.fault)
-    await callback.message.answer("Опишите неисправность (кратко):")
+    await begin_repair(callback, state, unit_id)
 
 
 # Убрали шаг ввода даты: дата будет выставлена автоматически
 
 
-@router.callback_query(F.data.startswith("unit:repair:"))
-async def start_repair_from_card(callback: CallbackQuery, state: FSMContext) -> None:
+@router.callback_query(UnitCb.filter(F.action == UnitAction.repair))
+async def start_repair_from_card(callback: CallbackQuery, callback_data: UnitCb, state: FSMContext) -> None:
     """Старт ремонта из карточки блока по unit_id."""
     await callback.answer()
-    try:
-        unit_id = int((callback.data or "").split(":")[-1])
-    except Exception:
-        await callback.message.answer("Некорректный идентификатор блока")
-        return
     await state.clear()
-    await state.update_data(unit_id=unit_id)
-    # Зафиксируем событие начала ремонта
+    await begin_repair(callback, state, callback_data.unit_id)
+
+
+async def begin_repair(callback: CallbackQuery, state: FSMContext, unit_id: int) -> None:
+    """Выбран блок: спросить неисправность. В БД пока ничего не пишется.
+
+    Ремонт открывается (Repair + repair_open, блок in_repair), когда описана
+    неисправность, — брошенный на выборе блока диалог следов не оставляет. Если у
+    блока уже есть открытый ремонт, сразу переходим к описанию выполненных работ.
+    """
     await ensure_db()
-    if db_base.async_session is not None:
-        async with db_base.async_session() as session:
-            by_user_id = None
-            by_user_name = None
-            if callback.from_user is not None:
-                u = (await session.execute(select(User).where(User.tg_id == callback.from_user.id))).scalar_one_or_none()
-                if u:
-                    by_user_id = u.id
-                    if u.full_name:
-                        by_user_name = (u.full_name.strip().split() or [None])[0]
-                if by_user_name is None:
-                    ln = callback.from_user.last_name or ""
-                    fn = callback.from_user.first_name or ""
-                    by_user_name = (ln or fn) or None
-            evt = UnitEvent(
-                unit_id=unit_id,
-                event_type="repair_open",
-                by_user_id=by_user_id,
-                by_user_name=by_user_name,
-            )
-            session.add(evt)
-            await session.commit()
+    if db_base.async_session is None:
+        await callback.message.answer("База данных не инициализирована.")
+        return
+    async with db_base.async_session() as session:
+        unit = (await session.execute(UNIT_BY_ID, {"unit_id": unit_id})).scalar_one_or_none()
+        if unit is None:
+            await callback.message.answer("Блок не найден")
+            await state.clear()
+            return
+        rep = await find_open_repair(session, unit_id)
+
+    if rep is not None:
+        await state.update_data(unit_id=unit_id, repair_id=rep.id)
+        await state.set_state(RepairStates.summary)
+        await callback.message.answer(
+            f"Ремонт блока открыт {rep.opened_at.strftime('%d-%m-%Y %H:%M')} UTC.\n"
+            "Опишите выполненные работы/замены (кратко):"
+        )
+        return
+    await state.update_data(unit_id=unit_id, repair_id=None)
     # Переходим к вводу неисправности
     await state.set_state(RepairStates.fault)
     await callback.message.answer("Опишите неисправность (кратко):")
@@ -181,9 +148,38 @@ async def start_repair_from_card(callback: CallbackQuery, state: FSMContext) ->
 @router.message(RepairStates.fault, F.text)
 async def set_fault(message: Message, state: FSMContext) -> None:
     fault = (message.text or "").strip()
-    await state.update_data(fault=fault)
+    data = await state.get_data()
+    unit_id = data.get("unit_id")
+    if not isinstance(unit_id, int):
+        await message.answer("Ошибка состояния. Начните заново.")
+        await state.clear()
+        return
+    await ensure_db()
+    if db_base.async_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    # Неисправность описана — блок уходит в ремонт
+    async with db_base.async_session() as session:
+        unit = (await session.execute(UNIT_BY_ID, {"unit_id": unit_id})).scalar_one_or_none()
+        if unit is None:
+            await message.answer("Блок не найден")
+            await state.clear()
+            return
+        by_user_id, by_user_name = await resolve_actor(session, message.from_user)
+        rep = await open_repair(
+            session,
+            unit,
+            by_user_id=by_user_id,
+            by_user_name=by_user_name,
+            comment=f"Неисправность: {fault}" if fault else None,
+        )
+        await session.commit()
+    await state.update_data(fault=fault, repair_id=rep.id)
     await state.set_state(RepairStates.summary)
-    await message.answer("Опишите выполненные работы/замены (кратко):")
+    await message.answer(
+        "Блок в ремонте. Опишите выполненные работы/замены (кратко).\n"
+        "Если ремонт займёт время — вернитесь позже: кнопка «Ремонт» в карточке блока продолжит с этого шага."
+    )
 
 
 @router.message(RepairStates.summary, F.text)
@@ -198,120 +194,49 @@ async def finish_repair(message: Message, state: FSMContext) -> None:
         await state.clear()
         return
 
+    repair_id = data.get("repair_id")
     await ensure_db()
-    by_user_id: Optional[int] = None
-    by_user_name: Optional[str] = None
     if db_base.async_session is not None and message.from_user is not None:
         async with db_base.async_session() as session:
-            # определить пользователя
-            u = (await session.execute(select(User).where(User.tg_id == message.from_user.id))).scalar_one_or_none()
-            if u:
-                by_user_id = u.id
-                if u.full_name:
-                    by_user_name = (u.full_name.strip().split() or [None])[0]
-            if by_user_name is None:
-                ln = message.from_user.last_name or ""
-                fn = message.from_user.first_name or ""
-                by_user_name = (ln or fn) or None
-            # создать запись о ремонте и обновить статус блока
-            closed = datetime.now()
-            rep = Repair(
-                unit_id=unit_id,
-                opened_at=datetime.now(),
-                closed_at=closed,
-                status="done",
+            by_user_id, by_user_name = await resolve_actor(session, message.from_user)
+            unit = (await session.execute(UNIT_BY_ID, {"unit_id": unit_id})).scalar_one_or_none()
+            rep = await session.get(Repair, repair_id) if isinstance(repair_id, int) else None
+            if rep is None or rep.status != "open":
+                # Состояние FSM потеряно/устарело — закрываем открытый ремонт блока или открываем и сразу закрываем
+                rep = await open_repair(session, unit, by_user_id=by_user_id, by_user_name=by_user_name) if unit else None
+            if rep is None:
+                await message.answer("Блок не найден")
+                await state.clear()
+                return
+            closed = datetime.utcnow()
+            await close_repair(
+                session,
+                rep,
+                unit,
                 summary=(f"Неисправность: {fault}. Работы: {summary}" if fault else summary) or None,
                 by_user_id=by_user_id,
-            )
-            session.add(rep)
-            # обновить статус блока
-            unit = (await session.execute(select(Unit).where(Unit.id == unit_id))).scalar_one_or_none()
-            if unit:
-                unit.status = "done"
-            # Запишем событие о завершении ремонта
-            evt = UnitEvent(
-                unit_id=unit_id,
-                event_type="repair_close",
-                by_user_id=by_user_id,
                 by_user_name=by_user_name,
-                comment=(f"Неисправность: {fault}. Работы: {summary}" if fault else (summary or None)),
+                now=closed,
             )
-            session.add(evt)
             await session.commit()
             # Сгенерировать QR и отправить картинку
             if unit:
-                # Текст для QR
-                qr_payload = f"{unit.number};{unit.name};{closed.strftime('%d-%m-%Y %H:%M')}"
-                # Базовый QR
-                qr_img = qrcode.make(qr_payload).convert("RGB")
+                # Текст для QR — формат прежних этикеток (номер;название;дд-мм-ГГГГ ЧЧ:ММ) и, как
+                # у них, местное время сервера: сканеры разбирают старые и новые этикетки одинаково
+                closed_local = closed.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+                qr_payload = f"{unit.number};{unit.name};{closed_local.strftime('%d-%m-%Y %H:%M')}"
                 # Подпись внутри изображения под QR
                 caption_text = f"{unit.name or ''} — {unit.number or ''}"
-                # Подготовим полотно: добавим место под текст (около 60-100px)
-                padding = 16
-                text_area_h = 80
-                canvas = Image.new(
-                    "RGB",
-                    (qr_img.width + padding * 2, qr_img.height + padding * 2 + text_area_h),
-                    color=(255, 255, 255),
-                )
-                canvas.paste(qr_img, (padding, padding))
-                draw = ImageDraw.Draw(canvas)
-                # Пытаемся загрузить TTF-шрифт с поддержкой кириллицы
-                font = None
-                font_candidates = [
-                    # Распространённые шрифты Windows
-                    r"C:\\Windows\\Fonts\\arial.ttf",
-                    r"C:\\Windows\\Fonts\\arialuni.ttf",
-                    r"C:\\Windows\\Fonts\\segoeui.ttf",
-                    r"C:\\Windows\\Fonts\\tahoma.ttf",
-                ]
-                for fp in font_candidates:
-                    try:
-                        if Path(fp).exists():
-                            font = ImageFont.truetype(fp, size=16)
-                            break
-                    except Exception:
-                        continue
-                if font is None:
-                    # Последний шанс — встроенный (может не покрывать кириллицу)
-                    try:
-                        font = ImageFont.load_default()
-                    except Exception:
-                        font = None
-                # Центрируем текст
-                text_y = qr_img.height + padding + (text_area_h // 2)
-                # Первая строка: payload (мелко)
-                payload_bbox = draw.textbbox((0, 0), qr_payload, font=font)
-                payload_w = payload_bbox[2] - payload_bbox[0]
-                payload_h = payload_bbox[3] - payload_bbox[1]
-                draw.text(
-                    ((canvas.width - payload_w) // 2, text_y - payload_h - 4),
-                    qr_payload,
-                    fill=(0, 0, 0),
-                    font=font,
-                )
-                # Вторая строка: подпись (название — номер)
-                cap_bbox = draw.textbbox((0, 0), caption_text, font=font)
-                cap_w = cap_bbox[2] - cap_bbox[0]
-                cap_h = cap_bbox[3] - cap_bbox[1]
-                draw.text(
-                    ((canvas.width - cap_w) // 2, text_y + 4),
-                    caption_text,
-                    fill=(0, 0, 0),
-                    font=font,
-                )
-
                 # Сохраняем в файл и также отправляем как фото
-                qr_dir = Path("data/qr")
-                qr_dir.mkdir(parents=True, exist_ok=True)
                 filename = f"repair_qr_{rep.id}.png"
-                file_path = qr_dir / filename
-                canvas.save(file_path, format="PNG")
+                file_path = Path("data/qr") / filename
+                png = await asyncio.to_thread(render_repair_qr, qr_payload, caption_text, file_path)
 
                 # Отправляем в Telegram
-                with file_path.open("rb") as f:
-                    photo = BufferedInputFile(f.read(), filename=filename)
-                sent = await message.answer_photo(photo=photo)
+                sent = await message.answer_photo(
+                    photo=BufferedInputFile(png, filename=filename),
+                    caption=f"Ремонт закрыт {closed.strftime('%d-%m-%Y %H:%M')} UTC",
+                )
 
                 # Сохраняем вложение в БД (file_id и filename)
                 tg_file_id = None
@@ -328,3 +253,44 @@ async def finish_repair(message: Message, state: FSMContext) -> None:
 
     await message.answer("Ремонт сохранён и завершён. Статус блока: готов.")
     await state.clear()
+
+
+@router.message(Command("repair_stats"))
+async def cmd_repair_stats(message: Message) -> None:
+    """Сводка ремонтов по типам блоков за N дней: /repair_stats [дней]."""
+    args = (message.text or "").split()
+    days = REPAIR_STATS_DAYS
+    if len(args) > 1:
+        try:
+            days = max(1, min(int(args[1]), 3650))
+        except ValueError:
+            await message.answer("Использование: /repair_stats [дней]. Пример: /repair_stats 7")
+            return
+    # Дни сводки — UTC, как у repair_stats_daily и /stats
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    await ensure_db()
+    if db_base.async_read_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    async with db_base.async_read_session() as session:
+        rows, open_now = await repair_stats(session, since)
+
+    opened = sum(r.opened for r in rows)
+    closed = sum(r.closed for r in rows)
+    duration = sum(r.duration_s for r in rows)
+    lines = [
+        f"Ремонты за {days} дн. (с {since.strftime('%d-%m-%Y')}, UTC):",
+        f"Начато: {opened}, завершено: {closed}, сейчас в ремонте: {open_now}",
+    ]
+    if closed:
+        lines.append(f"Среднее время ремонта: {duration / closed / 3600:.1f} ч")
+    if rows:
+        lines.append("")
+        lines.append("По типам (начато / завершено / среднее):")
+        for r in rows[:REPAIR_STATS_MAX_TYPES]:
+            avg = f"{r.avg_hours:.1f} ч" if r.avg_hours is not None else "—"
+            lines.append(f"• {r.unit_type or 'без типа'}: {r.opened} / {r.closed} / {avg}")
+        if len(rows) > REPAIR_STATS_MAX_TYPES:
+            lines.append(f"… и ещё типов: {len(rows) - REPAIR_STATS_MAX_TYPES}")
+    await message.answer("\n".join(lines))
@@ -1,14 +1,28 @@
 from __future__ import annotations
 
-from aiogram import Router
-from aiogram.filters import CommandStart
+from aiogram import Router, F
+from aiogram.filters import CommandObject, CommandStart
 from aiogram.types import Message
 
 from ..keyboards import main_menu_kb
+from .access import has_access
+from .blocks import ensure_db, show_unit_card
+from .inline import DEEP_LINK_PREFIX
 
 router = Router(name=__name__)
 
 
+@router.message(CommandStart(deep_link=True, magic=F.args.regexp(rf"^{DEEP_LINK_PREFIX}\d+$")))
+async def cmd_start_unit(message: Message, command: CommandObject) -> None:
+    # Ссылка из inline-поиска: t.me/<бот>?start=unit_<id> — сразу карточка блока.
+    # Ссылку могли переслать куда угодно: карточку видят те же, кому доступен поиск
+    await ensure_db()
+    if not await has_access(message.from_user.id if message.from_user else None):
+        await message.answer("Карточки блоков доступны после регистрации: /register")
+        return
+    await show_unit_card(message, int((command.args or "").removeprefix(DEEP_LINK_PREFIX)))
+
+
 @router.message(CommandStart())
 async def cmd_start(message: Message) -> None:
     await message.answer(
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from ..db import base as db_base
+from ..db.rollups import rebuild_repair_stats, rebuild_stock_stats
+from ..config import get_settings
+from ..db.base import setup_engine, init_db
+from ..services.stats import stock_stats
+
+router = Router(name=__name__)
+
+STATS_DAYS = 7
+STATS_MAX_TYPES = 15
+
+STATUS_LABELS = {
+    "received": "Принят",
+    "in_repair": "В ремонте",
+    "done": "Готов",
+    "issued": "Выдан",
+}
+
+
+async def ensure_db() -> None:
+    if db_base.async_session is None:
+        settings = get_settings()
+        setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
+        await init_db()
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message) -> None:
+    """Сводка склада: остатки по статусам/типам/состояниям и приёмка/выдача за неделю."""
+    await ensure_db()
+    if db_base.async_read_session is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    # Дни событий — в UTC, как UnitEvent.timestamp
+    today = datetime.utcnow().date()
+    since = today - timedelta(days=STATS_DAYS - 1)
+    async with db_base.async_read_session() as session:
+        stats = await stock_stats(session, since)
+
+    lines = [f"Блоков на складе: {stats.in_stock} (выдано всего: {stats.by_status['issued']})"]
+    lines.append("")
+    lines.append("По статусам:")
+    for status, n in stats.by_status.most_common():
+        if n:
+            lines.append(f"• {STATUS_LABELS.get(status, status or '—')}: {n}")
+    conditions = [(c, n) for c, n in stats.by_condition.most_common() if n]
+    if conditions:
+        lines.append("")
+        lines.append("На складе по состоянию:")
+        lines += [f"• {c or 'не указано'}: {n}" for c, n in conditions]
+    types = [(t, n) for t, n in stats.by_type.most_common() if n]
+    if types:
+        lines.append("")
+        lines.append("На складе по типам:")
+        lines += [f"• {t or 'без типа'}: {n}" for t, n in types[:STATS_MAX_TYPES]]
+        if len(types) > STATS_MAX_TYPES:
+            lines.append(f"… и ещё типов: {len(types) - STATS_MAX_TYPES}")
+
+    received = sum(c["received"] for c in stats.events.values())
+    issued = sum(c["issued"] for c in stats.events.values())
+    lines.append("")
+    lines.append(f"За {STATS_DAYS} дн. (с {since.strftime('%d-%m-%Y')}): принято {received}, выдано {issued}")
+    for i in range(STATS_DAYS):
+        day = since + timedelta(days=i)
+        c = stats.events.get(day)
+        if c and (c["received"] or c["issued"]):
+            lines.append(f"• {day.strftime('%d-%m')}: 📥 {c['received']} / 📤 {c['issued']}")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("stats_rebuild"))
+async def cmd_stats_rebuild(message: Message) -> None:
+    """Пересчитать сводки (/stats, /repair_stats) с нуля по блокам, событиям и ремонтам."""
+    if message.from_user is None:
+        return
+    settings = get_settings()
+    if message.from_user.id not in settings.admin_tg_ids:
+        await message.answer("Команда доступна только администратору.")
+        return
+
+    await ensure_db()
+    if db_base.engine is None:
+        await message.answer("База данных не инициализирована.")
+        return
+    started = datetime.now()
+    async with db_base.engine.begin() as conn:
+        await conn.run_sync(rebuild_stock_stats)
+        await conn.run_sync(rebuild_repair_stats)
+    elapsed = (datetime.now() - started).total_seconds()
+    await message.answer(f"Сводки пересчитаны за {elapsed:.1f} с.")
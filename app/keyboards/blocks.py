@@ -1,32 +1,48 @@
+from functools import cache, lru_cache
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from .callbacks import UnitAction, UnitCb
+from .frozen import frozen
+
 
+@cache
+@frozen
 def blocks_menu_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="📥 Принять", callback_data="blocks:receive")],
+            [InlineKeyboardButton(text="📥 Принять списком", callback_data="blocks:receive_batch")],
             [InlineKeyboardButton(text="📤 Выдать", callback_data="blocks:issue")],
+            [InlineKeyboardButton(text="📤 Выдать несколько", callback_data="blocks:issue_batch")],
             [InlineKeyboardButton(text="🛠 Ремонт", callback_data="blocks:repair")],
-            [InlineKeyboardButton(text="📦 Экспорт XML", callback_data="blocks:export")],
+            [InlineKeyboardButton(text="🚜 Машины", callback_data="blocks:machines")],
+            [InlineKeyboardButton(text="📦 Экспорт", callback_data="blocks:export")],
         ]
     )
 
 
 def unit_card_kb(unit_id: int) -> InlineKeyboardMarkup:
     """Кнопки для карточки блока: История / Выдать / Ремонт"""
+
+    def button(text: str, action: UnitAction) -> InlineKeyboardButton:
+        return InlineKeyboardButton(text=text, callback_data=UnitCb(action=action, unit_id=unit_id).pack())
+
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="📜 История", callback_data=f"unit:history:{unit_id}")],
-            [InlineKeyboardButton(text="📤 Выдать", callback_data=f"unit:issue:{unit_id}")],
-            [InlineKeyboardButton(text="🛠 Ремонт", callback_data=f"unit:repair:{unit_id}")],
+            [button("📜 История", UnitAction.history)],
+            [button("📤 Выдать", UnitAction.issue)],
+            [button("🛠 Ремонт", UnitAction.repair)],
             [
-                InlineKeyboardButton(text="🔗 Изменить машину", callback_data=f"unit:machine:set:{unit_id}"),
-                InlineKeyboardButton(text="🚫 Снять привязку", callback_data=f"unit:machine:clear:{unit_id}"),
+                button("🔗 Изменить машину", UnitAction.machine_set),
+                button("🚫 Снять привязку", UnitAction.machine_clear),
             ],
         ]
     )
 
 
+@cache
+@frozen
 def back_to_blocks_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -38,20 +54,48 @@ def back_to_blocks_kb() -> InlineKeyboardMarkup:
 def history_nav_kb(unit_id: int, page: int, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
     row = []
     if has_prev:
-        row.append(InlineKeyboardButton(text="◀️", callback_data=f"unit:history:{unit_id}:{page-1}"))
+        row.append(InlineKeyboardButton(text="◀️", callback_data=UnitCb(action=UnitAction.history, unit_id=unit_id, page=page - 1).pack()))
     row.append(InlineKeyboardButton(text=f"Стр. {page+1}", callback_data="noop"))
     if has_next:
-        row.append(InlineKeyboardButton(text="▶️", callback_data=f"unit:history:{unit_id}:{page+1}"))
-    # Добавим кнопку Назад отдельной строкой
-    rows = [row, [InlineKeyboardButton(text="⬅️ Назад", callback_data="blocks:menu")]]
+        row.append(InlineKeyboardButton(text="▶️", callback_data=UnitCb(action=UnitAction.history, unit_id=unit_id, page=page + 1).pack()))
+    # История открывается на месте карточки — возврат к ней и в меню отдельными строками
+    card = UnitCb(action=UnitAction.card, unit_id=unit_id).pack()
+    rows = [
+        row,
+        [InlineKeyboardButton(text="🗂 К карточке", callback_data=card)],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data="blocks:menu")],
+    ]
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def export_menu_kb() -> InlineKeyboardMarkup:
+@lru_cache(maxsize=16)
+@frozen
+def export_menu_kb(fmt: str = "xml") -> InlineKeyboardMarkup:
+    """Меню экспорта: формат (XML/CSV, gzip) переключается на месте, кнопки области несут выбранный формат."""
+    base, gz = fmt.removesuffix(".gz"), fmt.endswith(".gz")
+
+    def fmt_button(text: str, value: str, selected: bool) -> InlineKeyboardButton:
+        return InlineKeyboardButton(text=("✅ " if selected else "") + text, callback_data=f"blocks:export:fmt:{value}")
+
+    suffix = ".gz" if gz else ""
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="На складе (без выданных)", callback_data="blocks:export:stock")],
-            [InlineKeyboardButton(text="Все блоки", callback_data="blocks:export:all")],
+            [
+                fmt_button("XML", "xml" + suffix, base == "xml"),
+                fmt_button("CSV", "csv" + suffix, base == "csv"),
+                fmt_button("gzip", base if gz else base + ".gz", gz),
+            ],
+            [InlineKeyboardButton(text="На складе (без выданных)", callback_data=f"blocks:export:stock:{fmt}")],
+            [InlineKeyboardButton(text="Все блоки", callback_data=f"blocks:export:all:{fmt}")],
+            [InlineKeyboardButton(text="Изменения с прошлой выгрузки", callback_data=f"blocks:export:delta:{fmt}")],
             [InlineKeyboardButton(text="⬅️ Назад", callback_data="blocks:menu")],
         ]
     )
+
+
+def export_progress_kb(task_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✖️ Отменить", callback_data=f"blocks:export:cancel:{task_id}")],
+        ]
+    )
@@ -0,0 +1,267 @@
+"""Типизированные callback_data с компактной упаковкой.
+
+Кнопка несёт "<префикс>:<поля>", где поля — байты (varint для чисел и
+перечислений, длина + UTF-8 для строк) в base64url без выравнивания:
+
+    UnitCb(action=UnitAction.history, unit_id=123456, page=2).pack()  # "u:AcDEBwI"
+
+Хендлер получает разобранный объект и маршрутизируется по префиксу:
+
+    @router.callback_query(UnitCb.filter(F.action == UnitAction.history))
+    async def cb(callback: CallbackQuery, callback_data: UnitCb) -> None: ...
+
+Если упакованное не влезает в лимит Telegram (64 байта) — длинный номер машины,
+курсор, — поля кладутся в callback_tokens, а в кнопку идёт "<префикс>:.<токен>".
+Токены живут в памяти процесса TOKEN_TTL секунд (как MemoryStorage у FSM):
+после рестарта или по истечении кнопка считается устаревшей (is_stale).
+
+Новые поля и значения перечислений — только в конец: иначе старые кнопки
+в чатах разберутся неверно.
+"""
+from __future__ import annotations
+
+import base64
+import secrets
+import time
+from collections import OrderedDict
+from enum import Enum
+from functools import cache, lru_cache
+from typing import Any, Self
+
+from aiogram.filters.callback_data import MAX_CALLBACK_LENGTH, CallbackData
+
+SEP = ":"
+TOKEN_MARK = "."  # не входит в алфавит base64url
+TOKEN_TTL = 24 * 3600
+MAX_TOKENS = 10_000
+
+
+# ===== Хранилище токенов =====
+
+
+class CallbackTokens:
+    """Токен -> упакованные поля для кнопок, которые не влезают в 64 байта.
+
+    Одинаковая нагрузка получает тот же токен (перерисовка клавиатуры не плодит
+    записи), срок продлевается при каждой выдаче. Сверх max_size вытесняются
+    самые старые.
+    """
+
+    def __init__(self, ttl: float = TOKEN_TTL, max_size: int = MAX_TOKENS) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        # Порядок вставки = порядок истечения: put() переносит запись в конец
+        self._items: OrderedDict[str, tuple[str, bytes, float]] = OrderedDict()
+        self._by_payload: dict[tuple[str, bytes], str] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, prefix: str, payload: bytes) -> str:
+        now = time.monotonic()
+        self._prune(now)
+        token = self._by_payload.get((prefix, payload))
+        if token is None:
+            token = secrets.token_urlsafe(6)
+            while token in self._items:
+                token = secrets.token_urlsafe(6)
+            self._by_payload[(prefix, payload)] = token
+        self._items[token] = (prefix, payload, now + self.ttl)
+        self._items.move_to_end(token)
+        while len(self._items) > self.max_size:
+            self._drop(next(iter(self._items)))
+        return token
+
+    def get(self, prefix: str, token: str) -> bytes | None:
+        item = self._items.get(token)
+        if item is None or item[0] != prefix:
+            return None
+        if item[2] <= time.monotonic():
+            self._drop(token)
+            return None
+        return item[1]
+
+    def _prune(self, now: float) -> None:
+        for token, (_prefix, _payload, expires) in list(self._items.items()):
+            if expires > now:
+                break
+            self._drop(token)
+
+    def _drop(self, token: str) -> None:
+        prefix, payload, _ = self._items.pop(token)
+        self._by_payload.pop((prefix, payload), None)
+
+
+callback_tokens = CallbackTokens()
+
+
+# ===== Упаковка полей =====
+
+
+def _put_uint(out: bytearray, n: int) -> None:
+    if n < 0:
+        raise ValueError(f"callback field must be non-negative, got {n}")
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_uint(blob: bytes, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        if pos >= len(blob):
+            raise ValueError("truncated callback data")
+        b = blob[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+@cache
+def _codecs(cls: type[CallbackData]) -> tuple[tuple[str, Any], ...]:
+    """(поле, тип) по порядку объявления: int, bool, str или Enum."""
+    fields = []
+    for name, info in cls.model_fields.items():
+        kind = info.annotation
+        if not (isinstance(kind, type) and issubclass(kind, (int, str, Enum))):
+            raise TypeError(f"{cls.__name__}.{name}: unsupported callback field type {kind!r}")
+        fields.append((name, kind))
+    return tuple(fields)
+
+
+def _encode(obj: CallbackData) -> bytes:
+    out = bytearray()
+    for name, kind in _codecs(type(obj)):
+        value = getattr(obj, name)
+        if issubclass(kind, Enum):
+            _put_uint(out, _members(kind).index(kind(value)))
+        elif kind is str:
+            raw = value.encode()
+            _put_uint(out, len(raw))
+            out += raw
+        else:
+            _put_uint(out, int(value))
+    return bytes(out)
+
+
+@lru_cache(maxsize=512)
+def _decode(cls: type[CallbackData], blob: bytes) -> dict[str, Any]:
+    # Одну и ту же кнопку разбирают несколько фильтров подряд — кэшируем
+    values: dict[str, Any] = {}
+    pos = 0
+    for name, kind in _codecs(cls):
+        n, pos = _get_uint(blob, pos)
+        if issubclass(kind, Enum):
+            members = _members(kind)
+            if n >= len(members):
+                raise ValueError(f"{cls.__name__}.{name}: bad enum index {n}")
+            values[name] = members[n]
+        elif kind is str:
+            if pos + n > len(blob):
+                raise ValueError("truncated callback data")
+            values[name] = blob[pos:pos + n].decode()
+            pos += n
+        elif kind is bool:
+            values[name] = bool(n)
+        else:
+            values[name] = n
+    if pos != len(blob):
+        raise ValueError("trailing bytes in callback data")
+    return values
+
+
+@cache
+def _members(kind: type[Enum]) -> list[Enum]:
+    return list(kind)
+
+
+class PackedCallback(CallbackData, prefix="_"):
+    """База для callback_data с упаковкой полей в байты и токенами для длинных."""
+
+    def pack(self) -> str:
+        blob = _encode(self)
+        data = f"{self.__prefix__}{SEP}{base64.urlsafe_b64encode(blob).rstrip(b'=').decode()}"
+        if len(data.encode()) <= MAX_CALLBACK_LENGTH:
+            return data
+        return f"{self.__prefix__}{SEP}{TOKEN_MARK}{callback_tokens.put(self.__prefix__, blob)}"
+
+    @classmethod
+    def unpack(cls, value: str) -> Self:
+        prefix, sep, body = value.partition(SEP)
+        if not sep or prefix != cls.__prefix__:
+            raise ValueError(f"Bad prefix ({prefix!r} != {cls.__prefix__!r})")
+        if body.startswith(TOKEN_MARK):
+            blob = callback_tokens.get(prefix, body[1:])
+            if blob is None:
+                raise ValueError(f"Callback token expired: {body!r}")
+        else:
+            # binascii.Error — подкласс ValueError: фильтр просто не совпадёт
+            blob = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+        return cls(**_decode(cls, blob))
+
+
+def is_stale(data: str | None) -> bool:
+    """Кнопка с токеном, которого уже нет (истёк или бот перезапускался)."""
+    prefix, sep, body = (data or "").partition(SEP)
+    return bool(sep) and body.startswith(TOKEN_MARK) and callback_tokens.get(prefix, body[1:]) is None
+
+
+# ===== Схемы кнопок =====
+
+
+class UnitAction(str, Enum):
+    card = "card"
+    history = "history"
+    issue = "issue"
+    repair = "repair"
+    machine_set = "machine_set"
+    machine_clear = "machine_clear"
+
+
+class UnitCb(PackedCallback, prefix="u"):
+    """Действие с блоком из карточки и списков; page — страница истории."""
+
+    action: UnitAction
+    unit_id: int
+    page: int = 0
+
+
+class ChoiceAction(str, Enum):
+    idx = "idx"
+    page = "page"
+    manual = "manual"
+    tgl = "tgl"
+    all = "all"
+    none = "none"
+    done = "done"
+
+
+class ChoiceCb(PackedCallback, prefix="ch"):
+    """Выбор из списка (keyboards.receive.choices_*): scope — какой список, например "recv:name"."""
+
+    scope: str
+    action: ChoiceAction
+    idx: int = 0
+    page: int = 0
+
+
+class MachineView(str, Enum):
+    numbers = "numbers"
+    units = "units"
+    history = "history"
+
+
+class MachineCb(PackedCallback, prefix="m"):
+    """Навигация по машинам.
+
+    numbers: number — после какого номера машины листать ("" — с начала);
+    units: cursor — после какого id блока; history: cursor — до какого события (0 — с последнего).
+    """
+
+    view: MachineView
+    machine: str
+    number: str = ""
+    cursor: int = 0
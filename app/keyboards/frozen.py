@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from functools import wraps
+from typing import Any, Callable, ParamSpec, TypeVar
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from pydantic import BaseModel, ConfigDict, field_serializer
+
+# Клавиатуры из @cache/@lru_cache уходят в ответы всем пользователям одним объектом,
+# а модели aiogram изменяемые (frozen=False, validate_assignment=True). Поэтому
+# кэшируемая фабрика помечается @frozen (под @cache): в кэш попадает копия, где
+# присваивание полей — ValidationError, а строки кнопок — кортежи без append.
+# Нужна правка — собрать новую разметку.
+
+
+class _FrozenInlineButton(InlineKeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class _FrozenButton(KeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+def _rows_as_lists(value: Any, handler: Any) -> list[list[Any]]:
+    # Сессия aiogram чистит None-поля только внутри списков, не кортежей
+    return [list(row) for row in handler(value)]
+
+
+class _FrozenInlineMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+    inline_keyboard: tuple[tuple[InlineKeyboardButton, ...], ...]
+
+    @field_serializer("inline_keyboard", mode="wrap")
+    def _serialize_rows(self, value: Any, handler: Any) -> list[list[Any]]:
+        return _rows_as_lists(value, handler)
+
+
+class _FrozenReplyMarkup(ReplyKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+    keyboard: tuple[tuple[KeyboardButton, ...], ...]
+
+    @field_serializer("keyboard", mode="wrap")
+    def _serialize_rows(self, value: Any, handler: Any) -> list[list[Any]]:
+        return _rows_as_lists(value, handler)
+
+
+Markup = TypeVar("Markup", InlineKeyboardMarkup, ReplyKeyboardMarkup)
+P = ParamSpec("P")
+
+
+def _fields(model: BaseModel) -> dict[str, Any]:
+    return {name: getattr(model, name) for name in model.model_fields_set}
+
+
+def freeze(markup: Markup) -> Markup:
+    """Неизменяемая копия разметки для кэша; отправляется так же, как исходная."""
+    if isinstance(markup, InlineKeyboardMarkup):
+        rows = tuple(tuple(_FrozenInlineButton(**_fields(b)) for b in row) for row in markup.inline_keyboard)
+        return _FrozenInlineMarkup(**{**_fields(markup), "inline_keyboard": rows})
+    rows = tuple(tuple(_FrozenButton(**_fields(b)) for b in row) for row in markup.keyboard)
+    return _FrozenReplyMarkup(**{**_fields(markup), "keyboard": rows})
+
+
+def frozen(build: Callable[P, Markup]) -> Callable[P, Markup]:
+    """Фабрика клавиатуры, возвращающая freeze(...) — ставится под @cache/@lru_cache."""
+
+    @wraps(build)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> Markup:
+        return freeze(build(*args, **kwargs))
+
+    return wrapper
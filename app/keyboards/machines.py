@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from functools import cache
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from .callbacks import MachineCb, MachineView
+from .frozen import frozen
+
+# Номер машины в кнопке может быть любой длины: если callback_data не влезает
+# в 64 байта, MachineCb.pack() кладёт его в хранилище токенов.
+
+
+def _button(text: str, view: MachineView, machine: str, number: str = "", cursor: int = 0) -> InlineKeyboardButton:
+    data = MachineCb(view=view, machine=machine, number=number, cursor=cursor).pack()
+    return InlineKeyboardButton(text=text, callback_data=data)
+
+
+def _rows(*rows: list[InlineKeyboardButton | None]) -> InlineKeyboardMarkup:
+    kept = [[b for b in row if b is not None] for row in rows]
+    return InlineKeyboardMarkup(inline_keyboard=[row for row in kept if row])
+
+
+@cache
+@frozen
+def machines_kb(machines: tuple[str, ...]) -> InlineKeyboardMarkup:
+    return _rows(
+        *[[_button(m.replace("RA", "РА"), MachineView.numbers, m)] for m in machines],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data="blocks:menu")],
+    )
+
+
+def machine_numbers_kb(machine: str, numbers: list[str], has_next: bool) -> InlineKeyboardMarkup:
+    rows = [[_button(n, MachineView.units, machine, n)] for n in numbers]
+    nav = [_button("▶️ Далее", MachineView.numbers, machine, numbers[-1]) if has_next and numbers else None]
+    return _rows(*rows, nav, [InlineKeyboardButton(text="⬅️ Машины", callback_data="blocks:machines")])
+
+
+def machine_units_kb(
+    machine: str, number: str, last_id: int | None, has_next: bool, at_start: bool
+) -> InlineKeyboardMarkup:
+    nav = [
+        None if at_start else _button("⏮ В начало", MachineView.units, machine, number),
+        _button("▶️ Далее", MachineView.units, machine, number, last_id or 0) if has_next else None,
+    ]
+    return _rows(
+        nav,
+        [_button("📜 История выдач", MachineView.history, machine, number)],
+        [_button("⬅️ Номера машин", MachineView.numbers, machine)],
+    )
+
+
+def machine_history_kb(
+    machine: str, number: str, last_event_id: int | None, has_next: bool, at_start: bool
+) -> InlineKeyboardMarkup:
+    nav = [
+        None if at_start else _button("⏮ В начало", MachineView.history, machine, number),
+        _button("▶️ Раньше", MachineView.history, machine, number, last_event_id or 0) if has_next else None,
+    ]
+    return _rows(nav, [_button("📦 Блоки на машине", MachineView.units, machine, number)])
@@ -1,6 +1,12 @@
+from functools import cache
+
 from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
 
+from .frozen import frozen
+
 
+@cache
+@frozen
 def main_menu_kb() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
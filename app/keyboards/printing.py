@@ -1,6 +1,12 @@
+from functools import cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from .frozen import frozen
+
 
+@cache
+@frozen
 def print_confirm_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -8,3 +14,11 @@ def print_confirm_kb() -> InlineKeyboardMarkup:
             [InlineKeyboardButton(text="❌ Отмена", callback_data="print:confirm:no")],
         ]
     )
+
+
+def print_time_kb(minutes: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=f"⏱ Принять оценку: {minutes} мин", callback_data="print:time:accept")],
+        ]
+    )
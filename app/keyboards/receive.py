@@ -1,10 +1,20 @@
 from __future__ import annotations
 
-from typing import Iterable
+from functools import cache, lru_cache
+from typing import Iterable, Sequence
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from .callbacks import ChoiceAction, ChoiceCb
+from .frozen import frozen
 
+# Статичные клавиатуры строятся один раз (@cache), страницы списков кэшируются LRU;
+# в кэше — замороженные копии (@frozen, см. frozen.py). Изменять полученную разметку нельзя.
+PAGED_KB_CACHE_SIZE = 256
+
+
+@cache
+@frozen
 def status_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -16,6 +26,8 @@ def status_kb() -> InlineKeyboardMarkup:
     )
 
 
+@cache
+@frozen
 def ra_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -27,12 +39,25 @@ def ra_kb() -> InlineKeyboardMarkup:
     )
 
 
+@cache
+@frozen
 def skip_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="⏭️ Пропустить", callback_data="recv:skip")]]
     )
 
 
+@cache
+@frozen
+def batch_confirm_kb() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Принять все", callback_data="recv:batch:ok")],
+            [InlineKeyboardButton(text="❌ Отмена", callback_data="recv:batch:cancel")],
+        ]
+    )
+
+
 def choices_kb(values: Iterable[str], prefix: str) -> InlineKeyboardMarkup:
     rows = [[InlineKeyboardButton(text=v, callback_data=f"{prefix}:{v}")] for v in values]
     # add manual entry option at the end
@@ -40,7 +65,23 @@ def choices_kb(values: Iterable[str], prefix: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def choices_paged_kb(values: list[str], prefix: str, page: int, page_size: int = 5) -> InlineKeyboardMarkup:
+def _choice(scope: str, action: ChoiceAction, idx: int = 0, page: int = 0) -> str:
+    return ChoiceCb(scope=scope, action=action, idx=idx, page=page).pack()
+
+
+def choices_paged_kb(values: Sequence[str], scope: str, page: int, page_size: int = 5) -> InlineKeyboardMarkup:
+    """Список с пагинацией; кнопки — ChoiceCb со scope (какой список) и действием idx/page/manual.
+
+    Страница берётся из кэша по (справочник, scope, page, page_size). Версия
+    справочника — его содержимое: пока названия те же, листание не строит кнопки
+    заново; добавилось название — другой ключ, старые страницы вытеснит LRU.
+    """
+    return _paged_kb(tuple(values), scope, page, page_size)
+
+
+@lru_cache(maxsize=PAGED_KB_CACHE_SIZE)
+@frozen
+def _paged_kb(values: tuple[str, ...], scope: str, page: int, page_size: int) -> InlineKeyboardMarkup:
     total = len(values)
     start = max(page, 0) * page_size
     end = min(start + page_size, total)
@@ -49,16 +90,47 @@ def choices_paged_kb(values: list[str], prefix: str, page: int, page_size: int =
     rows: list[list[InlineKeyboardButton]] = []
     for idx in range(start, end):
         text = values[idx]
-        rows.append([InlineKeyboardButton(text=text, callback_data=f"{prefix}:idx:{idx}")])
+        rows.append([InlineKeyboardButton(text=text, callback_data=_choice(scope, ChoiceAction.idx, idx=idx))])
 
     nav_row: list[InlineKeyboardButton] = []
     if start > 0:
-        nav_row.append(InlineKeyboardButton(text="◀️", callback_data=f"{prefix}:page:{page-1}"))
+        nav_row.append(InlineKeyboardButton(text="◀️", callback_data=_choice(scope, ChoiceAction.page, page=page - 1)))
     nav_row.append(InlineKeyboardButton(text=f"{page+1}/{(total-1)//page_size+1}", callback_data="noop"))
     if end < total:
-        nav_row.append(InlineKeyboardButton(text="▶️", callback_data=f"{prefix}:page:{page+1}"))
+        nav_row.append(InlineKeyboardButton(text="▶️", callback_data=_choice(scope, ChoiceAction.page, page=page + 1)))
     if nav_row:
         rows.append(nav_row)
 
-    rows.append([InlineKeyboardButton(text="✍️ Ввести вручную", callback_data=f"{prefix}:manual")])
+    rows.append([InlineKeyboardButton(text="✍️ Ввести вручную", callback_data=_choice(scope, ChoiceAction.manual))])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def choices_toggle_kb(
+    values: list[str], selected: Iterable[int], scope: str, page: int, page_size: int = 8
+) -> InlineKeyboardMarkup:
+    """Список с галочками (множественный выбор) и пагинацией, как choices_paged_kb."""
+    chosen = set(selected)
+    total = len(values)
+    start = max(page, 0) * page_size
+    end = min(start + page_size, total)
+    page = start // page_size  # normalize
+
+    rows: list[list[InlineKeyboardButton]] = []
+    for idx in range(start, end):
+        mark = "✅" if idx in chosen else "▫️"
+        rows.append([InlineKeyboardButton(text=f"{mark} {values[idx]}", callback_data=_choice(scope, ChoiceAction.tgl, idx=idx, page=page))])
+
+    nav_row: list[InlineKeyboardButton] = []
+    if start > 0:
+        nav_row.append(InlineKeyboardButton(text="◀️", callback_data=_choice(scope, ChoiceAction.page, page=page - 1)))
+    nav_row.append(InlineKeyboardButton(text=f"{page+1}/{max(total-1, 0)//page_size+1}", callback_data="noop"))
+    if end < total:
+        nav_row.append(InlineKeyboardButton(text="▶️", callback_data=_choice(scope, ChoiceAction.page, page=page + 1)))
+    rows.append(nav_row)
+
+    rows.append([
+        InlineKeyboardButton(text="☑️ Все", callback_data=_choice(scope, ChoiceAction.all, page=page)),
+        InlineKeyboardButton(text="⬜️ Снять", callback_data=_choice(scope, ChoiceAction.none, page=page)),
+    ])
+    rows.append([InlineKeyboardButton(text=f"➡️ Далее ({len(chosen)})", callback_data=_choice(scope, ChoiceAction.done))])
     return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -1,13 +1,116 @@
 from __future__ import annotations
 
+import json
 import sys
+import traceback
+from typing import Any
+
 from loguru import logger
 
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+
+# Поля контекста апдейта, которые middleware кладёт в extra через logger.contextualize()
+CONTEXT_FIELDS = ("update_id", "event_type", "tg_id", "handler")
+
+
+def _parse_sampling(spec: str) -> dict[str, int]:
+    """'message=10,callback_query=5,*=1' -> {'message': 10, 'callback_query': 5, '*': 1}"""
+    rates: dict[str, int] = {}
+    for part in (spec or "").split(","):
+        key, _, value = part.strip().partition("=")
+        if not key or not value:
+            continue
+        try:
+            rate = int(value)
+        except ValueError:
+            continue
+        if rate > 1:
+            rates[key.strip()] = rate
+    return rates
+
+
+class DebugSampler:
+    """Фильтр sink'а: пропускает каждую N-ю DEBUG-запись для каждого типа апдейта.
+
+    Тип берётся из extra['event_type'] (его проставляет LoggingContextMiddleware),
+    записи вне апдейта попадают в ключ '*'. Уровни выше DEBUG не сэмплируются.
+    """
 
-def setup_logging(level: str = "INFO") -> None:
+    def __init__(self, rates: dict[str, int]) -> None:
+        self.rates = rates
+        self.default = rates.get("*", 1)
+        self.counters: dict[str, int] = {}
+
+    def __call__(self, record: dict[str, Any]) -> bool:
+        if record["level"].no > 10:  # DEBUG
+            return True
+        key = record["extra"].get("event_type") or "*"
+        rate = self.rates.get(key, self.default)
+        if rate <= 1:
+            return True
+        n = self.counters.get(key, 0)
+        self.counters[key] = n + 1
+        return n % rate == 0
+
+
+def _json_format(record: dict[str, Any]) -> str:
+    payload: dict[str, Any] = {
+        "ts": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "func": record["function"],
+        "line": record["line"],
+        "msg": record["message"],
+    }
+    extra = record["extra"]
+    for key in CONTEXT_FIELDS:
+        value = extra.get(key)
+        if value is not None:
+            payload[key] = value
+    for key, value in extra.items():
+        # Пустые поля контекста (None вне апдейта) не пишем вовсе, а не как null
+        if key not in payload and key not in CONTEXT_FIELDS and not key.startswith("_"):
+            payload[key] = value
+    exc = record["exception"]
+    if exc is not None and exc.type is not None:
+        payload["exc"] = "".join(traceback.format_exception(exc.type, exc.value, exc.traceback))
+    extra["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
+
+
+def setup_logging(
+    level: str = "INFO",
+    *,
+    fmt: str = "text",
+    enqueue: bool = False,
+    file_path: str | None = None,
+    rotation: str | None = None,
+    retention: str | None = None,
+    compression: str | None = None,
+    debug_sampling: str = "",
+) -> None:
+    """Настройка sink'ов loguru.
+
+    fmt='text' — цветной человекочитаемый вывод (режим разработки),
+    fmt='json' — JSON-lines с контекстом апдейта (update_id, tg_id, handler).
+    enqueue=True переносит запись в фоновый поток, чтобы не блокировать event loop.
+    file_path добавляет файловый sink с ротацией/сжатием (всегда в формате fmt).
+    """
     logger.remove()
-    logger.add(sys.stdout, level=level, backtrace=False, diagnose=False, enqueue=False,
-               format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+    rates = _parse_sampling(debug_sampling)
+    formatter = _json_format if fmt == "json" else TEXT_FORMAT
+
+    logger.add(sys.stdout, level=level, backtrace=False, diagnose=False, enqueue=enqueue,
+               colorize=False if fmt == "json" else None,
+               filter=DebugSampler(rates) if rates else None, format=formatter)
+    if file_path:
+        logger.add(file_path, level=level, backtrace=False, diagnose=False, enqueue=enqueue,
+                   colorize=False, filter=DebugSampler(rates) if rates else None, format=formatter,
+                   rotation=rotation or None, retention=retention or None,
+                   compression=compression or None, encoding="utf-8")
 
 
 __all__ = ["logger", "setup_logging"]
@@ -1,5 +1,12 @@
 from __future__ import annotations
 
+import sys
+import time
+
+# Отметка до тяжёлых импортов — для разбивки времени старта
+_T0 = time.perf_counter()
+_M0 = len(sys.modules)
+
 import asyncio
 
 from aiogram import Bot, Dispatcher
@@ -10,31 +17,94 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from .config import get_settings
 from .logger import setup_logging, logger
 from .db.base import setup_engine, init_db
-from .handlers import setup_routers
+from .middlewares import setup_logging_middlewares
+from .startup import StartupTimer
+
+
+def build_dispatcher() -> Dispatcher:
+    # Импорт здесь, а не в начале модуля, только ради отчёта о старте: импорт
+    # хендлеров попадает в фазу «routers». До первого getUpdates он всё равно нужен
+    from .handlers import setup_routers
+
+    dp = Dispatcher(storage=MemoryStorage())
+    setup_logging_middlewares(dp)
+    dp.include_router(setup_routers())
+    return dp
 
 
 async def main() -> None:
+    timer = StartupTimer(_T0, _M0)
+    timer.mark("imports")
     settings = get_settings()
+    timer.mark("settings")
 
     # Logging
-    setup_logging(settings.log_level)
+    setup_logging(
+        settings.log_level,
+        fmt=settings.log_format,
+        enqueue=settings.log_enqueue,
+        file_path=settings.log_file or None,
+        rotation=settings.log_rotation,
+        retention=settings.log_retention,
+        compression=settings.log_compression,
+        debug_sampling=settings.log_debug_sampling,
+    )
     logger.info("Starting bot...")
+    timer.mark("logging")
 
     # DB
-    setup_engine(settings.database_url)
+    setup_engine(settings.database_url, settings.database_read_url, settings.db_query_cache_size)
     await init_db()
+    timer.mark("db")
 
     # Bot + Dispatcher
     bot = Bot(
         token=settings.telegram_bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    dp = Dispatcher(storage=MemoryStorage())
-    dp.include_router(setup_routers())
+    timer.mark("bot")
+    dp = build_dispatcher()
+    timer.mark("routers")
+
+    @dp.startup()
+    async def on_startup() -> None:
+        # startup срабатывает непосредственно перед первым getUpdates
+        timer.mark("polling_setup")
+        if settings.log_startup_timing:
+            logger.info("Startup timing: {}", timer.report())
+        from .services.export_scheduler import export_scheduler
+        from .services.printers import printer_registry
+
+        bad = export_scheduler.configure(
+            settings.export_schedule,
+            settings.export_dir,
+            settings.export_keep,
+            settings.export_part_max_mb * 1024 * 1024,
+        )
+        if bad:
+            logger.warning("EXPORT_SCHEDULE: skipped invalid entries: {}", ", ".join(bad))
+        export_scheduler.start(bot)
+        # Принтеры и таймер обслуживания — с запуска: окончание обслуживания, наступившее
+        # после рестарта, продвигает очередь, даже если печатью ещё никто не пользовался
+        await printer_registry.ensure_loaded()
+
+    @dp.shutdown()
+    async def on_shutdown() -> None:
+        from .services.export_scheduler import export_scheduler
+        from .services.export_tasks import export_tasks
+        from .services.printers import printer_registry
+
+        await printer_registry.stop()
+        await export_scheduler.stop()
+        await export_tasks.stop()
 
     # Start polling
     logger.info("Bot is running with long polling")
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    try:
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        # Дождаться, пока фоновый sink допишет очередь
+        await logger.complete()
 
 
 if __name__ == "__main__":
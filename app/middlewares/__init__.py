@@ -0,0 +1 @@
+from .logging import setup_logging_middlewares
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update, User
+
+from ..logger import logger
+
+
+class UpdateContextMiddleware(BaseMiddleware):
+    """Outer-middleware на Update: кладёт update_id, тип апдейта и tg_id в контекст логов."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        update_id = event.update_id if isinstance(event, Update) else None
+        event_type = event.event_type if isinstance(event, Update) else None
+        user: User | None = data.get("event_from_user")
+        with logger.contextualize(
+            update_id=update_id,
+            event_type=event_type,
+            tg_id=user.id if user else None,
+        ):
+            return await handler(event, data)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Inner-middleware: добавляет в контекст логов имя сработавшего хендлера."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_obj = data.get("handler")
+        callback = getattr(handler_obj, "callback", None)
+        name = f"{callback.__module__}.{callback.__qualname__}" if callback else None
+        with logger.contextualize(handler=name):
+            return await handler(event, data)
+
+
+def setup_logging_middlewares(dp: Dispatcher) -> None:
+    dp.update.outer_middleware(UpdateContextMiddleware())
+    handler_mw = HandlerNameMiddleware()
+    for event_name, observer in dp.observers.items():
+        if event_name in ("update", "error"):
+            continue
+        observer.middleware(handler_mw)
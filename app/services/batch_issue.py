@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import rollups
+from ..db.models import Unit, UnitEvent
+
+# Выдача нескольких блоков на одну машину: номера списком, выбор галочками,
+# проверка/обновление/события — пачкой в одной транзакции.
+MAX_ISSUE_UNITS = 100
+# Параметров в одном IN: у SQLite ограничено число переменных запроса
+IN_CHUNK = 500
+
+_SEPARATORS = re.compile(r"[\s,;]+")
+
+
+@dataclass(slots=True)
+class IssueCandidate:
+    id: int
+    number: str
+    name: str | None
+    type: str | None
+    status: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.number} | {self.name or '-'} | {self.type or '-'}"
+
+
+def parse_numbers(text: str) -> list[str]:
+    """Номера блоков из текста (через пробел, запятую, ; или с новой строки), без повторов."""
+    return list(dict.fromkeys(n for n in _SEPARATORS.split(text) if n))
+
+
+async def find_by_numbers(session: AsyncSession, numbers: list[str]) -> list[IssueCandidate]:
+    """Все блоки с указанными номерами одним IN-запросом (кусками по IN_CHUNK)."""
+    found: list[IssueCandidate] = []
+    for start in range(0, len(numbers), IN_CHUNK):
+        stmt = (
+            select(Unit.id, Unit.number, Unit.name, Unit.type, Unit.status)
+            .where(Unit.number.in_(numbers[start:start + IN_CHUNK]))
+            .order_by(Unit.number.asc(), Unit.name.asc(), Unit.type.asc())
+        )
+        found += [IssueCandidate(*row) for row in (await session.execute(stmt)).all()]
+    return found
+
+
+async def issue_units(
+    session: AsyncSession,
+    unit_ids: list[int],
+    *,
+    by_user_id: int | None,
+    by_user_name: str | None,
+    machine: str | None,
+    machine_number: str | None,
+) -> tuple[list[IssueCandidate], list[IssueCandidate]]:
+    """Выдать блоки: (выданные, пропущенные — статус не 'done'); commit — на вызывающем.
+
+    Статусы проверяются одним IN-запросом, затем один UPDATE и один executemany
+    с событиями 'issued'. UPDATE повторяет условие status = 'done', так что блок,
+    который успели выдать или вернуть в ремонт параллельно, не будет выдан дважды.
+    """
+    units: list[IssueCandidate] = []
+    for start in range(0, len(unit_ids), IN_CHUNK):
+        stmt = select(Unit.id, Unit.number, Unit.name, Unit.type, Unit.status).where(
+            Unit.id.in_(unit_ids[start:start + IN_CHUNK])
+        )
+        units += [IssueCandidate(*row) for row in (await session.execute(stmt)).all()]
+    ready = [u for u in units if u.status == "done"]
+    skipped = [u for u in units if u.status != "done"]
+    if not ready:
+        return [], skipped
+
+    # Выданный на машину блок теперь к ней и привязан: по привязке строится /machine
+    values: dict[str, str | None] = {"status": "issued"}
+    if machine:
+        values.update(machine=machine, machine_number=machine_number)
+    issued_ids: set[int] = set()
+    moved: list[tuple[str | None, str | None]] = []
+    for start in range(0, len(ready), IN_CHUNK):
+        part = [u.id for u in ready[start:start + IN_CHUNK]]
+        result = await session.execute(
+            update(Unit)
+            .where(Unit.id.in_(part), Unit.status == "done")
+            .values(values)
+            .returning(Unit.id, Unit.type, Unit.condition)
+        )
+        for unit_id, unit_type, condition in result.all():
+            issued_ids.add(unit_id)
+            moved.append((unit_type, condition))
+    skipped += [u for u in ready if u.id not in issued_ids]
+    issued = [u for u in ready if u.id in issued_ids]
+    if issued:
+        await session.execute(
+            insert(UnitEvent),
+            [
+                {
+                    "unit_id": u.id,
+                    "event_type": "issued",
+                    "by_user_id": by_user_id,
+                    "by_user_name": by_user_name,
+                    "destination_machine": machine,
+                    "destination_machine_number": machine_number,
+                }
+                for u in issued
+            ],
+        )
+        await rollups.stock_moved(session, moved, "done", "issued")
+        await rollups.events_logged(session, "issued", len(issued))
+    return issued, skipped
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import csv
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import rollups
+from ..db.models import Unit, UnitEvent
+from .machines import normalize_machine
+
+# Пакетная приёмка: одна строка — один блок
+#   номер;название;тип;статус;машина;номер машины
+# Статус, машина и номер машины необязательны. Вместо ";" можно "," или табуляцию
+# (CSV из таблицы), первая строка-заголовок пропускается.
+COLUMNS = ("number", "name", "type", "condition", "machine", "machine_number")
+MAX_BATCH_ROWS = 500
+MAX_CSV_BYTES = 1024 * 1024
+
+CONDITIONS = {
+    "ok": "Исправный",
+    "исправный": "Исправный",
+    "bad": "Не исправный",
+    "не исправный": "Не исправный",
+    "неисправный": "Не исправный",
+    "warranty": "Гарантийный",
+    "гарантийный": "Гарантийный",
+    "check": "На проверку",
+    "на проверку": "На проверку",
+}
+
+
+@dataclass(slots=True)
+class BatchRow:
+    line: int
+    number: str
+    name: str
+    type: str
+    condition: str | None = None
+    machine: str | None = None
+    machine_number: str | None = None
+
+
+@dataclass(slots=True)
+class BatchParseResult:
+    rows: list[BatchRow] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)  # строки, из-за которых партию принять нельзя
+    warnings: list[str] = field(default_factory=list)  # показываются в сводке, приёмку не блокируют
+
+    def rows_to_data(self) -> list[dict[str, Any]]:
+        return [asdict(r) for r in self.rows]
+
+
+_DELIMITERS = (";", "\t", ",")
+# Сколько первых строк смотреть при выборе разделителя
+SNIFF_LINES = 20
+
+
+def _with_delimiter(delimiter: str) -> type[csv.Dialect]:
+    class Dialect(csv.excel):
+        pass
+
+    Dialect.delimiter = delimiter
+    return Dialect
+
+
+def _fits(lines: list[str], dialect: type[csv.Dialect] | csv.Dialect) -> bool:
+    """Каждая строка (кроме заголовка) делится на 3..len(COLUMNS) полей."""
+    rows = list(csv.reader(lines, dialect))
+    if rows and _is_header(rows[0]):
+        rows = rows[1:]
+    return bool(rows) and all(3 <= len(cells) <= len(COLUMNS) for cells in rows)
+
+
+def _dialect(lines: list[str]) -> type[csv.Dialect] | csv.Dialect:
+    """Разделитель списка: ";", табуляция или ",".
+
+    Sniffer не справляется, когда у строк разное число необязательных полей, —
+    тогда берём разделитель, при котором каждая строка делится на 3..6 полей,
+    а если такого нет — самый частый в первой строке данных.
+    """
+    sample = lines[:SNIFF_LINES]
+    try:
+        sniffed = csv.Sniffer().sniff("\n".join(sample), delimiters="".join(_DELIMITERS))
+    except csv.Error:
+        sniffed = None
+    if sniffed is not None and _fits(sample, sniffed):
+        return sniffed
+    for delimiter in _DELIMITERS:
+        dialect = _with_delimiter(delimiter)
+        if _fits(sample, dialect):
+            return dialect
+    if sniffed is not None:
+        return sniffed
+    first = sample[1] if len(sample) > 1 and _is_header(re.split(r"[;,\t]", sample[0])) else sample[0]
+    # Ошибки по полям покажет разбор: при равенстве — ";", как в BATCH_HELP
+    return _with_delimiter(max(_DELIMITERS, key=first.count))
+
+
+def _is_header(cells: list[str]) -> bool:
+    return bool(cells) and cells[0].strip().lower() in ("number", "номер", "№")
+
+
+def parse_batch(text: str, names: Iterable[str], types: Iterable[str]) -> BatchParseResult:
+    """Разобрать список блоков и сверить названия/типы со справочниками.
+
+    Названия и типы сравниваются без учёта регистра и приводятся к написанию из
+    справочника; неизвестные не запрещены (новый блок), но попадают в предупреждения.
+    """
+    result = BatchParseResult()
+    names_by_key = {n.casefold(): n for n in names}
+    types_by_key = {t.casefold(): t for t in types}
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    if not lines:
+        result.errors.append("Список пуст")
+        return result
+    reader = csv.reader(lines, _dialect(lines))
+    seen: dict[tuple[str, str], int] = {}
+    for line_no, cells in enumerate(reader, start=1):
+        if line_no == 1 and _is_header(cells):
+            continue
+        cells = [c.strip() for c in cells]
+        if len(cells) < 3 or len(cells) > len(COLUMNS):
+            result.errors.append(f"Строка {line_no}: ожидается от 3 до {len(COLUMNS)} полей, получено {len(cells)}")
+            continue
+        cells += [""] * (len(COLUMNS) - len(cells))
+        number, name, type_, condition, machine, machine_number = cells
+        if not number or not name or not type_:
+            result.errors.append(f"Строка {line_no}: номер, название и тип обязательны")
+            continue
+
+        cond_value: str | None = None
+        if condition:
+            cond_value = CONDITIONS.get(condition.lower())
+            if cond_value is None:
+                result.errors.append(f"Строка {line_no}: неизвестный статус «{condition}»")
+                continue
+        machine_value: str | None = None
+        if machine:
+            machine_value = normalize_machine(machine)
+            if machine_value is None:
+                result.errors.append(f"Строка {line_no}: машина должна быть РА1/РА2/РА3, а не «{machine}»")
+                continue
+
+        # Новое значение запоминаем в написании первой строки: дальше по списку оно уже «известное»
+        if name.casefold() not in names_by_key:
+            names_by_key[name.casefold()] = name
+            result.warnings.append(f"Строка {line_no}: новое название «{name}»")
+        if type_.casefold() not in types_by_key:
+            types_by_key[type_.casefold()] = type_
+            result.warnings.append(f"Строка {line_no}: новый тип «{type_}»")
+        row = BatchRow(
+            line=line_no,
+            number=number,
+            name=names_by_key[name.casefold()],
+            type=types_by_key[type_.casefold()],
+            condition=cond_value,
+            machine=machine_value,
+            machine_number=machine_number or None,
+        )
+        key = (row.number, row.name)
+        if key in seen:
+            result.errors.append(f"Строка {line_no}: блок {row.number} «{row.name}» уже есть в строке {seen[key]}")
+            continue
+        seen[key] = line_no
+        result.rows.append(row)
+        if len(result.rows) > MAX_BATCH_ROWS:
+            result.errors.append(f"Не больше {MAX_BATCH_ROWS} блоков за раз")
+            break
+    if not result.rows and not result.errors:
+        result.errors.append("В списке нет блоков")
+    return result
+
+
+def decode_csv(data: bytes) -> str:
+    """CSV из Excel бывает и в UTF-8 (с BOM), и в cp1251."""
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+
+async def load_dictionaries(session: AsyncSession) -> tuple[list[str], list[str]]:
+    names = (await session.execute(select(Unit.name).where(Unit.name.is_not(None)).distinct())).scalars().all()
+    types = (await session.execute(select(Unit.type).where(Unit.type.is_not(None)).distinct())).scalars().all()
+    return [n for n in names if n], [t for t in types if t]
+
+
+async def find_in_stock(session: AsyncSession, rows: list[BatchRow]) -> set[tuple[str, str]]:
+    """Пары (номер, название) из партии, которые уже числятся на складе (не выданы)."""
+    keys = list({(r.number, r.name) for r in rows})
+    found: set[tuple[str, str]] = set()
+    # Ограничиваем число параметров в одном IN: у SQLite лимит на переменные запроса
+    for start in range(0, len(keys), 200):
+        part = keys[start:start + 200]
+        stmt = select(Unit.number, Unit.name).where(
+            tuple_(Unit.number, Unit.name).in_(part), Unit.status != "issued"
+        )
+        found.update((n, nm) for n, nm in (await session.execute(stmt)).all())
+    return found
+
+
+async def insert_batch(
+    session: AsyncSession,
+    rows: list[BatchRow],
+    *,
+    accepted_at: datetime,
+    surname: str | None,
+    by_user_id: int | None,
+) -> list[int]:
+    """Вставить блоки и события 'received' двумя executemany; commit — на вызывающем.
+
+    id новых блоков берутся из RETURNING (порядок соответствует rows).
+    """
+    if not rows:
+        return []
+    unit_ids = (
+        await session.execute(
+            insert(Unit).returning(Unit.id, sort_by_parameter_order=True),
+            [
+                {
+                    "number": r.number,
+                    "name": r.name,
+                    "type": r.type,
+                    "status": "received",
+                    "condition": r.condition,
+                    "machine": r.machine,
+                    "machine_number": r.machine_number,
+                    "accepted_at": accepted_at,
+                    "master_surname": surname,
+                }
+                for r in rows
+            ],
+        )
+    ).scalars().all()
+    await session.execute(
+        insert(UnitEvent),
+        [
+            {
+                "unit_id": unit_id,
+                "event_type": "received",
+                "by_user_id": by_user_id,
+                "by_user_name": surname,
+            }
+            for unit_id in unit_ids
+        ],
+    )
+    await rollups.stock_moved(session, [(r.type, r.condition) for r in rows], None, "received")
+    await rollups.events_logged(session, "received", len(unit_ids))
+    return list(unit_ids)
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import zlib
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Mapping, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+from sqlalchemy import Row, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.models import ExportCursor, Unit, UnitEvent
+
+# Экспорт списка блоков в XML/CSV (опционально gzip). Блоки читаются страницами
+# по (номер, название, id), события для доп. полей — одним IN на страницу;
+# записи сразу пишутся в файл (через компрессор). Если файл дорос бы до лимита
+# загрузки Telegram, начинается следующая часть: каждая часть — самостоятельный
+# файл (XML с корнем <units>, CSV с заголовком).
+FORMATS = ("xml", "xml.gz", "csv", "csv.gz")
+PAGE_SIZE = 1000
+# При gzip компрессор сбрасывается (Z_SYNC_FLUSH) каждые FLUSH_EVERY байт входа:
+# размер части известен с точностью до этой величины
+FLUSH_EVERY = 1024 * 1024
+_META_EVENTS = ("received", "issued", "repair_close")
+# Тяжёлые выгрузки (кнопки, команды, расписание) идут по одной: две полные
+# выгрузки параллельно только удлиняют обе и держат два долгих чтения в БД
+export_slots = asyncio.Semaphore(1)
+_TS = "%Y-%m-%dT%H:%M:%S"
+# Колбэк прогресса: сколько записей уже записано (вызывается после каждой страницы)
+Progress = Callable[[int], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class ExportRow:
+    id: int
+    number: str
+    name: str
+    type: str
+    status: str
+    machine: str
+    machine_number: str
+    accepted_at: str
+    created_at: str
+    # Доп. сведения из событий
+    received_by: str = ""
+    issued_by: str = ""
+    last_repair_at: str = ""
+    last_repair_summary: str = ""
+
+
+FIELDS = tuple(f.name for f in fields(ExportRow))
+
+
+_UNIT_COLUMNS = (
+    Unit.id, Unit.number, Unit.name, Unit.type, Unit.status,
+    Unit.machine, Unit.machine_number, Unit.accepted_at, Unit.created_at,
+)
+
+
+def _unit_values(u: Row[Any]) -> tuple[Any, ...]:
+    return (
+        u.id, u.number or "", u.name or "", u.type or "", u.status or "",
+        u.machine or "", u.machine_number or "",
+        u.accepted_at.strftime(_TS) if u.accepted_at else "",
+        u.created_at.strftime(_TS) if u.created_at else "",
+    )
+
+
+async def count_export_units(session: AsyncSession, include_all: bool) -> int:
+    """Сколько блоков попадёт в export_units (знаменатель для прогресса)."""
+    q = select(func.count()).select_from(Unit)
+    if not include_all:
+        q = q.where(Unit.status != "issued")
+    return int((await session.execute(q)).scalar_one())
+
+
+async def iter_export_pages(
+    session: AsyncSession, include_all: bool, page_size: int = PAGE_SIZE
+) -> AsyncIterator[list[ExportRow]]:
+    """Блоки (на складе или все) страницами в порядке номер/название, с полями из событий."""
+    after: tuple[str, str, int] | None = None
+    while True:
+        q = select(*_UNIT_COLUMNS)
+        if not include_all:
+            # На складе: всё, что не выдано
+            q = q.where(Unit.status != "issued")
+        if after is not None:
+            q = q.where(tuple_(Unit.number, Unit.name, Unit.id) > after)
+        q = q.order_by(Unit.number.asc(), Unit.name.asc(), Unit.id.asc()).limit(page_size)
+        units = (await session.execute(q)).all()
+        if not units:
+            return
+        rows = {u.id: ExportRow(*_unit_values(u)) for u in units}
+        await _fill_meta(session, rows)
+        yield list(rows.values())
+        last = units[-1]
+        after = (last.number, last.name, last.id)
+
+
+async def _fill_meta(session: AsyncSession, rows: Mapping[int, ExportRow]) -> None:
+    """Поля из событий для страницы блоков — один запрос по индексу (unit_id, timestamp)."""
+    ev_q = (
+        select(UnitEvent.unit_id, UnitEvent.event_type, UnitEvent.by_user_name, UnitEvent.timestamp, UnitEvent.comment)
+        .where(UnitEvent.unit_id.in_(list(rows)), UnitEvent.event_type.in_(_META_EVENTS))
+        .order_by(UnitEvent.unit_id.asc(), UnitEvent.timestamp.desc(), UnitEvent.id.desc())
+    )
+    # Для каждого блока берём последнее событие каждого типа
+    seen: set[tuple[int, str]] = set()
+    for unit_id, event_type, by_user_name, ts, comment in (await session.execute(ev_q)).all():
+        if (unit_id, event_type) in seen:
+            continue
+        seen.add((unit_id, event_type))
+        row = rows[unit_id]
+        if event_type == "received":
+            row.received_by = by_user_name or ""
+        elif event_type == "issued":
+            row.issued_by = by_user_name or ""
+        else:
+            row.last_repair_at = ts.strftime(_TS) if ts else ""
+            row.last_repair_summary = comment or ""
+
+
+# ===== Дельта: блоки, затронутые событиями после курсора =====
+
+
+@dataclass(slots=True)
+class DeltaRow(ExportRow):
+    # upsert — актуальное состояние блока; delete — блок ушёл со склада (выдан) или удалён
+    change: str = "upsert"
+    event_id: int = 0  # последнее событие блока в этой дельте
+
+
+DELTA_FIELDS = tuple(f.name for f in fields(DeltaRow))
+
+
+async def changed_units(session: AsyncSession, after_event_id: int, upto_event_id: int) -> list[tuple[int, int]]:
+    """(unit_id, последнее событие) по событиям с id в (after, upto] — диапазон по первичному ключу."""
+    q = (
+        select(UnitEvent.unit_id, func.max(UnitEvent.id))
+        .where(UnitEvent.id > after_event_id, UnitEvent.id <= upto_event_id)
+        .group_by(UnitEvent.unit_id)
+        .order_by(UnitEvent.unit_id.asc())
+    )
+    return [(unit_id, event_id) for unit_id, event_id in (await session.execute(q)).all()]
+
+
+async def iter_delta_pages(
+    session: AsyncSession, changed: list[tuple[int, int]], page_size: int = PAGE_SIZE
+) -> AsyncIterator[list[DeltaRow]]:
+    for start in range(0, len(changed), page_size):
+        part = dict(changed[start:start + page_size])
+        units = (await session.execute(select(*_UNIT_COLUMNS).where(Unit.id.in_(list(part))))).all()
+        rows: dict[int, DeltaRow] = {}
+        for u in units:
+            row = DeltaRow(*_unit_values(u), event_id=part[u.id])
+            if row.status == "issued":
+                row.change = "delete"
+            rows[u.id] = row
+        if rows:
+            await _fill_meta(session, rows)
+        # Событие есть, а блока нет — отдаём «надгробие» только с id
+        missing = [
+            DeltaRow(unit_id, "", "", "", "", "", "", "", "", change="delete", event_id=event_id)
+            for unit_id, event_id in part.items()
+            if unit_id not in rows
+        ]
+        yield sorted([*rows.values(), *missing], key=lambda r: r.id)
+
+
+async def first_event_since(session: AsyncSession, since: datetime) -> int | None:
+    """Наименьший id события не раньше since; None — таких событий нет.
+
+    "id + 0" не даёт SQLite выбрать обход по первичному ключу с начала таблицы (оптимизация
+    min(rowid)): читается только диапазон индекса ix_unit_events_timestamp от since.
+    """
+    q = select(func.min(UnitEvent.id + 0)).where(UnitEvent.timestamp >= since)
+    return (await session.execute(q)).scalar()
+
+
+async def last_event_id(session: AsyncSession) -> int:
+    return (await session.execute(select(func.max(UnitEvent.id)))).scalar() or 0
+
+
+async def get_cursor(session: AsyncSession, consumer: str) -> int:
+    cursor = await session.get(ExportCursor, consumer)
+    return cursor.last_event_id if cursor else 0
+
+
+async def save_cursor(session: AsyncSession, consumer: str, event_id: int) -> None:
+    cursor = await session.get(ExportCursor, consumer)
+    if cursor is None:
+        session.add(ExportCursor(consumer=consumer, last_event_id=event_id, updated_at=datetime.utcnow()))
+    else:
+        cursor.last_event_id = event_id
+        cursor.updated_at = datetime.utcnow()
+
+
+class _XmlFormat:
+    def __init__(self, columns: tuple[str, ...], attrs: dict[str, str]) -> None:
+        self._columns = columns
+        attrs_xml = "".join(f" {k}={quoteattr(v)}" for k, v in attrs.items())
+        self._open = f"<?xml version='1.0' encoding='utf-8'?>\n<units{attrs_xml}>".encode()
+
+    def head(self) -> bytes:
+        return self._open
+
+    def record(self, row: ExportRow) -> bytes:
+        parts = ["<unit>"]
+        for name, value in zip(self._columns, astuple(row)):
+            value = escape(str(value))
+            parts.append(f"<{name}>{value}</{name}>" if value else f"<{name} />")
+        parts.append("</unit>")
+        return "".join(parts).encode()
+
+    def tail(self) -> bytes:
+        return b"</units>"
+
+
+class _CsvFormat:
+    def __init__(self, columns: tuple[str, ...]) -> None:
+        self._columns = columns
+        self._buf = io.StringIO()
+        # ";" и BOM — чтобы Excel с русской локалью открывал файл без мастера импорта
+        self._writer = csv.writer(self._buf, delimiter=";", lineterminator="\r\n")
+
+    def _line(self, values: Iterable[object]) -> bytes:
+        self._buf.seek(0)
+        self._buf.truncate()
+        self._writer.writerow(values)
+        return self._buf.getvalue().encode()
+
+    def head(self) -> bytes:
+        return "\ufeff".encode() + self._line(self._columns)
+
+    def record(self, row: ExportRow) -> bytes:
+        return self._line(astuple(row))
+
+    def tail(self) -> bytes:
+        return b""
+
+
+class PartWriter:
+    """Пишет записи в файлы-части, каждая не больше max_bytes на диске (после сжатия)."""
+
+    def __init__(
+        self,
+        directory: Path,
+        stem: str,
+        fmt: str,
+        max_bytes: int,
+        *,
+        columns: tuple[str, ...] = FIELDS,
+        attrs: dict[str, str] | None = None,
+    ) -> None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.directory = directory
+        self.stem = stem
+        self.ext = fmt
+        self.gzip = fmt.endswith(".gz")
+        self.max_bytes = max_bytes
+        # При маленьком лимите сбрасываем чаще, иначе запас «на несжатое» съест часть
+        self._flush_every = min(FLUSH_EVERY, max(64 * 1024, max_bytes // 16))
+        # attrs — атрибуты корня <units> в XML (время выгрузки, область, курсоры)
+        self.format = _CsvFormat(columns) if fmt.startswith("csv") else _XmlFormat(columns, attrs or {})
+        self.parts: list[Path] = []
+        self.rows = 0
+        self._file: io.BufferedWriter | None = None
+        self._comp: zlib._Compress | None = None
+        self._written = 0  # байт уже на диске в текущей части
+        self._pending = 0  # байт входа в компрессоре с последнего сброса
+        self._records = 0  # записей в текущей части
+
+    @property
+    def _size(self) -> int:
+        # Оценка сверху: несброшенный вход компрессора считаем несжатым
+        return self._written + self._pending
+
+    def _open_part(self) -> None:
+        path = self.directory / f"{self.stem}.part{len(self.parts) + 1:02d}.{self.ext}"
+        self.parts.append(path)
+        self._file = open(path, "wb")
+        # wbits=31 — формат gzip (заголовок + CRC), открывается обычными архиваторами
+        self._comp = zlib.compressobj(6, zlib.DEFLATED, 31) if self.gzip else None
+        self._written = self._pending = self._records = 0
+        self._put(self.format.head())
+
+    def _put(self, data: bytes) -> None:
+        assert self._file is not None
+        if self._comp is None:
+            self._file.write(data)
+            self._written += len(data)
+            return
+        out = self._comp.compress(data)
+        self._pending += len(data)
+        if self._pending >= self._flush_every:
+            out += self._comp.flush(zlib.Z_SYNC_FLUSH)
+            self._pending = 0
+        self._file.write(out)
+        self._written += len(out)
+
+    def _close_part(self) -> None:
+        assert self._file is not None
+        self._put(self.format.tail())
+        if self._comp is not None:
+            self._file.write(self._comp.flush())
+        self._file.close()
+        self._file = self._comp = None
+
+    def write(self, rows: Iterable[ExportRow]) -> None:
+        tail = len(self.format.tail()) + (32 if self.gzip else 0)  # 32 — запас на хвост deflate и трейлер gzip
+        for row in rows:
+            record = self.format.record(row)
+            if self._file is None:
+                self._open_part()
+            elif self._records and self._size + len(record) + tail > self.max_bytes:
+                self._close_part()
+                self._open_part()
+            self._put(record)
+            self._records += 1
+            self.rows += 1
+
+    def finish(self) -> list[Path]:
+        """Закрыть последнюю часть; единственная часть получает имя без номера."""
+        if self._file is None and not self.parts:
+            self._open_part()  # пустой экспорт — файл с одним заголовком
+        if self._file is not None:
+            self._close_part()
+        if len(self.parts) == 1:
+            single = self.directory / f"{self.stem}.{self.ext}"
+            self.parts[0].replace(single)
+            self.parts[0] = single
+        return self.parts
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = self._comp = None
+        for path in self.parts:
+            path.unlink(missing_ok=True)
+
+
+async def export_units(
+    session: AsyncSession,
+    directory: Path,
+    *,
+    include_all: bool,
+    fmt: str,
+    max_bytes: int,
+    generated_at: datetime | None = None,
+    progress: Progress | None = None,
+) -> list[Path]:
+    """Выгрузить блоки в directory; вернуть пути частей (одна, если уложились в max_bytes)."""
+    stem = "units_all" if include_all else "units_in_stock"
+    attrs = {
+        "generated_at": generated_at.strftime(_TS) if generated_at else "",
+        "scope": "all" if include_all else "in_stock",
+    }
+    writer = PartWriter(directory, stem, fmt, max_bytes, attrs=attrs)
+    return await _write_pages(writer, iter_export_pages(session, include_all), progress)
+
+
+async def export_delta(
+    session: AsyncSession,
+    directory: Path,
+    *,
+    after_event_id: int,
+    upto_event_id: int,
+    fmt: str,
+    max_bytes: int,
+    generated_at: datetime | None = None,
+    changed: list[tuple[int, int]] | None = None,
+    progress: Progress | None = None,
+) -> tuple[list[Path], int]:
+    """Выгрузить блоки, затронутые событиями (after, upto]; вернуть (части, число блоков).
+
+    Размер выгрузки — по числу изменившихся блоков, а не по всему складу.
+    Пустая дельта — ([], 0), файлы не создаются. changed — уже выбранный
+    changed_units (если вызывающему нужно заранее знать число блоков).
+    """
+    if changed is None:
+        changed = await changed_units(session, after_event_id, upto_event_id)
+    if not changed:
+        return [], 0
+    attrs = {
+        "generated_at": generated_at.strftime(_TS) if generated_at else "",
+        "scope": "delta",
+        "after_event_id": str(after_event_id),
+        "upto_event_id": str(upto_event_id),
+    }
+    stem = f"units_delta_{after_event_id}_{upto_event_id}"
+    writer = PartWriter(directory, stem, fmt, max_bytes, columns=DELTA_FIELDS, attrs=attrs)
+    return await _write_pages(writer, iter_delta_pages(session, changed), progress), len(changed)
+
+
+async def _write_pages(
+    writer: PartWriter, pages: AsyncIterator[Sequence[ExportRow]], progress: Progress | None = None
+) -> list[Path]:
+    # Сериализация и сжатие — в потоке, чтобы не держать event loop. Поток под shield:
+    # при отмене задачи он дописывает текущую страницу, и только потом abort() закрывает файл
+    pending: asyncio.Future[Any] | None = None
+    try:
+        async for page in pages:
+            pending = asyncio.ensure_future(asyncio.to_thread(writer.write, page))
+            await asyncio.shield(pending)
+            if progress is not None:
+                await progress(writer.rows)
+        pending = asyncio.ensure_future(asyncio.to_thread(writer.finish))
+        return await asyncio.shield(pending)
+    except BaseException:
+        if pending is not None and not pending.done():
+            await asyncio.wait([pending])
+        writer.abort()
+        raise
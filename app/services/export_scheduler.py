@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+from sqlalchemy import select
+
+from ..db import base as db_base
+from ..db.models import ExportSubscriber
+from ..logger import logger
+from .export import (
+    Progress,
+    changed_units,
+    count_export_units,
+    export_delta,
+    export_slots,
+    export_units,
+    get_cursor,
+    last_event_id,
+    save_cursor,
+)
+
+# Выгрузки по расписанию. Задания задаются строкой EXPORT_SCHEDULE:
+#   "stock:csv.gz@1h, all:xml.gz@03:00, delta:csv@15m"
+# область (stock | all | delta) : формат @ интервал (15m, 2h, 1d — от полуночи,
+# как */15 в cron) или время ежедневного запуска HH:MM (локальное).
+# Каждый прогон пишется во временный каталог рядом с итоговым и переименовывается
+# целиком (os.replace): читатель каталога видит либо полный набор частей, либо ничего.
+SCOPES = ("stock", "all", "delta")
+_INTERVAL = re.compile(r"^(\d+)([mhd])$")
+_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+@dataclass(slots=True)
+class ExportJob:
+    scope: str
+    fmt: str
+    every: timedelta | None = None
+    at: time | None = None
+    # Когда задание должно уйти; сдвигается только после его прогона, так что слот,
+    # пришедшийся на чужую выгрузку, не теряется, а выполняется следом за ней
+    next_due: datetime | None = None
+    last_run: datetime | None = None
+    last_result: str = ""
+
+    @property
+    def name(self) -> str:
+        return f"{self.scope}-{self.fmt}"
+
+    def next_run(self, after: datetime) -> datetime:
+        """Ближайший запуск строго позже after."""
+        midnight = datetime.combine(after.date(), time())
+        if self.at is not None:
+            run = datetime.combine(after.date(), self.at)
+            return run if run > after else run + timedelta(days=1)
+        assert self.every is not None
+        step = self.every.total_seconds()
+        passed = (after - midnight).total_seconds()
+        return midnight + timedelta(seconds=(passed // step + 1) * step)
+
+
+def parse_schedule(spec: str) -> tuple[list[ExportJob], list[str]]:
+    """Разобрать EXPORT_SCHEDULE: (задания, ошибки по неразобранным элементам)."""
+    from .export import FORMATS
+
+    jobs: list[ExportJob] = []
+    errors: list[str] = []
+    for item in filter(None, (p.strip() for p in spec.split(","))):
+        head, _, when = item.partition("@")
+        scope, _, fmt = head.strip().lower().partition(":")
+        fmt = fmt or "xml"
+        when = when.strip().lower()
+        if scope not in SCOPES or fmt not in FORMATS or not when:
+            errors.append(item)
+            continue
+        m = _INTERVAL.match(when)
+        if m and int(m.group(1)) > 0:
+            jobs.append(ExportJob(scope, fmt, every=timedelta(seconds=int(m.group(1)) * _UNITS[m.group(2)])))
+            continue
+        try:
+            jobs.append(ExportJob(scope, fmt, at=datetime.strptime(when, "%H:%M").time()))
+        except ValueError:
+            errors.append(item)
+    return jobs, errors
+
+
+class ExportScheduler:
+    """Фоновая задача: спит до ближайшего задания, выгружает, рассылает подписчикам.
+
+    Одна задача на процесс; тяжёлые выгрузки делят export_slots с кнопками и командами.
+    Файл загружается в Telegram один раз, остальным подписчикам (и при повторной
+    отправке) уходит сохранённый file_id.
+    """
+
+    def __init__(self) -> None:
+        self.jobs: list[ExportJob] = []
+        self.directory = Path("data/exports")
+        self.keep = 7
+        self.max_bytes = 49 * 1024 * 1024
+        self._bot: Bot | None = None
+        self._task: asyncio.Task[None] | None = None
+        # путь части -> file_id после первой загрузки
+        self._file_ids: dict[str, str] = {}
+
+    def configure(self, spec: str, directory: str, keep: int, max_bytes: int) -> list[str]:
+        """Задания из EXPORT_SCHEDULE; вернуть нераспознанные элементы (для лога)."""
+        self.jobs, errors = parse_schedule(spec)
+        self.directory = Path(directory)
+        self.keep = max(1, keep)
+        self.max_bytes = max_bytes
+        return errors
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self.jobs and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="export-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, now: datetime | None = None) -> list[tuple[ExportJob, datetime]]:
+        """Задания со временем следующего запуска, по возрастанию (просроченные — первыми)."""
+        now = now or datetime.now()
+        for job in self.jobs:
+            if job.next_due is None:
+                job.next_due = job.next_run(now)
+        return sorted(((job, job.next_due) for job in self.jobs if job.next_due is not None), key=lambda x: x[1])
+
+    def due(self, now: datetime) -> list[ExportJob]:
+        """Задания, время которых наступило, в порядке их времени."""
+        return [job for job, when in self.schedule(now) if when <= now]
+
+    async def _run(self) -> None:
+        while True:
+            now = datetime.now()
+            due = self.due(now)
+            if not due:
+                # Спим до ближайшего; после пробуждения время сверяется заново по часам
+                await asyncio.sleep(max(0.0, (self.schedule(now)[0][1] - now).total_seconds()))
+                continue
+            # Наступившие — по очереди (run_job занимает export_slots). Задания, чьё время
+            # придёт за время прогона, выполнятся на следующем круге
+            for job in due:
+                await self.run_due(job)
+
+    async def run_due(self, job: ExportJob) -> None:
+        """Прогнать задание по расписанию, разослать и назначить следующий запуск."""
+        when = job.next_due or datetime.now()
+        try:
+            parts = await self.run_job(job, when)
+            await self.push(job, parts)
+        except Exception:
+            logger.exception("Scheduled export {} failed", job.name)
+            job.last_result = "ошибка"
+        finally:
+            # Пропущенные за долгий прогон слоты не догоняем: одна выгрузка их покрывает
+            job.next_due = job.next_run(max(when, datetime.now()))
+
+    @staticmethod
+    def consumer(job: ExportJob) -> str:
+        """Курсор дельты задания (ExportCursor.consumer)."""
+        return f"schedule:{job.name}"
+
+    async def export(
+        self,
+        job: ExportJob,
+        directory: Path,
+        when: datetime,
+        *,
+        counted: Progress | None = None,
+        progress: Progress | None = None,
+    ) -> tuple[list[Path], str, int | None]:
+        """Выгрузить задание в directory: (части, итог для /export_schedule, граница дельты).
+
+        Курсор дельты не сдвигается — это делает run_job, когда файлы опубликованы;
+        ручной /export_run его не трогает. export_slots держит вызывающий.
+        counted(всего блоков) и progress(записано) — для сообщения с прогрессом.
+        """
+        assert db_base.async_read_session is not None
+        async with db_base.async_read_session() as session:
+            if job.scope == "delta":
+                after = await get_cursor(session, self.consumer(job))
+                upto = await last_event_id(session)
+                changed = await changed_units(session, after, upto)
+                if counted is not None:
+                    await counted(len(changed))
+                parts, n = await export_delta(
+                    session, directory, after_event_id=after, upto_event_id=upto, fmt=job.fmt,
+                    max_bytes=self.max_bytes, generated_at=when, changed=changed, progress=progress,
+                )
+                return parts, f"блоков: {n}", upto
+            include_all = job.scope == "all"
+            if counted is not None:
+                await counted(await count_export_units(session, include_all))
+            parts = await export_units(
+                session, directory, include_all=include_all, fmt=job.fmt,
+                max_bytes=self.max_bytes, generated_at=when, progress=progress,
+            )
+            return parts, f"частей: {len(parts)}", None
+
+    async def run_job(self, job: ExportJob, when: datetime | None = None) -> list[Path]:
+        """Выгрузить задание в directory/<задание>/<ГГГГММДД-ЧЧММСС>/; вернуть пути частей."""
+        when = when or datetime.now()
+        base = self.directory / job.name
+        base.mkdir(parents=True, exist_ok=True)
+        stamp = when.strftime("%Y%m%d-%H%M%S")
+        tmp = base / f".tmp-{stamp}"
+        final = base / stamp
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        assert db_base.async_session is not None
+        try:
+            # Дельта по расписанию тоже идёт через общий лимит: задания стоят в одной очереди
+            async with export_slots:
+                parts, job.last_result, upto = await self.export(job, tmp, when)
+            if parts:
+                shutil.rmtree(final, ignore_errors=True)
+                os.replace(tmp, final)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        # Курсор дельты сдвигается, только когда файлы уже на месте
+        if upto is not None:
+            async with db_base.async_session() as session:
+                await save_cursor(session, self.consumer(job), upto)
+                await session.commit()
+        job.last_run = when
+        if not parts:
+            return []
+        self._prune(base)
+        logger.info("Scheduled export {} written to {} ({})", job.name, final, job.last_result)
+        return [final / p.name for p in parts]
+
+    def _prune(self, base: Path) -> None:
+        runs = sorted(p for p in base.iterdir() if p.is_dir() and not p.name.startswith("."))
+        for old in runs[:-self.keep]:
+            shutil.rmtree(old, ignore_errors=True)
+            for key in [k for k in self._file_ids if k.startswith(str(old) + os.sep)]:
+                del self._file_ids[key]
+
+    async def push(self, job: ExportJob, parts: list[Path]) -> int:
+        """Разослать части подписчикам; вернуть число получателей."""
+        if not parts or self._bot is None or db_base.async_session is None:
+            return 0
+        async with db_base.async_session() as session:
+            tg_ids = (await session.execute(select(ExportSubscriber.tg_id))).scalars().all()
+        sent = 0
+        for tg_id in tg_ids:
+            try:
+                for i, path in enumerate(parts, 1):
+                    caption = f"Экспорт по расписанию: {job.name}"
+                    if len(parts) > 1:
+                        caption += f" (часть {i} из {len(parts)})"
+                    await self.send_file(self._bot, tg_id, path, caption)
+                sent += 1
+            except Exception as exc:  # заблокировал бота, удалил чат и т.п. — остальным отправляем
+                logger.warning("Scheduled export {}: cannot send to {}: {}", job.name, tg_id, exc)
+        return sent
+
+    async def send_file(self, bot: Bot, chat_id: int, path: Path, caption: str) -> None:
+        key = str(path)
+        cached = self._file_ids.get(key)
+        msg = await bot.send_document(
+            chat_id, cached or FSInputFile(path, filename=path.name), caption=caption
+        )
+        if cached is None and msg.document is not None:
+            self._file_ids[key] = msg.document.file_id
+
+
+export_scheduler = ExportScheduler()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import tempfile
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.enums import ChatAction
+from aiogram.types import FSInputFile
+
+from ..db import base as db_base
+from ..keyboards.blocks import export_progress_kb
+from ..logger import logger
+from .export import Progress, count_export_units, export_slots, export_units
+
+# Полные выгрузки по кнопкам и командам — фоновые задачи. Хендлер сразу
+# отвечает сообщением о прогрессе, задача правит его каждые step процентов
+# (не чаще MIN_EDIT_INTERVAL) и держит в чате «отправляет файл…».
+# Одинаковые запросы (тот же ключ: область и формат, задание расписания),
+# пока выгрузка ещё идёт, присоединяются к ней: файл строится один раз,
+# остальным уходит file_id.
+MIN_EDIT_INTERVAL = 1.0
+# Действие в чате гаснет через ~5 с — повторяем чуть чаще
+CHAT_ACTION_EVERY = 4.5
+# Построить выгрузку: build(каталог, counted, progress) -> части. counted(всего блоков)
+# вызывается, когда число известно, progress(записано) — после каждой страницы
+Build = Callable[[Path, Progress, Progress], Awaitable[list[Path]]]
+
+
+@dataclass(slots=True)
+class Watcher:
+    chat_id: int
+    message_id: int  # сообщение с прогрессом и кнопкой отмены
+
+
+@dataclass(eq=False)
+class ExportTask:
+    id: int
+    key: tuple[str, ...]
+    title: str
+    fmt: str
+    build: Build
+    step: int = 10
+    watchers: list[Watcher] = field(default_factory=list)
+    total: int = 0
+    done: int = 0
+    started: bool = False
+    shown: int = -1  # последний показанный процент
+    shown_at: float = 0.0
+    task: asyncio.Task[None] | None = None
+
+    @property
+    def percent(self) -> int:
+        return min(100, self.done * 100 // self.total) if self.total else 100
+
+    def text(self) -> str:
+        head = f"⏳ Экспорт «{self.title}» ({self.fmt})"
+        if not self.started:
+            return f"{head}: в очереди — идёт другая выгрузка" if export_slots.locked() else f"{head}: запускаю…"
+        if not self.total:
+            return f"{head}: считаю блоки…"
+        filled = self.percent // 10
+        return f"{head}\n{'▰' * filled}{'▱' * (10 - filled)} {self.percent}% — {self.done} из {self.total}"
+
+
+class ExportTasks:
+    """Реестр фоновых выгрузок: запуск, присоединение к идущей, отмена."""
+
+    def __init__(self) -> None:
+        self._ids = itertools.count(1)
+        self._tasks: dict[int, ExportTask] = {}
+        # Выгрузки, к которым ещё можно присоединиться (файл не построен)
+        self._running: dict[tuple[str, ...], ExportTask] = {}
+
+    async def request(
+        self,
+        bot: Bot,
+        chat_id: int,
+        *,
+        include_all: bool,
+        fmt: str,
+        max_bytes: int,
+        step: int = 10,
+        generated_at: datetime | None = None,
+    ) -> ExportTask:
+        """Запустить выгрузку блоков или присоединить chat_id к такой же идущей."""
+
+        async def build(directory: Path, counted: Progress, progress: Progress) -> list[Path]:
+            assert db_base.async_read_session is not None
+            async with db_base.async_read_session() as session:
+                await counted(await count_export_units(session, include_all))
+                return await export_units(
+                    session,
+                    directory,
+                    include_all=include_all,
+                    fmt=fmt,
+                    max_bytes=max_bytes,
+                    generated_at=generated_at,
+                    progress=progress,
+                )
+
+        title = "Все блоки" if include_all else "Блоки на складе"
+        return await self.start(bot, chat_id, ("units", str(include_all), fmt), title, fmt, build, step=step)
+
+    async def start(
+        self,
+        bot: Bot,
+        chat_id: int,
+        key: tuple[str, ...],
+        title: str,
+        fmt: str,
+        build: Build,
+        *,
+        step: int = 10,
+    ) -> ExportTask:
+        """Запустить выгрузку build в фоне или присоединить chat_id к идущей с тем же key."""
+        task = self._running.get(key)
+        if task is not None and any(w.chat_id == chat_id for w in task.watchers):
+            await bot.send_message(chat_id, "Такая выгрузка уже готовится — прогресс в сообщении выше.")
+            return task
+        if task is None:
+            task = self._register(key, title, fmt, build, step)
+        try:
+            msg = await bot.send_message(chat_id, task.text(), reply_markup=export_progress_kb(task.id))
+        except BaseException:
+            if not task.watchers and task.task is None:
+                self._forget(task)
+            raise
+        # Пока отправлялось сообщение, выгрузка могла дойти до рассылки файла (список
+        # ждущих уже снят) или завершиться — тогда переводим сообщение на новую задачу.
+        # Присоединяемся без await между проверкой и append
+        while self._running.get(key) is not task:
+            task = self._running.get(key) or self._register(key, title, fmt, build, step)
+            with suppress(Exception):
+                await bot.edit_message_text(
+                    task.text(), chat_id=chat_id, message_id=msg.message_id, reply_markup=export_progress_kb(task.id)
+                )
+        task.watchers.append(Watcher(chat_id, msg.message_id))
+        if task.task is None:
+            task.task = asyncio.get_running_loop().create_task(self._run(task, bot), name=f"export-{task.id}")
+        return task
+
+    async def cancel(self, bot: Bot, task_id: int, chat_id: int, message_id: int) -> bool:
+        """Отписать сообщение от выгрузки; задача отменяется, когда ждущих не осталось."""
+        task = self._tasks.get(task_id)
+        if task is None or not any(w.message_id == message_id and w.chat_id == chat_id for w in task.watchers):
+            return False
+        task.watchers = [w for w in task.watchers if not (w.message_id == message_id and w.chat_id == chat_id)]
+        with suppress(Exception):
+            await bot.edit_message_text(f"✖️ Экспорт «{task.title}» ({task.fmt}) отменён.", chat_id=chat_id, message_id=message_id)
+        if not task.watchers and task.task is not None:
+            task.task.cancel()
+        return True
+
+    async def join(self) -> None:
+        """Дождаться всех идущих выгрузок (бенчмарки, тесты)."""
+        while pending := [t.task for t in self._tasks.values() if t.task is not None]:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def stop(self) -> None:
+        for task in list(self._tasks.values()):
+            if task.task is not None:
+                task.task.cancel()
+        await self.join()
+
+    def _register(self, key: tuple[str, ...], title: str, fmt: str, build: Build, step: int) -> ExportTask:
+        task = ExportTask(next(self._ids), key, title, fmt, build, step=max(1, min(step, 100)))
+        # Регистрируем до первого await: параллельный запрос увидит задачу и присоединится
+        self._tasks[task.id] = self._running[task.key] = task
+        return task
+
+    def _forget(self, task: ExportTask) -> None:
+        self._tasks.pop(task.id, None)
+        if self._running.get(task.key) is task:
+            del self._running[task.key]
+
+    async def _run(self, task: ExportTask, bot: Bot) -> None:
+        actions: asyncio.Task[None] | None = None
+        try:
+            async with export_slots:
+                task.started = True
+                actions = asyncio.get_running_loop().create_task(self._chat_actions(task, bot))
+                with tempfile.TemporaryDirectory(prefix="export_") as tmp:
+                    parts = await task.build(
+                        Path(tmp), lambda total: self._counted(task, bot, total), lambda n: self._progress(task, bot, n)
+                    )
+                    # Файл готов: новые запросы начнут свежую выгрузку, а не получат эту
+                    self._running.pop(task.key, None)
+                    actions.cancel()
+                    await self._deliver(task, bot, parts)
+        except asyncio.CancelledError:
+            logger.info("Export task {} cancelled", task.id)
+            raise
+        except Exception:
+            logger.exception("Export task {} failed", task.id)
+            await self._edit_all(task, bot, f"❌ Экспорт «{task.title}» ({task.fmt}) не удался. Попробуйте позже.")
+        finally:
+            if actions is not None:
+                actions.cancel()
+            self._forget(task)
+
+    async def _counted(self, task: ExportTask, bot: Bot, total: int) -> None:
+        task.total = total
+        await self._progress(task, bot, 0)
+
+    async def _progress(self, task: ExportTask, bot: Bot, done: int) -> None:
+        task.done = done
+        shown = task.percent // task.step * task.step
+        now = time.monotonic()
+        # Пропущенный по интервалу шаг покажется со следующей страницей
+        if shown <= task.shown or now - task.shown_at < MIN_EDIT_INTERVAL:
+            return
+        task.shown, task.shown_at = shown, now
+        await self._edit_all(task, bot, task.text(), keep_cancel=True)
+
+    async def _edit_all(self, task: ExportTask, bot: Bot, text: str, keep_cancel: bool = False) -> None:
+        markup = export_progress_kb(task.id) if keep_cancel else None
+        for w in list(task.watchers):
+            try:
+                await bot.edit_message_text(text, chat_id=w.chat_id, message_id=w.message_id, reply_markup=markup)
+            except Exception as exc:  # сообщение удалили, «not modified», флуд-лимит — выгрузку не прерываем
+                logger.debug("Export task {}: cannot edit progress in {}: {}", task.id, w.chat_id, exc)
+
+    async def _chat_actions(self, task: ExportTask, bot: Bot) -> None:
+        while True:
+            for chat_id in {w.chat_id for w in task.watchers}:
+                with suppress(Exception):
+                    await bot.send_chat_action(chat_id, ChatAction.UPLOAD_DOCUMENT)
+            await asyncio.sleep(CHAT_ACTION_EVERY)
+
+    async def _deliver(self, task: ExportTask, bot: Bot, parts: list[Path]) -> None:
+        await self._edit_all(task, bot, f"✅ Экспорт «{task.title}» ({task.fmt}): блоков {task.done}, файлов {len(parts)}.")
+        file_ids: dict[Path, str] = {}
+        for w in list(task.watchers):
+            try:
+                for i, path in enumerate(parts, 1):
+                    caption = task.title if len(parts) == 1 else f"{task.title} (часть {i} из {len(parts)})"
+                    # Загружаем один раз, остальным ждавшим — по file_id
+                    msg = await bot.send_document(
+                        w.chat_id, file_ids.get(path) or FSInputFile(path, filename=path.name), caption=caption
+                    )
+                    if path not in file_ids and msg.document is not None:
+                        file_ids[path] = msg.document.file_id
+            except Exception as exc:
+                logger.warning("Export task {}: cannot send to {}: {}", task.id, w.chat_id, exc)
+
+
+export_tasks = ExportTasks()
@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO
+
+# numpy импортируется внутри функций (см. model_analysis): нужен только при разборе G-code.
+# Разбор синхронный и CPU-bound — из хендлеров вызывать через asyncio.to_thread.
+
+# Файл читается блоками: в памяти одновременно только блок и его ходы
+CHUNK_BYTES = 4 * 1024 * 1024
+INCH_MM = 25.4
+# Ширина ячейки токена: слова длиннее (имена макросов Klipper и т.п.) уходят в медленный разбор
+TOKEN_WIDTH = 16
+_COMMENT = re.compile(rb";[^\n]*")
+# Номер строки (N123 в начале) и контрольная сумма (*71 в конце) — так пишут G-code
+# хосты, отправляющие его по serial; на ходы не влияют, но сбили бы разбор строки
+_LINE_NUMBER = re.compile(rb"(?m)^[ \t]*[Nn]\d+")
+_CHECKSUM = re.compile(rb"\*\d*")
+
+
+@dataclass(frozen=True, slots=True)
+class MachineLimits:
+    accel_mm_s2: float = 1500.0  # по умолчанию; M204 в файле переопределяет
+    max_feed_mm_s: float = 300.0
+    # Скорость прохождения прямого угла (как square_corner_velocity в Klipper)
+    corner_mm_s: float = 5.0
+    default_feed_mm_s: float = 25.0  # пока в файле не встретился F
+
+
+DEFAULT_LIMITS = MachineLimits()
+
+
+@dataclass(slots=True)
+class GcodeStats:
+    print_time_s: float = 0.0
+    filament_mm: float = 0.0
+    moves: int = 0
+    lines: int = 0
+    bytes_read: int = 0
+
+    @property
+    def print_time_min(self) -> int:
+        return max(1, math.ceil(self.print_time_s / 60))
+
+
+class GcodeSimulator:
+    """Потоковый разбор G-code и оценка времени печати с учётом ускорений.
+
+    Блок разбирается векторно: комментарии вырезаются, слова режутся в C и
+    укладываются в матрицу байтов -> буква и число каждого слова -> таблица ходов G0/G1.
+    Строки, которые так не разбираются (G92, M204, G4, команды прошивки с «=» и т.п.),
+    редки и обрабатываются по одной в Python, разделяя ходы на сегменты с постоянным
+    режимом (G90/G91, M82/M83, G20/G21). Кинематика — трапеция скоростей для каждого
+    хода с входной/выходной скоростью на стыках, зависящей от угла между ходами.
+    """
+
+    def __init__(self, limits: MachineLimits = DEFAULT_LIMITS) -> None:
+        self.limits = limits
+        self.stats = GcodeStats()
+        self._pos = [0.0, 0.0, 0.0]
+        self._e = 0.0
+        self._feed = limits.default_feed_mm_s
+        self._accel = limits.accel_mm_s2
+        self._absolute = True
+        self._absolute_e = True
+        self._scale = 1.0
+        # Накопленные, но ещё не посчитанные ходы: сегменты (x, y, z, de, feed, accel)
+        self._pending: list[tuple[Any, ...]] = []
+        self._origin = (0.0, 0.0, 0.0)  # позиция перед первым накопленным ходом
+        # Направление и скорость последнего посчитанного хода — для стыка между блоками
+        self._prev_dir: Any = None
+        self._prev_feed = 0.0
+        self._tail = b""
+
+    # ===== разбор =====
+
+    def feed(self, data: bytes) -> None:
+        self.stats.bytes_read += len(data)
+        data = self._tail + data
+        cut = data.rfind(b"\n") + 1
+        self._tail = data[cut:]
+        if cut:
+            self._parse_block(data[:cut])
+        self._flush()
+
+    def finish(self) -> GcodeStats:
+        if self._tail:
+            self._parse_block(self._tail + b"\n")
+            self._tail = b""
+        self._flush()
+        return self.stats
+
+    def _parse_block(self, data: bytes) -> None:
+        """Разобрать блок целых строк (заканчивается на \\n)."""
+        import numpy as np
+
+        # Вырезаются на месте, переводы строк остаются — номера строк не сдвигаются
+        if b"*" in data:
+            data = _CHECKSUM.sub(b"", data)
+        if data[:1] in b"Nn \t" or b"\nN" in data or b"\nn" in data:
+            data = _LINE_NUMBER.sub(b"", data)
+        # Токены режутся в C (re/split), дальше — матрица байтов фиксированной ширины;
+        # конец строки — отдельный токен \x01, чтобы знать строку каждого слова
+        text = _COMMENT.sub(b"", data).replace(b"\n", b" \x01 ")
+        cells = np.array(text.split(), dtype=f"S{TOKEN_WIDTH}").view(np.uint8).reshape(-1, TOKEN_WIDTH)
+        # По столбцам (j-й байт всех токенов подряд) операции идут по непрерывной памяти
+        cols = np.ascontiguousarray(cells.T)
+        head = cols[0]
+        is_nl = head == 1
+        n_lines = int(is_nl.sum())
+        self.stats.lines += n_lines
+        line_of = np.cumsum(is_nl, dtype=np.intp) - is_nl
+        word_idx = np.flatnonzero(~is_nl)
+        if not len(word_idx):
+            return
+
+        # Число после буквы (схема Горнера по столбцам): цифры, не больше одной точки,
+        # знак только первым. Обрезанное (длиннее TOKEN_WIDTH - 1) или с другими символами — bad
+        n = len(head)
+        mantissa = np.zeros(n)
+        frac = np.zeros(n, dtype=np.int8)
+        digits = np.zeros(n, dtype=np.int8)
+        seen_dot = np.zeros(n, dtype=bool)
+        bad = cells[:, -1] != 0
+        negative = cols[1] == 45
+        for j in range(1, TOKEN_WIDTH):
+            col = cols[j]
+            if not col.any():
+                break  # дальше только нулевое заполнение
+            digit = col - np.uint8(48)  # не цифра -> переполнение uint8, >= 10
+            is_digit = digit < 10
+            is_dot = col == 46
+            ok = is_digit | is_dot | (col == 0)
+            if j == 1:
+                ok |= negative | (col == 43)
+            bad |= ~ok | (is_dot & seen_dot)
+            mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+            frac += is_digit & seen_dot
+            digits += is_digit
+            seen_dot |= is_dot
+        bad |= digits == 0
+        value = mantissa / (10.0 ** np.arange(TOKEN_WIDTH))[frac]
+        value[negative] *= -1
+
+        bad = bad[word_idx]
+        value = value[word_idx]
+        letter = head[word_idx] | 32  # нижний регистр
+        word_line = line_of[word_idx]
+
+        # Строки-ходы: первое слово G0/G1, все слова разобраны
+        first = np.ones(len(word_idx), dtype=bool)
+        first[1:] = word_line[1:] != word_line[:-1]
+        line_bad = np.bincount(word_line[bad], minlength=n_lines) > 0
+        cmd_move = first & (letter == 103) & ~bad & ((value == 0) | (value == 1))
+        is_move_line = np.zeros(n_lines, dtype=bool)
+        is_move_line[word_line[cmd_move]] = True
+        is_move_line &= ~line_bad
+        move_lines = np.flatnonzero(is_move_line)
+        other_lines = np.setdiff1d(word_line[first], move_lines, assume_unique=True)
+
+        move_of_line = np.full(n_lines, -1)
+        move_of_line[move_lines] = np.arange(len(move_lines))
+        params = ~first & is_move_line[word_line]
+        p_move = move_of_line[word_line[params]]
+        p_letter = letter[params]
+        p_value = value[params]
+        axes = []
+        for code in (120, 121, 122, 101, 102):  # x y z e f
+            col = np.full(len(move_lines), np.nan)
+            sel = p_letter == code
+            col[p_move[sel]] = p_value[sel]
+            axes.append(col)
+
+        done = 0
+        if len(other_lines):
+            ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+            for line in other_lines.tolist():
+                cut = int(np.searchsorted(move_lines, line))
+                self._add_moves(*(col[done:cut] for col in axes))
+                done = cut
+                begin = int(ends[line - 1]) + 1 if line else 0
+                self._slow_line(data[begin:int(ends[line])])
+        self._add_moves(*(col[done:] for col in axes))
+
+    def _slow_line(self, raw: bytes) -> None:
+        """Одна строка, не попавшая в векторный разбор: команда режима или ход с нестандартной записью."""
+        import numpy as np
+
+        semi = raw.find(b";")
+        words = (raw[:semi] if semi >= 0 else raw).split()
+        if not words:
+            return
+        cmd, args = words[0].upper(), words[1:]
+        if cmd in (b"G0", b"G1", b"G00", b"G01"):
+            vals = dict.fromkeys(b"XYZEF", math.nan)
+            for w in args:
+                value = _num(w[1:])
+                if value is not None and w[:1].upper() in (b"X", b"Y", b"Z", b"E", b"F"):
+                    vals[w[0] & ~32] = value
+            self._add_moves(*(np.array([vals[k]]) for k in b"XYZEF"))
+        elif cmd == b"G90":
+            self._absolute = self._absolute_e = True
+        elif cmd == b"G91":
+            self._absolute = self._absolute_e = False
+        elif cmd == b"M82":
+            self._absolute_e = True
+        elif cmd == b"M83":
+            self._absolute_e = False
+        elif cmd == b"G20":
+            self._scale = INCH_MM
+        elif cmd == b"G21":
+            self._scale = 1.0
+        elif cmd == b"G92":
+            # Новая система координат. Сброс только E (G92 E0 на каждом слое) ходы не
+            # разрывает: приращения E уже посчитаны. Для XYZ накопленные ходы считаем в старой
+            moved = False
+            for w in args:
+                letter, value = w[:1].upper(), _num(w[1:])
+                if value is None:
+                    continue
+                if letter == b"E":
+                    self._e = value * self._scale
+                elif letter in (b"X", b"Y", b"Z"):
+                    if not moved:
+                        self._flush()
+                        moved = True
+                    self._pos[b"XYZ".index(letter)] = value * self._scale
+            if moved:
+                self._prev_dir = None
+        elif cmd == b"G28":
+            self._flush()
+            self._pos = [0.0, 0.0, 0.0]
+            self._prev_dir = None
+        elif cmd == b"G4":
+            # Пауза: P — миллисекунды, S — секунды
+            for w in args:
+                value = _num(w[1:])
+                if value is None:
+                    continue
+                letter = w[:1].upper()
+                self.stats.print_time_s += value / 1000 if letter == b"P" else value if letter == b"S" else 0
+        elif cmd == b"M204":
+            # M204 S<accel> (Marlin/Klipper) или P<печать> T<перемещения>
+            for w in args:
+                value = _num(w[1:])
+                if value and w[:1].upper() in (b"S", b"P"):
+                    self._accel = value
+
+    def _add_moves(self, xv: Any, yv: Any, zv: Any, ev: Any, fv: Any) -> None:
+        """Сегмент ходов в одном режиме; NaN — параметр в строке не указан."""
+        import numpy as np
+
+        n = len(xv)
+        if not n:
+            return
+        if not self._pending:
+            self._origin = (self._pos[0], self._pos[1], self._pos[2])
+        scale = self._scale
+        cols = []
+        for i, vals in enumerate((xv, yv, zv)):
+            if self._absolute:
+                col = _ffill(vals * scale, self._pos[i])
+            else:
+                col = self._pos[i] + np.cumsum(np.nan_to_num(vals * scale))
+            self._pos[i] = float(col[-1])
+            cols.append(col)
+        if self._absolute_e:
+            e_abs = _ffill(ev * scale, self._e)
+            de = np.diff(e_abs, prepend=self._e)
+            self._e = float(e_abs[-1])
+        else:
+            de = np.nan_to_num(ev * scale)
+            self._e += float(de.sum())
+        feed = _ffill(np.minimum(fv * scale / 60, self.limits.max_feed_mm_s), self._feed)
+        self._feed = float(feed[-1])
+        self._pending.append((*cols, de, feed, np.full(n, self._accel)))
+
+    # ===== кинематика =====
+
+    def _flush(self) -> None:
+        """Посчитать время и филамент для накопленных ходов."""
+        if not self._pending:
+            return
+        import numpy as np
+
+        x, y, z, de, feed, accel = (np.concatenate(parts) for parts in zip(*self._pending))
+        self._pending.clear()
+        target = np.column_stack((x, y, z))
+        origin = np.empty_like(target)
+        origin[0] = self._origin
+        origin[1:] = target[:-1]
+        delta = target - origin
+        dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+        # Ходы только экструдером (ретракт/подача) — «расстояние» по оси E
+        extrude_only = dist == 0
+        dist = np.where(extrude_only, np.abs(de), dist)
+        valid = dist > 0
+        self.stats.filament_mm += float(de.sum())
+        self.stats.moves += int(valid.sum())
+        if not valid.any():
+            return
+        dist, feed, accel = dist[valid], feed[valid], accel[valid]
+        direction = np.zeros_like(delta[valid])
+        spatial = ~extrude_only[valid]
+        direction[spatial] = delta[valid][spatial] / dist[spatial, None]
+
+        # Скорость на стыке: полная при движении по прямой, corner_mm_s на прямом угле, 0 при развороте
+        prev_dir = np.empty_like(direction)
+        prev_dir[1:] = direction[:-1]
+        prev_dir[0] = self._prev_dir if self._prev_dir is not None else 0.0
+        prev_feed = np.empty_like(feed)
+        prev_feed[1:] = feed[:-1]
+        prev_feed[0] = self._prev_feed if self._prev_dir is not None else 0.0
+        cos = np.einsum("ij,ij->i", direction, prev_dir)
+        corner = np.clip(cos, 0.0, 1.0) * np.minimum(feed, prev_feed)
+        corner = np.where(cos > -0.5, np.maximum(corner, np.minimum(self.limits.corner_mm_s, prev_feed)), 0.0)
+        v_in = np.minimum(corner, feed)
+        v_out = np.empty_like(v_in)
+        v_out[:-1] = np.minimum(v_in[1:], feed[:-1])
+        v_out[-1] = 0.0  # стык со следующим блоком считаем остановкой — погрешность мала
+
+        # Трапеция: разгон v_in→v, круиз, торможение v→v_out; если не хватает пути — треугольник
+        accel_d = (feed ** 2 - v_in ** 2) / (2 * accel)
+        decel_d = (feed ** 2 - v_out ** 2) / (2 * accel)
+        trapezoid = accel_d + decel_d <= dist
+        peak = np.sqrt(np.maximum((2 * accel * dist + v_in ** 2 + v_out ** 2) / 2, 0.0))
+        peak = np.where(trapezoid, feed, np.maximum(peak, np.maximum(v_in, v_out)))
+        cruise = np.where(trapezoid, (dist - accel_d - decel_d) / feed, 0.0)
+        t = (peak - v_in) / accel + (peak - v_out) / accel + cruise
+        self.stats.print_time_s += float(t.sum())
+
+        self._prev_dir = direction[-1].copy()
+        self._prev_feed = float(feed[-1])
+
+
+def _ffill(values: Any, initial: float) -> Any:
+    """Заменить NaN последним известным значением (в начале — initial)."""
+    import numpy as np
+
+    idx = np.where(np.isnan(values), 0, np.arange(1, len(values) + 1))
+    np.maximum.accumulate(idx, out=idx)
+    return np.concatenate(([initial], values))[idx]
+
+
+def _num(raw: bytes) -> float | None:
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def simulate_stream(fh: BinaryIO, limits: MachineLimits = DEFAULT_LIMITS, chunk_bytes: int = CHUNK_BYTES) -> GcodeStats:
+    sim = GcodeSimulator(limits)
+    while True:
+        data = fh.read(chunk_bytes)
+        if not data:
+            break
+        sim.feed(data)
+    return sim.finish()
+
+
+def analyze_gcode(path: Path, limits: MachineLimits = DEFAULT_LIMITS) -> GcodeStats:
+    """Время печати (с), длина филамента (мм) и число ходов по файлу G-code."""
+    with path.open("rb") as fh:
+        return simulate_stream(fh, limits)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import rollups
+from ..db.models import Unit, UnitEvent
+
+# Машины и выборки «что стоит на машине» / «что на неё выдавали».
+# Все списки листаются keyset-пагинацией (WHERE ключ > последний показанный),
+# а не OFFSET: страница — это поиск по составному индексу и чтение page_size
+# записей, сколько бы событий ни накопилось.
+MACHINES = ("RA1", "RA2", "RA3")
+# Кириллические буквы, которые вводят вместо латинских в "РА1"
+_LATIN = str.maketrans("РАра", "RAra")
+
+
+def normalize_machine(value: str) -> str | None:
+    v = value.strip().translate(_LATIN).upper().replace(" ", "")
+    return v if v in MACHINES else None
+
+
+async def set_unit_machine(
+    session: AsyncSession,
+    unit: Unit,
+    machine: str | None,
+    machine_number: str | None,
+    *,
+    by_user_id: int | None,
+    by_user_name: str | None,
+) -> None:
+    """Привязать блок к машине (None — снять привязку) с событием 'machine_set'; commit — на вызывающем.
+
+    Событие нужно, чтобы изменение попало в историю блока и в дельта-экспорт.
+    """
+    unit.machine = machine
+    unit.machine_number = machine_number
+    session.add(UnitEvent(
+        unit_id=unit.id,
+        event_type="machine_set",
+        by_user_id=by_user_id,
+        by_user_name=by_user_name,
+        destination_machine=machine,
+        destination_machine_number=machine_number,
+    ))
+    await rollups.events_logged(session, "machine_set")
+
+
+@dataclass(slots=True)
+class MachineUnit:
+    id: int
+    number: str
+    name: str | None
+    type: str | None
+    status: str
+
+
+@dataclass(slots=True)
+class MachineIssue:
+    event_id: int
+    timestamp: datetime | None
+    by_user_name: str | None
+    unit_id: int
+    number: str
+    name: str | None
+    type: str | None
+
+
+async def machine_numbers(
+    session: AsyncSession, machine: str, after: str | None = None, limit: int = 10
+) -> tuple[list[str], bool]:
+    """Номера машин данного РА, где есть привязанные блоки: (страница, есть ли следующая).
+
+    DISTINCT по первым колонкам индекса ix_units_machine_number — обход индекса без таблицы.
+    """
+    q = (
+        select(Unit.machine_number)
+        .where(Unit.machine == machine, Unit.machine_number.is_not(None))
+        .distinct()
+        .order_by(Unit.machine_number.asc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        q = q.where(Unit.machine_number > after)
+    rows = list((await session.execute(q)).scalars().all())
+    return rows[:limit], len(rows) > limit
+
+
+async def machine_units(
+    session: AsyncSession, machine: str, number: str, after_id: int = 0, limit: int = 10
+) -> tuple[list[MachineUnit], bool]:
+    """Блоки, привязанные к машине, по возрастанию id после after_id."""
+    q = (
+        select(Unit.id, Unit.number, Unit.name, Unit.type, Unit.status)
+        .where(Unit.machine == machine, Unit.machine_number == number, Unit.id > after_id)
+        .order_by(Unit.id.asc())
+        .limit(limit + 1)
+    )
+    rows = [MachineUnit(*r) for r in (await session.execute(q)).all()]
+    return rows[:limit], len(rows) > limit
+
+
+async def machine_issues(
+    session: AsyncSession, machine: str, number: str, before_event_id: int | None = None, limit: int = 10
+) -> tuple[list[MachineIssue], bool]:
+    """История выдач на машину, новые сверху; курсор — id последнего показанного события.
+
+    Порядок (timestamp, id) по убыванию совпадает с индексом
+    ix_unit_events_dest_machine_ts, поэтому страница читается прямо из индекса.
+    """
+    q = (
+        select(
+            UnitEvent.id,
+            UnitEvent.timestamp,
+            UnitEvent.by_user_name,
+            Unit.id,
+            Unit.number,
+            Unit.name,
+            Unit.type,
+        )
+        .join(Unit, Unit.id == UnitEvent.unit_id)
+        .where(
+            UnitEvent.destination_machine == machine,
+            UnitEvent.destination_machine_number == number,
+            UnitEvent.event_type == "issued",
+        )
+        .order_by(UnitEvent.timestamp.desc(), UnitEvent.id.desc())
+        .limit(limit + 1)
+    )
+    if before_event_id is not None:
+        ts = (
+            await session.execute(select(UnitEvent.timestamp).where(UnitEvent.id == before_event_id))
+        ).scalar_one_or_none()
+        if ts is not None:
+            q = q.where(tuple_(UnitEvent.timestamp, UnitEvent.id) < tuple_(ts, before_event_id))
+    rows = [MachineIssue(*r) for r in (await session.execute(q)).all()]
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import math
+import re
+import struct
+import zipfile
+from array import array
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+from xml.etree.ElementTree import iterparse
+
+# numpy импортируется внутри функций: нужен только при анализе модели, а его импорт
+# заметно удлиняет старт бота. Анализ синхронный и CPU-bound — из хендлеров вызывать
+# через asyncio.to_thread.
+
+# Сколько треугольников обрабатывать за раз: ограничивает размер временных float64-массивов
+CHUNK_TRIANGLES = 1 << 18
+STL_HEADER = 80
+# Единицы 3MF (<model unit="...">) в миллиметрах
+UNIT_MM = {
+    "micron": 0.001,
+    "millimeter": 1.0,
+    "centimeter": 10.0,
+    "inch": 25.4,
+    "foot": 304.8,
+    "meter": 1000.0,
+}
+
+
+class ModelFormatError(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class MeshStats:
+    triangles: int = 0
+    volume_mm3: float = 0.0
+    area_mm2: float = 0.0
+    bbox_min: tuple[float, float, float] = (0.0, 0.0, 0.0)
+    bbox_max: tuple[float, float, float] = (0.0, 0.0, 0.0)
+
+    @property
+    def size(self) -> tuple[float, float, float]:
+        return tuple(b - a for a, b in zip(self.bbox_min, self.bbox_max))  # type: ignore[return-value]
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "MeshStats":
+        return cls(
+            triangles=int(data["triangles"]),
+            volume_mm3=float(data["volume_mm3"]),
+            area_mm2=float(data["area_mm2"]),
+            bbox_min=tuple(data["bbox_min"]),  # type: ignore[arg-type]
+            bbox_max=tuple(data["bbox_max"]),  # type: ignore[arg-type]
+        )
+
+
+@dataclass(slots=True)
+class _Accumulator:
+    """Складывает метрики по кускам треугольников (массивы формы (n, 3, 3))."""
+
+    triangles: int = 0
+    signed_volume6: float = 0.0  # 6 * объём со знаком
+    area2: float = 0.0  # 2 * площадь
+    mins: list[float] = field(default_factory=lambda: [math.inf] * 3)
+    maxs: list[float] = field(default_factory=lambda: [-math.inf] * 3)
+
+    def add(self, tris: Any) -> None:
+        import numpy as np
+
+        if len(tris) == 0:
+            return
+        v = np.asarray(tris, dtype=np.float64)
+        v0 = v[:, 0]
+        e1 = v[:, 1] - v0
+        e2 = v[:, 2] - v0
+        # Нормаль (удвоенная площадь) одна на оба расчёта: v0·(v1×v2) == v0·(e1×e2)
+        n = np.empty_like(e1)
+        n[:, 0] = e1[:, 1] * e2[:, 2] - e1[:, 2] * e2[:, 1]
+        n[:, 1] = e1[:, 2] * e2[:, 0] - e1[:, 0] * e2[:, 2]
+        n[:, 2] = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+        # Объём — сумма ориентированных тетраэдров с вершиной в начале координат
+        self.signed_volume6 += float(np.einsum("ij,ij->", v0, n))
+        self.area2 += float(np.sqrt(np.einsum("ij,ij->i", n, n)).sum())
+        flat = v.reshape(-1, 3)
+        self.mins = np.minimum(self.mins, flat.min(axis=0)).tolist()
+        self.maxs = np.maximum(self.maxs, flat.max(axis=0)).tolist()
+        self.triangles += len(v)
+
+    def merge(self, other: "_Accumulator") -> None:
+        self.triangles += other.triangles
+        self.signed_volume6 += other.signed_volume6
+        self.area2 += other.area2
+        self.mins = [min(a, b) for a, b in zip(self.mins, other.mins)]
+        self.maxs = [max(a, b) for a, b in zip(self.maxs, other.maxs)]
+
+    def result(self) -> MeshStats:
+        if not self.triangles:
+            raise ModelFormatError("В файле нет треугольников")
+        return MeshStats(
+            triangles=self.triangles,
+            volume_mm3=abs(self.signed_volume6) / 6,
+            area_mm2=self.area2 / 2,
+            bbox_min=tuple(self.mins),  # type: ignore[arg-type]
+            bbox_max=tuple(self.maxs),  # type: ignore[arg-type]
+        )
+
+
+# ===== STL =====
+
+def _stl_dtype() -> Any:
+    import numpy as np
+
+    # 50 байт на треугольник: нормаль, 3 вершины, attribute byte count
+    return np.dtype([("normal", "<f4", (3,)), ("v", "<f4", (3, 3)), ("attr", "<u2")])
+
+
+def _is_binary_stl(path: Path) -> tuple[bool, int]:
+    size = path.stat().st_size
+    if size < STL_HEADER + 4:
+        return False, 0
+    with path.open("rb") as f:
+        head = f.read(STL_HEADER + 4)
+    (count,) = struct.unpack_from("<I", head, STL_HEADER)
+    # ASCII-файлы начинаются с "solid", но так же иногда начинается и заголовок бинарного —
+    # надёжнее сверить размер файла с числом треугольников
+    return size == STL_HEADER + 4 + 50 * count, count
+
+
+def _analyze_binary_stl(path: Path, count: int) -> MeshStats:
+    import numpy as np
+
+    acc = _Accumulator()
+    if count:
+        mesh = np.memmap(path, dtype=_stl_dtype(), mode="r", offset=STL_HEADER + 4, shape=(count,))
+        try:
+            for start in range(0, count, CHUNK_TRIANGLES):
+                acc.add(mesh["v"][start:start + CHUNK_TRIANGLES])
+        finally:
+            del mesh
+    return acc.result()
+
+
+def _ascii_vertex_chunks(path: Path) -> Iterator[Any]:
+    """Построчно читает ASCII STL и отдаёт массивы треугольников кусками."""
+    import numpy as np
+
+    buf: list[bytes] = []
+    with path.open("rb") as f:
+        for line in f:
+            line = line.strip()
+            if line[:6].lower() == b"vertex":
+                buf.append(line[6:])
+                if len(buf) >= CHUNK_TRIANGLES * 3:
+                    yield np.array(b" ".join(buf).split(), dtype=np.float64).reshape(-1, 3, 3)
+                    buf.clear()
+    usable = len(buf) - len(buf) % 3
+    if usable:
+        yield np.array(b" ".join(buf[:usable]).split(), dtype=np.float64).reshape(-1, 3, 3)
+
+
+def _analyze_ascii_stl(path: Path) -> MeshStats:
+    acc = _Accumulator()
+    try:
+        for chunk in _ascii_vertex_chunks(path):
+            acc.add(chunk)
+    except ValueError as exc:
+        raise ModelFormatError(f"Некорректный ASCII STL: {exc}") from exc
+    return acc.result()
+
+
+def analyze_stl(path: Path) -> MeshStats:
+    binary, count = _is_binary_stl(path)
+    if binary:
+        return _analyze_binary_stl(path, count)
+    with path.open("rb") as f:
+        if f.read(5).lower() != b"solid":
+            raise ModelFormatError("Файл не похож на STL")
+    return _analyze_ascii_stl(path)
+
+
+# ===== 3MF =====
+
+# Блок XML для векторного разбора; режется по последнему ">", теги не разрываются
+XML_CHUNK_BYTES = 4 * 1024 * 1024
+# Ширина ячейки токена: значения длиннее считаются нестандартной разметкой
+XML_TOKEN_WIDTH = 32
+# Разметка XML -> пробелы: <vertex x="1" y="2" z="3"/> превращается в слова vertex x 1 y 2 z 3
+_XML_PUNCT = bytes.maketrans(b"\"'=<>/", b"      ")
+_MODEL_TAG = re.compile(rb"<(?:[\w.-]+:)?model\b([^>]*)>")
+_UNIT_ATTR = re.compile(rb"\bunit\s*=\s*[\"']([^\"']*)")
+# Имена атрибутов после тега и их порядок — как пишут слайсеры и CAD
+_MESH_ELEMENTS = ((b"vertex", (b"x", b"y", b"z")), (b"triangle", (b"v1", b"v2", b"v3")))
+
+
+class _IrregularXml(Exception):
+    """Разметка, которую векторный разбор не берёт: разбираем .model через iterparse."""
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _add_mesh(acc: _Accumulator, points: Any, index: Any) -> None:
+    if not len(index):
+        return
+    if index.min() < 0 or index.max() >= len(points):
+        raise ModelFormatError("Треугольник ссылается на несуществующую вершину")
+    for start in range(0, len(index), CHUNK_TRIANGLES):
+        acc.add(points[index[start:start + CHUNK_TRIANGLES]])
+
+
+def _mesh_values(piece: bytes, out: dict[bytes, list[Any]]) -> None:
+    """Значения атрибутов <vertex>/<triangle> куска XML -> массивы (n, 3) в out."""
+    import numpy as np
+
+    tokens = np.array(piece.translate(_XML_PUNCT).split(), dtype=f"S{XML_TOKEN_WIDTH}")
+    for name, attrs in _MESH_ELEMENTS:
+        at = np.flatnonzero(tokens == name)
+        if not len(at):
+            continue
+        if at[-1] + 6 >= len(tokens):
+            raise _IrregularXml
+        for k, attr in enumerate(attrs):
+            if not (tokens[at + 2 * k + 1] == attr).all():
+                raise _IrregularXml
+        values = tokens[at[:, None] + np.array([2, 4, 6])]
+        if values.view(np.uint8).reshape(-1, XML_TOKEN_WIDTH)[:, -1].any():
+            raise _IrregularXml  # значение обрезано шириной ячейки
+        try:
+            out[name].append(values.astype(np.float64))
+        except ValueError as exc:
+            raise _IrregularXml from exc
+
+
+def _model_vectorized(fh: BinaryIO, acc: _Accumulator) -> None:
+    """Векторный разбор .model: слова режутся в C (translate/split), значения — numpy.
+
+    Сетка копится до </mesh> (индексы треугольников — внутри своей сетки), поэтому
+    в памяти — массивы одной сетки, как и при iterparse. Префиксы пространств имён
+    у элементов сетки и другой порядок атрибутов -> _IrregularXml.
+    """
+    import numpy as np
+
+    scale: float | None = None
+    out: dict[bytes, list[Any]] = {b"vertex": [], b"triangle": []}
+    tail = b""
+    while True:
+        data = fh.read(XML_CHUNK_BYTES)
+        block = tail + data
+        cut = block.rfind(b">") + 1 if data else len(block)
+        block, tail = block[:cut], block[cut:]
+        if b":vertex" in block or b":triangle" in block or b":mesh" in block:
+            raise _IrregularXml
+        if scale is None and (model := _MODEL_TAG.search(block)):
+            unit = _UNIT_ATTR.search(model.group(1))
+            scale = UNIT_MM.get(unit.group(1).decode() if unit else "millimeter", 1.0)
+        for i, piece in enumerate(block.split(b"</mesh>")):
+            if i:
+                verts, tris = out[b"vertex"], out[b"triangle"]
+                if tris:
+                    points = np.concatenate(verts) * (scale or 1.0) if verts else np.empty((0, 3))
+                    found = np.concatenate(tris)
+                    index = found.astype(np.int64)
+                    if (index != found).any():
+                        raise ModelFormatError("Индекс вершины треугольника — не целое число")
+                    _add_mesh(acc, points, index)
+                verts.clear()
+                tris.clear()
+            _mesh_values(piece, out)
+        if not data:
+            return
+
+
+def _model_iterparse(fh: BinaryIO, acc: _Accumulator) -> None:
+    """Разбор .model через iterparse для разметки, которую не берёт векторный разбор."""
+    import numpy as np
+
+    verts = array("d")
+    tris = array("q")
+    scale = 1.0
+    container: Any = None
+    for event, elem in iterparse(fh, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            if tag == "model":
+                scale = UNIT_MM.get(elem.get("unit", "millimeter"), 1.0)
+            elif tag in ("vertices", "triangles"):
+                container = elem
+            continue
+        if tag == "vertex":
+            verts.extend((float(elem.get("x", 0)), float(elem.get("y", 0)), float(elem.get("z", 0))))
+        elif tag == "triangle":
+            tris.extend((int(elem.get("v1", 0)), int(elem.get("v2", 0)), int(elem.get("v3", 0))))
+        elif tag == "mesh":
+            points = np.frombuffer(verts, dtype=np.float64).reshape(-1, 3) * scale
+            _add_mesh(acc, points, np.frombuffer(tris, dtype=np.int64).reshape(-1, 3))
+            verts, tris = array("d"), array("q")
+        else:
+            continue
+        # Разобранные элементы не держим: очищаем и отцепляем от <vertices>/<triangles>
+        elem.clear()
+        if container is not None and len(container) >= 4096:
+            del container[:]
+
+
+def analyze_3mf(path: Path) -> MeshStats:
+    """Все <mesh> из *.model внутри архива; XML читается потоково.
+
+    Обычная разметка разбирается векторно (_model_vectorized), остальная —
+    через iterparse. Трансформации build/components не применяются: для оценки
+    времени печати достаточно геометрии самих объектов.
+    """
+    acc = _Accumulator()
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as exc:
+        raise ModelFormatError("Файл не похож на 3MF (не zip-архив)") from exc
+    with zf:
+        models = [n for n in zf.namelist() if n.lower().endswith(".model")]
+        if not models:
+            raise ModelFormatError("В 3MF нет файлов модели")
+        for name in models:
+            part = _Accumulator()
+            try:
+                with zf.open(name) as fh:
+                    _model_vectorized(fh, part)
+            except _IrregularXml:
+                part = _Accumulator()
+                with zf.open(name) as fh:
+                    _model_iterparse(fh, part)
+            acc.merge(part)
+    return acc.result()
+
+
+def analyze_model(path: Path, filename: str | None = None) -> MeshStats:
+    """Объём, площадь, габариты и число треугольников STL/3MF (в мм)."""
+    suffix = Path(filename or path.name).suffix.lower()
+    if suffix == ".stl":
+        return analyze_stl(path)
+    if suffix == ".3mf":
+        return analyze_3mf(path)
+    raise ModelFormatError(f"Неподдерживаемый формат: {suffix or 'без расширения'}")
+
+
+# ===== Оценка времени печати =====
+
+@dataclass(frozen=True, slots=True)
+class PrinterProfile:
+    name: str
+    volumetric_mm3_s: float  # средний реальный расход пластика
+    layer_height_mm: float = 0.2
+    shell_mm: float = 1.2  # стенки + крыша/дно
+    infill: float = 0.2
+    layer_s: float = 2.0  # смена слоя, перемещения, ретракты на слой
+    overhead_min: float = 5.0  # прогрев, калибровка стола
+
+
+PROFILES: dict[str, PrinterProfile] = {
+    "default": PrinterProfile("default", volumetric_mm3_s=8.0),
+    "ender": PrinterProfile("ender", volumetric_mm3_s=6.0, layer_s=2.5),
+    "prusa": PrinterProfile("prusa", volumetric_mm3_s=10.0, overhead_min=4.0),
+    "bambu": PrinterProfile("bambu", volumetric_mm3_s=18.0, layer_s=1.0, overhead_min=6.0),
+    "voron": PrinterProfile("voron", volumetric_mm3_s=20.0, layer_s=1.0),
+}
+
+
+def profile_for(printer_name: str | None, mapping: str = "") -> PrinterProfile:
+    """Профиль принтера: явное соответствие из PRINTER_PROFILES ("RA1=bambu,Prusa-MK3=prusa"),
+    иначе по вхождению имени профиля в имя принтера, иначе default."""
+    name = (printer_name or "").strip()
+    for part in mapping.split(","):
+        key, _, value = part.partition("=")
+        if key.strip() and key.strip().lower() == name.lower() and value.strip().lower() in PROFILES:
+            return PROFILES[value.strip().lower()]
+    lowered = name.lower()
+    for key, profile in PROFILES.items():
+        if key != "default" and key in lowered:
+            return profile
+    return PROFILES["default"]
+
+
+def estimate_minutes(stats: MeshStats, profile: PrinterProfile) -> int:
+    """Грубая оценка по геометрии: оболочка сплошная, внутренность — с заполнением."""
+    shell = min(stats.volume_mm3, stats.area_mm2 * profile.shell_mm)
+    printed = shell + (stats.volume_mm3 - shell) * profile.infill
+    layers = math.ceil(max(stats.size[2], profile.layer_height_mm) / profile.layer_height_mm)
+    seconds = printed / profile.volumetric_mm3_s + layers * profile.layer_s
+    return max(1, math.ceil(seconds / 60 + profile.overhead_min))
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable, Sequence
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.models import PrintEvent, PrintJob
+from .printers import PrinterState, printer_registry
+
+# Если при заявке время не указано — считаем час на копию
+DEFAULT_JOB_MIN = 60
+ACTIVE_STATUSES = ("queued", "printing")
+
+
+@dataclass(slots=True)
+class PendingJob:
+    id: int
+    minutes: int  # длительность с учётом copies
+    printer_name: str | None = None  # пожелание из заявки
+
+
+@dataclass(slots=True)
+class PrinterSlot:
+    id: int
+    name: str
+    free_at: datetime  # прогноз освобождения с учётом уже назначенных работ
+    busy: bool = False  # есть печать или очередь — новые работы встают в очередь
+    jobs: list[tuple[int, datetime]] = field(default_factory=list)  # (job_id, прогноз окончания)
+
+
+@dataclass(slots=True)
+class Assignment:
+    job_id: int
+    printer_id: int
+    printer_name: str
+    status: str  # printing | queued
+    start_at: datetime
+    end_at: datetime
+
+
+def job_minutes(expected_time_min: int | None, copies: int | None) -> int:
+    return max(1, expected_time_min or DEFAULT_JOB_MIN) * max(1, copies or 1)
+
+
+def schedule(jobs: Sequence[PendingJob], printers: Sequence[PrinterSlot]) -> list[Assignment]:
+    """Распределить заявки по принтерам, минимизируя makespan.
+
+    Заявки с указанным готовым принтером закрепляются за ним (в порядке поступления),
+    остальные — эвристика LPT: от самых длинных к коротким, каждая на принтер,
+    который освобождается раньше всех (min-heap по прогнозу освобождения).
+    Заявки на известный, но не готовый принтер сюда не передаются (held_printer),
+    так что указанное имя, которого нет среди готовых, — просто пожелание.
+    O(n log n + n log p). PrinterSlot'ы изменяются на месте (free_at, busy, jobs).
+    start_at назначений на одном принтере растёт в порядке очереди — он и сохраняется
+    (PrintJob.planned_at), чтобы promote_next запускал работы в том же порядке.
+    """
+    if not printers:
+        return []
+    by_name = {p.name: p for p in printers}
+    out: list[Assignment] = []
+
+    def assign(job: PendingJob, slot: PrinterSlot) -> None:
+        start = slot.free_at
+        end = start + timedelta(minutes=job.minutes)
+        status = "queued" if slot.busy else "printing"
+        slot.busy = True
+        slot.free_at = end
+        slot.jobs.append((job.id, end))
+        out.append(Assignment(job.id, slot.id, slot.name, status, start, end))
+
+    free: list[PendingJob] = []
+    for job in jobs:
+        slot = by_name.get(job.printer_name) if job.printer_name else None
+        if slot is not None:
+            assign(job, slot)
+        else:
+            free.append(job)
+
+    heap = [(p.free_at, i) for i, p in enumerate(printers)]
+    heapq.heapify(heap)
+    for job in sorted(free, key=lambda j: j.minutes, reverse=True):
+        _, i = heapq.heappop(heap)
+        slot = printers[i]
+        assign(job, slot)
+        heapq.heappush(heap, (slot.free_at, i))
+    return out
+
+
+def held_printer(printer_name: str | None, now: datetime) -> PrinterState | None:
+    """Принтер, за которым закреплена заявка, если он есть, но сейчас не готов (обслуживание).
+
+    Такая заявка ждёт в requested свой принтер и не уходит на другой.
+    """
+    state = printer_registry.get(printer_name) if printer_name else None
+    return state if state is not None and not state.is_ready(now) else None
+
+
+async def load_printer_slots(session: AsyncSession, now: datetime) -> list[PrinterSlot]:
+    """Готовые принтеры (из printer_registry) с прогнозом освобождения по уже назначенным работам."""
+    await printer_registry.ensure_loaded()
+    slots = {p.id: PrinterSlot(p.id, p.name, now) for p in printer_registry.ready(now)}
+    if not slots:
+        return []
+    started = (
+        select(PrintEvent.job_id, func.max(PrintEvent.timestamp).label("started_at"))
+        .where(PrintEvent.event_type == "printing")
+        .where(PrintEvent.job_id.in_(select(PrintJob.id).where(PrintJob.status == "printing")))
+        .group_by(PrintEvent.job_id)
+        .subquery()
+    )
+    active = await session.execute(
+        select(PrintJob.id, PrintJob.printer_id, PrintJob.status, PrintJob.expected_time_min,
+               PrintJob.copies, started.c.started_at)
+        .outerjoin(started, started.c.job_id == PrintJob.id)
+        .where(PrintJob.status.in_(ACTIVE_STATUSES), PrintJob.printer_id.in_(list(slots)))
+        # printing раньше queued, очередь — в плановом порядке (как в promote_next)
+        .order_by(PrintJob.printer_id, PrintJob.status.asc(), PrintJob.planned_at.asc().nulls_first(), PrintJob.id)
+    )
+    for job_id, printer_id, status, expected, copies, started_at in active.all():
+        slot = slots[printer_id]
+        minutes = job_minutes(expected, copies)
+        if status == "printing":
+            end = max(slot.free_at, (started_at or now) + timedelta(minutes=minutes))
+        else:
+            end = slot.free_at + timedelta(minutes=minutes)
+        slot.busy = True
+        slot.free_at = end
+        slot.jobs.append((job_id, end))
+    return list(slots.values())
+
+
+async def assign_pending(session: AsyncSession, by_user_id: int | None = None,
+                         now: datetime | None = None) -> tuple[list[Assignment], list[PrinterSlot]]:
+    """Назначить все заявки в статусе requested и записать события пачкой. Коммит — на вызывающем.
+
+    Возвращает назначения и итоговые таймлайны принтеров (для показа ETA).
+    Заявки на принтер в обслуживании остаются requested (held_printer). Указанный в
+    заявке printer_name не перезаписывается: фактический принтер — printer_id.
+    """
+    now = now or datetime.utcnow()
+    slots = await load_printer_slots(session, now)
+    pending = (await session.execute(
+        select(PrintJob.id, PrintJob.expected_time_min, PrintJob.copies, PrintJob.printer_name)
+        .where(PrintJob.status == "requested")
+        .order_by(PrintJob.id)
+    )).all()
+    if not pending or not slots:
+        return [], slots
+    jobs = [
+        PendingJob(jid, job_minutes(exp, copies), name)
+        for jid, exp, copies, name in pending
+        if held_printer(name, now) is None
+    ]
+    wanted = {job.id: job.printer_name for job in jobs}
+    assignments = schedule(jobs, slots)
+    if assignments:
+        await session.execute(update(PrintJob), [
+            {"id": a.job_id, "status": a.status, "printer_id": a.printer_id, "planned_at": a.start_at}
+            for a in assignments
+        ])
+        await session.execute(insert(PrintEvent), [
+            {
+                "job_id": a.job_id,
+                "event_type": a.status,
+                "by_user_id": by_user_id,
+                "timestamp": now,
+                "comment": _assignment_comment(a, wanted.get(a.job_id)),
+            }
+            for a in assignments
+        ])
+    return assignments, slots
+
+
+def _assignment_comment(a: Assignment, wanted: str | None) -> str:
+    text = f"Принтер: {a.printer_name}. ETA: {a.end_at.strftime('%d-%m-%Y %H:%M')} UTC"
+    if wanted and wanted != a.printer_name:
+        text += f". В заявке указан «{wanted}» — такого принтера нет"
+    return text
+
+
+async def promote_next(session: AsyncSession, printer_ids: Iterable[int], by_user_id: int | None = None,
+                       now: datetime | None = None) -> list[int]:
+    """Для освободившихся готовых принтеров перевести первую queued-работу в printing.
+
+    «Первая» — по плановому началу (planned_at), то есть в том порядке, по которому
+    schedule() посчитал ETA из событий и /queue; принтер на обслуживании не запускается.
+    """
+    now = now or datetime.utcnow()
+    await printer_registry.ensure_loaded()
+    ready = {p.id for p in printer_registry.ready(now)}
+    ids = [pid for pid in printer_ids if pid in ready]
+    if not ids:
+        return []
+    busy = set((await session.execute(
+        select(PrintJob.printer_id).where(PrintJob.status == "printing", PrintJob.printer_id.in_(ids))
+    )).scalars().all())
+    free = [pid for pid in ids if pid not in busy]
+    if not free:
+        return []
+    queued = await session.execute(
+        select(PrintJob.printer_id, PrintJob.id)
+        .where(PrintJob.status == "queued", PrintJob.printer_id.in_(free))
+        .order_by(PrintJob.printer_id, PrintJob.planned_at.asc().nulls_first(), PrintJob.id)
+    )
+    first: dict[int, int] = {}
+    for printer_id, job_id in queued.all():
+        first.setdefault(printer_id, job_id)
+    first_queued = list(first.values())
+    if first_queued:
+        await session.execute(update(PrintJob), [{"id": jid, "status": "printing"} for jid in first_queued])
+        await session.execute(insert(PrintEvent), [
+            {"job_id": jid, "event_type": "printing", "by_user_id": by_user_id, "timestamp": now}
+            for jid in first_queued
+        ])
+    return first_queued
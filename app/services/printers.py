@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from ..db import base as db_base
+from ..db.models import Printer
+from ..logger import logger
+
+
+@dataclass(slots=True)
+class PrinterState:
+    id: int
+    name: str
+    status: str  # ready | maintenance
+    maintenance_until: datetime | None = None
+
+    def is_ready(self, now: datetime) -> bool:
+        if self.status == "ready":
+            return True
+        # Обслуживание, срок которого уже вышел, считаем завершённым (таймер мог ещё не сработать)
+        return self.status == "maintenance" and self.maintenance_until is not None and self.maintenance_until <= now
+
+
+class PrinterRegistry:
+    """Состояние принтеров в памяти процесса.
+
+    Загружается из БД один раз (при старте бота, см. main.on_startup; методы вызывают
+    ensure_loaded() и сами — для бенчмарков и скриптов без старта) и дальше обновляется
+    только через add()/set_maintenance(), которые сразу пишут и в БД. Окончание
+    обслуживания обрабатывает одна фоновая задача: min-heap (maintenance_until, name),
+    сон до ближайшего срока, затем перевод принтера в ready с записью в БД.
+    Устаревшие записи heap (обслуживание продлили) отбрасываются при извлечении.
+    """
+
+    def __init__(self) -> None:
+        self._by_name: dict[str, PrinterState] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._heap: list[tuple[datetime, str]] = []
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    # ===== загрузка и чтение =====
+
+    async def ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded or db_base.async_session is None:
+                return
+            async with db_base.async_session() as session:
+                rows = await session.execute(
+                    select(Printer.id, Printer.name, Printer.status, Printer.maintenance_until).order_by(Printer.id)
+                )
+                for pid, name, status, until in rows.all():
+                    self._by_name[name] = PrinterState(pid, name, status, until)
+            for state in self._by_name.values():
+                if state.status == "maintenance" and state.maintenance_until is not None:
+                    heapq.heappush(self._heap, (state.maintenance_until, state.name))
+            self._loaded = True
+            self.start()
+
+    def get(self, name: str) -> PrinterState | None:
+        return self._by_name.get(name)
+
+    def all(self) -> list[PrinterState]:
+        return sorted(self._by_name.values(), key=lambda p: p.id)
+
+    def ready(self, now: datetime | None = None) -> list[PrinterState]:
+        now = now or datetime.utcnow()
+        return [p for p in self.all() if p.is_ready(now)]
+
+    # ===== изменения (БД + память) =====
+
+    async def add(self, name: str) -> PrinterState | None:
+        """Добавить принтер; None — такой уже есть."""
+        await self.ensure_loaded()
+        if name in self._by_name or db_base.async_session is None:
+            return None
+        async with db_base.async_session() as session:
+            p = Printer(name=name, status="ready")
+            session.add(p)
+            await session.commit()
+            state = PrinterState(p.id, p.name, p.status, None)
+        self._by_name[name] = state
+        return state
+
+    async def set_maintenance(self, name: str, until: datetime) -> PrinterState | None:
+        """Перевести принтер в обслуживание до until; None — принтер не найден."""
+        await self.ensure_loaded()
+        state = self._by_name.get(name)
+        if state is None or db_base.async_session is None:
+            return None
+        async with db_base.async_session() as session:
+            await session.execute(
+                update(Printer).where(Printer.id == state.id).values(status="maintenance", maintenance_until=until)
+            )
+            await session.commit()
+        state.status = "maintenance"
+        state.maintenance_until = until
+        heapq.heappush(self._heap, (until, name))
+        self._changed.set()
+        return state
+
+    # ===== таймер окончания обслуживания =====
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="printer-maintenance-timer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._changed.clear()
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                    continue  # heap изменился — пересчитать ближайший срок
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self._expire(datetime.utcnow())
+            except Exception:
+                logger.exception("Printer maintenance timer failed")
+                await asyncio.sleep(5)
+
+    async def _expire(self, now: datetime) -> None:
+        if db_base.async_session is None:
+            return
+        due: list[tuple[datetime, PrinterState]] = []
+        while self._heap and self._heap[0][0] <= now:
+            until, name = heapq.heappop(self._heap)
+            state = self._by_name.get(name)
+            # Запись актуальна, только если срок не меняли после постановки в heap
+            if state and state.status == "maintenance" and state.maintenance_until == until:
+                due.append((until, state))
+        if not due:
+            return
+        from .print_queue import assign_pending, promote_next
+
+        # Память меняем только после commit: до него принтеры и так считаются готовыми
+        # (is_ready по сроку), а при ошибке записи возвращаются в heap и таймер повторит
+        try:
+            async with db_base.async_session() as session:
+                await session.execute(
+                    update(Printer),
+                    [{"id": s.id, "status": "ready", "maintenance_until": None} for _, s in due],
+                )
+                # Очередь, стоявшая за обслуживанием, продолжается; ожидавшие заявки
+                # (в том числе закреплённые за этими принтерами) распределяются
+                await promote_next(session, [s.id for _, s in due], now=now)
+                await assign_pending(session, now=now)
+                await session.commit()
+        except BaseException:
+            for until, s in due:
+                heapq.heappush(self._heap, (until, s.name))
+            raise
+        for until, s in due:
+            # Обслуживание могли продлить, пока шла запись, — тогда новое состояние не трогаем
+            if s.status == "maintenance" and s.maintenance_until == until:
+                s.status = "ready"
+                s.maintenance_until = None
+        logger.info("Printers back from maintenance: {}", ", ".join(s.name for _, s in due))
+
+
+printer_registry = PrinterRegistry()
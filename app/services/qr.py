@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+# qrcode и Pillow импортируются внутри функции: они нужны только при закрытии ремонта,
+# а их импорт заметно удлиняет старт бота.
+
+FONT_CANDIDATES = [
+    # Распространённые шрифты Windows
+    r"C:\\Windows\\Fonts\\arial.ttf",
+    r"C:\\Windows\\Fonts\\arialuni.ttf",
+    r"C:\\Windows\\Fonts\\segoeui.ttf",
+    r"C:\\Windows\\Fonts\\tahoma.ttf",
+]
+
+
+def render_repair_qr(qr_payload: str, caption_text: str, file_path: Path) -> bytes:
+    """QR с подписью под ним: сохраняет PNG в file_path и возвращает его байты.
+
+    Синхронная и CPU-bound — из хендлеров вызывать через asyncio.to_thread.
+    """
+    import qrcode
+    from PIL import Image, ImageDraw, ImageFont
+
+    # Базовый QR
+    qr_img = qrcode.make(qr_payload).convert("RGB")
+    # Подготовим полотно: добавим место под текст (около 60-100px)
+    padding = 16
+    text_area_h = 80
+    canvas = Image.new(
+        "RGB",
+        (qr_img.width + padding * 2, qr_img.height + padding * 2 + text_area_h),
+        color=(255, 255, 255),
+    )
+    canvas.paste(qr_img, (padding, padding))
+    draw = ImageDraw.Draw(canvas)
+    # Пытаемся загрузить TTF-шрифт с поддержкой кириллицы
+    font = None
+    for fp in FONT_CANDIDATES:
+        try:
+            if Path(fp).exists():
+                font = ImageFont.truetype(fp, size=16)
+                break
+        except Exception:
+            continue
+    if font is None:
+        # Последний шанс — встроенный (может не покрывать кириллицу)
+        try:
+            font = ImageFont.load_default()
+        except Exception:
+            font = None
+    # Центрируем текст
+    text_y = qr_img.height + padding + (text_area_h // 2)
+    # Первая строка: payload (мелко)
+    payload_bbox = draw.textbbox((0, 0), qr_payload, font=font)
+    payload_w = payload_bbox[2] - payload_bbox[0]
+    payload_h = payload_bbox[3] - payload_bbox[1]
+    draw.text(
+        ((canvas.width - payload_w) // 2, text_y - payload_h - 4),
+        qr_payload,
+        fill=(0, 0, 0),
+        font=font,
+    )
+    # Вторая строка: подпись (название — номер)
+    cap_bbox = draw.textbbox((0, 0), caption_text, font=font)
+    cap_w = cap_bbox[2] - cap_bbox[0]
+    draw.text(
+        ((canvas.width - cap_w) // 2, text_y + 4),
+        caption_text,
+        fill=(0, 0, 0),
+        font=font,
+    )
+
+    bio = io.BytesIO()
+    canvas.save(bio, format="PNG")
+    data = bio.getvalue()
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_bytes(data)
+    return data
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import rollups
+from ..db.models import Repair, RepairStatDaily, Unit, UnitEvent
+
+# Жизненный цикл ремонта: open_repair(), когда описана неисправность, создаёт
+# Repair(status="open") и событие repair_open, close_repair() закрывает ту же запись
+# и пишет repair_close. Пока ремонт открыт, блок в статусе in_repair.
+# Оба шага в одной транзакции обновляют сводки repair_stats_daily, stock_counts и unit_events_daily.
+# Всё время — UTC, как у остальных событий: opened_at/closed_at и timestamp событий
+# ремонта совпадают, так что дни в /repair_stats и /stats считаются одинаково.
+
+
+async def find_open_repair(session: AsyncSession, unit_id: int) -> Repair | None:
+    return (
+        await session.execute(
+            select(Repair)
+            .where(Repair.unit_id == unit_id, Repair.status == "open")
+            .order_by(Repair.id.desc())
+            .limit(1)
+        )
+    ).scalar_one_or_none()
+
+
+async def open_repair(
+    session: AsyncSession,
+    unit: Unit,
+    *,
+    by_user_id: int | None,
+    by_user_name: str | None,
+    comment: str | None = None,
+    now: datetime | None = None,
+) -> Repair:
+    """Открыть ремонт блока; если открытый уже есть — вернуть его (повторный старт не плодит записей)."""
+    existing = await find_open_repair(session, unit.id)
+    if existing is not None:
+        return existing
+    now = now or datetime.utcnow()
+    rep = Repair(unit_id=unit.id, opened_at=now, status="open", by_user_id=by_user_id)
+    session.add(rep)
+    await session.flush()
+    await rollups.stock_moved(session, [(unit.type, unit.condition)], unit.status, "in_repair")
+    unit.status = "in_repair"
+    session.add(UnitEvent(
+        unit_id=unit.id,
+        event_type="repair_open",
+        by_user_id=by_user_id,
+        by_user_name=by_user_name,
+        comment=comment,
+        repair_id=rep.id,
+        timestamp=now,
+    ))
+    await rollups.repair_opened(session, unit.type, now)
+    await rollups.events_logged(session, "repair_open", day=now.date())
+    return rep
+
+
+async def close_repair(
+    session: AsyncSession,
+    rep: Repair,
+    unit: Unit | None,
+    *,
+    summary: str | None,
+    by_user_id: int | None,
+    by_user_name: str | None,
+    now: datetime | None = None,
+) -> None:
+    now = now or datetime.utcnow()
+    rep.closed_at = now
+    rep.status = "done"
+    rep.summary = summary
+    if by_user_id is not None:
+        rep.by_user_id = by_user_id
+    if unit is not None:
+        await rollups.stock_moved(session, [(unit.type, unit.condition)], unit.status, "done")
+        unit.status = "done"
+    session.add(UnitEvent(
+        unit_id=rep.unit_id,
+        event_type="repair_close",
+        by_user_id=by_user_id,
+        by_user_name=by_user_name,
+        comment=summary,
+        repair_id=rep.id,
+        timestamp=now,
+    ))
+    await rollups.repair_closed(session, unit.type if unit else None, rep.opened_at, now)
+    await rollups.events_logged(session, "repair_close", day=now.date())
+
+
+@dataclass(slots=True)
+class RepairTypeStats:
+    unit_type: str
+    opened: int
+    closed: int
+    duration_s: int
+
+    @property
+    def avg_hours(self) -> float | None:
+        return self.duration_s / self.closed / 3600 if self.closed else None
+
+
+async def repair_stats(session: AsyncSession, since: date) -> tuple[list[RepairTypeStats], int]:
+    """Сводка по типам блоков с даты since (UTC, по repair_stats_daily) и число открытых сейчас."""
+    q = (
+        select(
+            RepairStatDaily.unit_type,
+            func.sum(RepairStatDaily.opened),
+            func.sum(RepairStatDaily.closed),
+            func.sum(RepairStatDaily.duration_s),
+        )
+        .where(RepairStatDaily.day >= since)
+        .group_by(RepairStatDaily.unit_type)
+        .order_by(func.sum(RepairStatDaily.closed).desc(), RepairStatDaily.unit_type.asc())
+    )
+    rows = [RepairTypeStats(t, int(o or 0), int(c or 0), int(d or 0)) for t, o, c, d in (await session.execute(q)).all()]
+    open_now = (await session.execute(select(func.count()).where(Repair.status == "open"))).scalar() or 0
+    return rows, int(open_now)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.models import StockCount, UnitEventDaily
+
+# Сводка склада для /stats читается только из stock_counts и unit_events_daily
+# (app.db.rollups): число строк — это число групп, а не блоков или событий.
+
+
+@dataclass(slots=True)
+class StockStats:
+    by_status: Counter[str] = field(default_factory=Counter)
+    # Только блоки на складе (статус не 'issued')
+    by_type: Counter[str] = field(default_factory=Counter)
+    by_condition: Counter[str] = field(default_factory=Counter)
+    # День -> тип события -> количество
+    events: dict[date, Counter[str]] = field(default_factory=dict)
+
+    @property
+    def in_stock(self) -> int:
+        return sum(n for status, n in self.by_status.items() if status != "issued")
+
+
+async def stock_stats(session: AsyncSession, since: date) -> StockStats:
+    stats = StockStats()
+    rows = await session.execute(
+        select(StockCount.status, StockCount.unit_type, StockCount.condition, StockCount.count).where(StockCount.count != 0)
+    )
+    for status, unit_type, condition, count in rows.all():
+        stats.by_status[status] += count
+        if status != "issued":
+            stats.by_type[unit_type] += count
+            stats.by_condition[condition] += count
+    rows = await session.execute(
+        select(UnitEventDaily.day, UnitEventDaily.event_type, UnitEventDaily.count).where(UnitEventDaily.day >= since)
+    )
+    for day, event_type, count in rows.all():
+        stats.events.setdefault(day, Counter())[event_type] += count
+    return stats
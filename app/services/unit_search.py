@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import base as db_base
+from ..db.queries import UNITS_BY_NAME_PREFIX, UNITS_BY_NUMBER_PREFIX
+from .units import UnitCard
+
+# Поиск блоков для inline-режима (@bot 105): по началу номера, затем названия.
+# Клиент Telegram шлёт запрос почти на каждый символ. Поэтому:
+# - результаты держатся в LRU по строке запроса (CACHE_TTL, статусы меняются);
+# - промах ждёт DEBOUNCE: если за это время тот же пользователь набрал
+#   следующий символ, запрос в БД не идёт вовсе;
+# - одинаковые промахи от разных пользователей ждут один общий запрос.
+SEARCH_LIMIT = 20
+CACHE_SIZE = 512
+CACHE_TTL = 30.0
+DEBOUNCE = 0.35
+# Больше любого символа в UTF-8: x < prefix + HIGH для всех x, начинающихся с prefix
+HIGH = "\U0010ffff"
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())[:64]
+
+
+async def search_units(session: AsyncSession, query: str, limit: int = SEARCH_LIMIT) -> list[UnitCard]:
+    """Блоки, у которых номер или название начинается с query (номер — первым)."""
+    found: dict[int, UnitCard] = {}
+    # Названия в справочнике заглавными (БУД) или с большой буквы, а набирают как
+    # попало; NOCASE в SQLite кириллицу не сворачивает — перебираем написания
+    variants = [(UNITS_BY_NUMBER_PREFIX, query)]
+    for spelling in dict.fromkeys((query, query.upper(), query.capitalize())):
+        variants.append((UNITS_BY_NAME_PREFIX, spelling))
+    for stmt, prefix in variants:
+        if len(found) >= limit:
+            break
+        rows = await session.execute(stmt, {"lo": prefix, "hi": prefix + HIGH, "limit": limit - len(found)})
+        for row in rows.all():
+            found.setdefault(row.id, UnitCard(*row))
+    return list(found.values())[:limit]
+
+
+class UnitSearch:
+    """Кэш и антидребезг поиска для inline-запросов."""
+
+    def __init__(self, cache_size: int = CACHE_SIZE, ttl: float = CACHE_TTL, debounce: float = DEBOUNCE) -> None:
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.debounce = debounce
+        self._cache: OrderedDict[str, tuple[float, list[UnitCard]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future[list[UnitCard]]] = {}
+        self._latest: dict[int, int] = {}  # пользователь -> номер последнего запроса
+        self._seq = itertools.count(1)
+        self.hits = self.misses = self.skipped = 0
+
+    async def search(self, user_id: int, query: str) -> list[UnitCard] | None:
+        """Результаты по запросу; None — пользователь уже набрал следующий, этот не нужен."""
+        query = normalize_query(query)
+        if not query:
+            return []
+        seq = self._latest[user_id] = next(self._seq)
+        cached = self._get(query)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        await asyncio.sleep(self.debounce)
+        if self._latest.get(user_id) != seq:
+            self.skipped += 1
+            return None
+        del self._latest[user_id]
+        cached = self._get(query)  # пока ждали, мог найти другой пользователь
+        if cached is not None:
+            self.hits += 1
+            return cached
+        pending = self._inflight.get(query)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        future: asyncio.Future[list[UnitCard]] = asyncio.get_running_loop().create_future()
+        self._inflight[query] = future
+        try:
+            assert db_base.async_read_session is not None
+            async with db_base.async_read_session() as session:
+                found = await search_units(session, query)
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # ждущих может не быть — не пишем «exception never retrieved»
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(found)
+            self._put(query, found)
+            return found
+        finally:
+            del self._inflight[query]
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def _get(self, query: str) -> list[UnitCard] | None:
+        item = self._cache.get(query)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del self._cache[query]
+            return None
+        self._cache.move_to_end(query)
+        return item[1]
+
+    def _put(self, query: str, found: list[UnitCard]) -> None:
+        self._cache[query] = (time.monotonic() + self.ttl, found)
+        self._cache.move_to_end(query)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+unit_search = UnitSearch()
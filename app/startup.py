@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import sys
+import time
+
+
+class StartupTimer:
+    """Разбивка времени старта по фазам (в духе -X importtime, но по крупным шагам).
+
+    Фазы идут подряд: mark(name) закрывает фазу, начатую предыдущей отметкой.
+    Для каждой фазы — длительность и сколько модулей импортировано за это время.
+    """
+
+    def __init__(self, t0: float | None = None, modules0: int | None = None) -> None:
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.phases: list[tuple[str, float, int]] = []
+        self._last = self.t0
+        self._modules = modules0 if modules0 is not None else len(sys.modules)
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        modules = len(sys.modules)
+        self.phases.append((name, (now - self._last) * 1000, modules - self._modules))
+        self._last = now
+        self._modules = modules
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    def report(self) -> str:
+        parts = [f"{name}={ms:.0f}ms (+{mods} modules)" for name, ms, mods in self.phases]
+        return " | ".join(parts) + f" | total={self.total_ms:.0f}ms"
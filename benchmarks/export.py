@@ -0,0 +1,55 @@
+"""Замер экспорта блоков (app.services.export) на засеянной базе (см. benchmarks.seed).
+
+    python -m benchmarks.export --db data/bench.db
+    python -m benchmarks.export --db data/bench.db --formats csv.gz --all --part-mb 5
+
+Для каждого формата печатает время, число строк, размер и число частей,
+а в конце — пик памяти процесса.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app.db import base as db_base
+    from app.db.base import setup_engine
+    from app.services.export import FORMATS, export_units
+
+    setup_engine(f"sqlite+aiosqlite:///{Path(args.db).resolve()}")
+    assert db_base.async_session is not None
+    formats = [f for f in args.formats.split(",") if f] if args.formats else list(FORMATS)
+    for fmt in formats:
+        with tempfile.TemporaryDirectory(prefix="bench-export-") as tmp:
+            t0 = time.perf_counter()
+            async with db_base.async_session() as session:
+                parts = await export_units(
+                    session, Path(tmp), include_all=args.all, fmt=fmt, max_bytes=int(args.part_mb * 1024 * 1024)
+                )
+            elapsed = time.perf_counter() - t0
+            sizes = [p.stat().st_size for p in parts]
+            print(f"{fmt:8} {elapsed:7.2f} s  {sum(sizes) / 1e6:8.1f} MB  parts={len(parts)}  "
+                  f"max part {max(sizes) / 1e6:.1f} MB")
+    await db_base.engine.dispose()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: КБ
+    print(f"peak RSS {peak_mb:.0f} MB")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--formats", default="", help="через запятую: xml,xml.gz,csv,csv.gz (по умолчанию все)")
+    parser.add_argument("--all", action="store_true", help="все блоки, а не только на складе")
+    parser.add_argument("--part-mb", type=float, default=49, help="лимит размера части, МБ")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import itertools
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import BufferedInputFile, File, FSInputFile, Message, User
+
+BOT_ID = 42
+BOT_TOKEN = f"{BOT_ID}:BENCH-TOKEN"
+
+
+@dataclass(slots=True)
+class RecordedCall:
+    method: str
+    chat_id: int | str | None
+    upload_bytes: int = 0
+
+
+class FakeSession(BaseSession):
+    """Сессия Bot API без сети: записывает исходящие вызовы и отдаёт правдоподобные ответы.
+
+    Для скачивания файлов (getFile + stream_content) содержимое берётся из ``files``:
+    file_id -> bytes.
+    """
+
+    def __init__(self, files: dict[str, bytes] | None = None) -> None:
+        super().__init__()
+        self.calls: list[RecordedCall] = []
+        self.files: dict[str, bytes] = files or {}
+        self._ids = itertools.count(1)
+
+    @property
+    def counts(self) -> Counter[str]:
+        return Counter(c.method for c in self.calls)
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None) -> TelegramType:
+        name = method.__api_method__
+        chat_id = getattr(method, "chat_id", None)
+        upload = 0
+        for attr in ("photo", "document"):
+            value = getattr(method, attr, None)
+            if isinstance(value, BufferedInputFile):
+                upload += len(value.data)
+            elif isinstance(value, FSInputFile):
+                upload += os.path.getsize(value.path)
+        self.calls.append(RecordedCall(name, chat_id, upload))
+        return self._result(bot, method, name, chat_id)
+
+    def _result(self, bot: Bot, method: TelegramMethod[Any], name: str, chat_id: int | str | None) -> Any:
+        returning = method.__returning__
+        if returning is bool:
+            return True
+        if name == "getMe":
+            return User(id=BOT_ID, is_bot=True, first_name="Bench", username="bench_bot")
+        if name == "getFile":
+            file_id = getattr(method, "file_id")
+            return File(file_id=file_id, file_unique_id=file_id, file_path=file_id,
+                        file_size=len(self.files.get(file_id, b"")))
+        # Всё остальное, что нужно хендлерам, возвращает Message (или Message | bool для edit*)
+        msg_id = next(self._ids)
+        payload: dict[str, Any] = {
+            "message_id": getattr(method, "message_id", None) or msg_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id or 0, "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "Bench"},
+            "text": getattr(method, "text", None),
+        }
+        if name == "sendPhoto":
+            payload["photo"] = [{"file_id": f"photo-{msg_id}", "file_unique_id": f"p{msg_id}", "width": 1, "height": 1}]
+        elif name == "sendDocument":
+            payload["document"] = {"file_id": f"doc-{msg_id}", "file_unique_id": f"d{msg_id}"}
+        return Message.model_validate(payload, context={"bot": bot})
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: dict[str, Any] | None = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        # url имеет вид <api>/file/bot<token>/<file_path>; file_path == file_id
+        data = self.files.get(url.rsplit("/", 1)[-1], b"")
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+
+def make_bot(session: FakeSession | None = None) -> Bot:
+    from aiogram.client.default import DefaultBotProperties
+    from aiogram.enums.parse_mode import ParseMode
+
+    return Bot(
+        token=BOT_TOKEN,
+        session=session or FakeSession(),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
@@ -0,0 +1,347 @@
+"""Replay-бенчмарк пользовательских сценариев бота без Telegram.
+
+Собирает настоящий Dispatcher (app.main.build_dispatcher), подменяет сессию Bot на
+FakeSession и прогоняет скриптовые последовательности апдейтов для N синтетических
+пользователей одновременно.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.flows --users 20 --rounds 5
+    python -m benchmarks.flows --flows receive,issue --json bench_flows.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from .fake_bot import BOT_ID, BOT_TOKEN, FakeSession, make_bot
+
+FLOW_NAMES = ("receive", "repair", "issue", "export", "browse")
+USER_BASE_ID = 10_000
+
+
+@dataclass
+class Step:
+    kind: str  # "message" | "callback"
+    payload: str
+
+
+@dataclass
+class FlowStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    updates: int = 0
+    peak_kib: float = 0.0
+    retained_kib: float = 0.0
+
+
+class UpdateFactory:
+    """Строит Update'ы от имени синтетического пользователя."""
+
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+
+    @staticmethod
+    def _user(tg_id: int) -> dict[str, Any]:
+        return {"id": tg_id, "is_bot": False, "first_name": "Bench", "last_name": f"User{tg_id}"}
+
+    def message(self, tg_id: int, text: str) -> Update:
+        return Update.model_validate({
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": tg_id, "type": "private"},
+                "from": self._user(tg_id),
+                "text": text,
+            },
+        }, context={"bot": self.bot})
+
+    def callback(self, tg_id: int, data: str) -> Update:
+        return Update.model_validate({
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": self._user(tg_id),
+                "chat_instance": str(tg_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": tg_id, "type": "private"},
+                    "from": {"id": BOT_ID, "is_bot": True, "first_name": "Bench"},
+                    "text": "…",
+                },
+            },
+        }, context={"bot": self.bot})
+
+    def build(self, tg_id: int, step: Step) -> Update:
+        if step.kind == "message":
+            return self.message(tg_id, step.payload)
+        return self.callback(tg_id, step.payload)
+
+
+# ===== Сценарии =====
+
+
+def receive_flow(user_idx: int, round_idx: int, fixtures: dict[str, Any]) -> list[Step]:
+    from app.keyboards.callbacks import ChoiceAction, ChoiceCb
+
+    return [
+        Step("callback", "blocks:receive"),
+        Step("message", f"B{user_idx}-{round_idx}"),
+        Step("callback", ChoiceCb(scope="recv:name", action=ChoiceAction.idx, idx=0).pack()),
+        Step("callback", ChoiceCb(scope="recv:type", action=ChoiceAction.idx, idx=0).pack()),
+        Step("callback", "recv:cond:ok"),
+        Step("callback", "recv:ra:RA1"),
+        Step("message", "105-01"),
+    ]
+
+
+def repair_flow(user_idx: int, round_idx: int, fixtures: dict[str, Any]) -> list[Step]:
+    from app.keyboards.callbacks import UnitAction, UnitCb
+
+    unit_id = fixtures["repair_units"][user_idx][round_idx]
+    return [
+        Step("callback", UnitCb(action=UnitAction.repair, unit_id=unit_id).pack()),
+        Step("message", "Не включается"),
+        Step("message", "Замена конденсатора C12"),  # закрытие ремонта + QR
+    ]
+
+
+def issue_flow(user_idx: int, round_idx: int, fixtures: dict[str, Any]) -> list[Step]:
+    from app.keyboards.callbacks import UnitAction, UnitCb
+
+    unit_id = fixtures["issue_units"][user_idx][round_idx]
+    return [
+        Step("callback", UnitCb(action=UnitAction.issue, unit_id=unit_id).pack()),
+        Step("callback", "recv:ra:RA2"),
+        Step("message", "113-02"),
+        Step("callback", "issue:confirm:yes"),
+    ]
+
+
+def export_flow(user_idx: int, round_idx: int, fixtures: dict[str, Any]) -> list[Step]:
+    return [
+        Step("callback", "blocks:export"),
+        Step("callback", "blocks:export:stock"),
+    ]
+
+
+def browse_flow(user_idx: int, round_idx: int, fixtures: dict[str, Any]) -> list[Step]:
+    # Навигация без изменений: карточка, история, меню экспорта — правкой на месте
+    from app.keyboards.callbacks import UnitAction, UnitCb
+
+    unit_id = fixtures["issue_units"][user_idx][round_idx]
+    return [
+        Step("callback", UnitCb(action=UnitAction.card, unit_id=unit_id).pack()),
+        Step("callback", UnitCb(action=UnitAction.history, unit_id=unit_id).pack()),
+        Step("callback", UnitCb(action=UnitAction.card, unit_id=unit_id).pack()),
+        Step("callback", "blocks:menu"),
+        Step("callback", "blocks:export"),
+        Step("callback", "blocks:export:fmt:csv"),
+    ]
+
+
+FLOWS: dict[str, Callable[[int, int, dict[str, Any]], list[Step]]] = {
+    "receive": receive_flow,
+    "repair": repair_flow,
+    "issue": issue_flow,
+    "export": export_flow,
+    "browse": browse_flow,
+}
+
+
+# ===== Подготовка БД =====
+
+
+async def seed(users: int, rounds: int, stock_units: int) -> dict[str, Any]:
+    """Справочники для приёмки, блоки под ремонт/выдачу и «склад» для экспорта."""
+    from sqlalchemy import insert, select
+
+    from app.db import base as db_base
+    from app.db.models import Unit, UnitEvent
+
+    names = [f"БУД-{i}" for i in range(12)]
+    types = [f"750-05.{i:02d}" for i in range(12)]
+    rows: list[dict[str, Any]] = []
+    for i in range(stock_units):
+        rows.append({
+            "number": str(100 + i % 500), "name": names[i % len(names)], "type": types[i % len(types)],
+            "status": "received", "condition": "Исправный",
+        })
+    for u in range(users):
+        for r in range(rounds):
+            rows.append({"number": f"R{u}-{r}", "name": names[0], "type": types[0], "status": "received"})
+            rows.append({"number": f"I{u}-{r}", "name": names[1], "type": types[1], "status": "done"})
+
+    assert db_base.async_session is not None
+    async with db_base.async_session() as session:
+        await session.execute(insert(Unit), rows)
+        ids = dict((await session.execute(select(Unit.number, Unit.id).where(Unit.number.like("%-%")))).all())
+        await session.execute(insert(UnitEvent), [
+            {"unit_id": uid, "event_type": "received", "by_user_name": "Bench"} for uid in ids.values()
+        ])
+        await session.commit()
+    return {
+        "repair_units": [[ids[f"R{u}-{r}"] for r in range(rounds)] for u in range(users)],
+        "issue_units": [[ids[f"I{u}-{r}"] for r in range(rounds)] for u in range(users)],
+    }
+
+
+# ===== Прогон =====
+
+
+async def run_user(dp: Dispatcher, bot: Bot, factory: UpdateFactory, flows: list[str], user_idx: int,
+                   rounds: int, fixtures: dict[str, Any], stats: dict[str, FlowStats]) -> None:
+    tg_id = USER_BASE_ID + user_idx
+    for round_idx in range(rounds):
+        for flow in flows:
+            for step in FLOWS[flow](user_idx, round_idx, fixtures):
+                update = factory.build(tg_id, step)
+                t0 = time.perf_counter()
+                await dp.feed_update(bot, update)
+                stats[flow].latencies_ms.append((time.perf_counter() - t0) * 1000)
+                stats[flow].updates += 1
+
+
+async def measure_allocations(dp: Dispatcher, bot: Bot, factory: UpdateFactory, flows: list[str],
+                              fixtures: dict[str, Any], stats: dict[str, FlowStats], rounds: int) -> None:
+    """Отдельный последовательный проход под tracemalloc: пик и удержанная память на один сценарий."""
+    from app.services.export_tasks import export_tasks
+
+    user_idx = 0
+    tg_id = USER_BASE_ID + user_idx
+    for flow in flows:
+        # Используем последний раунд первого пользователя — его блоки ещё не тронуты
+        round_idx = rounds  # дополнительный раунд, засеянный заранее
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for step in FLOWS[flow](user_idx, round_idx, fixtures):
+            await dp.feed_update(bot, factory.build(tg_id, step))
+        await export_tasks.join()  # фоновая выгрузка — часть сценария
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats[flow].peak_kib = (peak - before) / 1024
+        stats[flow].retained_kib = (after - before) / 1024
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    from app.db.base import init_db, setup_engine
+    from app.db.queries import format_cache_stats
+    from app.logger import setup_logging
+    from app.main import build_dispatcher
+    from app.services.export_tasks import export_tasks
+
+    setup_logging("WARNING")
+    workdir = Path(tempfile.mkdtemp(prefix="bench-flows-"))
+    os.chdir(workdir)  # хендлеры пишут в ./data (QR, загрузки)
+    # Хендлеры читают настройки (лимит экспорта и т.п.); без .env нужен токен
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", BOT_TOKEN)
+    setup_engine(f"sqlite+aiosqlite:///{workdir / 'bench.db'}", args.read_url)
+    await init_db()
+    # +1 раунд под замер аллокаций
+    fixtures = await seed(args.users, args.rounds + 1, args.stock_units)
+
+    session = FakeSession()
+    bot = make_bot(session)
+    dp = build_dispatcher()
+    factory = UpdateFactory(bot)
+    flows = [f for f in args.flows.split(",") if f]
+    stats = {flow: FlowStats() for flow in flows}
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        run_user(dp, bot, factory, flows, u, args.rounds, fixtures, stats) for u in range(args.users)
+    ))
+    # Экспорт отвечает сразу, файл строится в фоне — ждём, чтобы учесть его в прогоне
+    await export_tasks.join()
+    elapsed = time.perf_counter() - t0
+
+    if not args.no_alloc:
+        await measure_allocations(dp, bot, factory, flows, fixtures, stats, args.rounds)
+
+    total_updates = sum(s.updates for s in stats.values())
+    report: dict[str, Any] = {
+        "users": args.users,
+        "rounds": args.rounds,
+        "stock_units": args.stock_units,
+        "elapsed_s": round(elapsed, 3),
+        "updates": total_updates,
+        "updates_per_s": round(total_updates / elapsed, 1) if elapsed else 0.0,
+        "api_calls": dict(session.counts),
+        "sql_cache": format_cache_stats(),
+        "flows": {},
+    }
+    for flow, s in stats.items():
+        report["flows"][flow] = {
+            "updates": s.updates,
+            "p50_ms": round(statistics.median(s.latencies_ms), 3) if s.latencies_ms else 0.0,
+            "p95_ms": round(percentile(s.latencies_ms, 95), 3),
+            "p99_ms": round(percentile(s.latencies_ms, 99), 3),
+            "peak_kib": round(s.peak_kib, 1),
+            "retained_kib": round(s.retained_kib, 1),
+        }
+    await bot.session.close()
+    return report
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(f"users={report['users']} rounds={report['rounds']} updates={report['updates']} "
+          f"elapsed={report['elapsed_s']}s -> {report['updates_per_s']} updates/s")
+    print(f"{'flow':<10}{'updates':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>11}{'kept KiB':>11}")
+    for flow, s in report["flows"].items():
+        print(f"{flow:<10}{s['updates']:>9}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}"
+              f"{s['peak_kib']:>11}{s['retained_kib']:>11}")
+    print("API calls:", ", ".join(f"{k}={v}" for k, v in sorted(report["api_calls"].items())))
+    print("SQL compile cache:", report["sql_cache"])
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="синтетических пользователей одновременно")
+    parser.add_argument("--rounds", type=int, default=3, help="повторов каждого сценария на пользователя")
+    parser.add_argument("--flows", default=",".join(FLOW_NAMES), help="через запятую: " + ",".join(FLOW_NAMES))
+    parser.add_argument("--stock-units", type=int, default=2000, help="блоков на складе (объём экспорта)")
+    parser.add_argument("--read-url", default="", help="движок для чтения: ro (тот же SQLite, WAL) или URL")
+    parser.add_argument("--no-alloc", action="store_true", help="не замерять аллокации (tracemalloc)")
+    parser.add_argument("--json", dest="json_path", help="сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+    unknown = set(args.flows.split(",")) - set(FLOW_NAMES) - {""}
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+
+    cwd = Path.cwd()
+    report = asyncio.run(run(args))
+    os.chdir(cwd)
+    print_report(report)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
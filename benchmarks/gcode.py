@@ -0,0 +1,78 @@
+"""Замер потокового разбора G-code (app.services.gcode) на синтетическом файле.
+
+    python -m benchmarks.gcode --mb 500
+    python -m benchmarks.gcode --file path/to/part.gcode
+
+Генерирует файл нужного размера (слои из периметров и заливки, как у слайсера:
+комментарии, ретракты, G92 E0 на слой) и печатает скорость разбора в МБ/с
+и пик памяти процесса.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _layer(z: float, e: float) -> tuple[str, float]:
+    out = [f";LAYER_CHANGE\nG1 Z{z:.2f} F600\nG92 E0\n"]
+    e = 0.0
+    for i in range(400):
+        a = i / 400 * 2 * math.pi
+        x, y = 100 + 40 * math.cos(a), 100 + 40 * math.sin(a)
+        e += 0.0331
+        out.append(f"G1 X{x:.3f} Y{y:.3f} E{e:.5f} F1800 ; perimeter\n" if i == 0 else f"G1 X{x:.3f} Y{y:.3f} E{e:.5f}\n")
+    out.append(f"G1 E{e - 0.8:.5f} F2100\nG0 X60 Y60 F9000\nG1 E{e:.5f} F2100\n")
+    for row in range(80):
+        y = 60 + row
+        x0, x1 = (60, 140) if row % 2 == 0 else (140, 60)
+        e += 2.65
+        out.append(f"G1 X{x0} Y{y} F6000\nG1 X{x1} Y{y} E{e:.5f}\n")
+    return "".join(out), e
+
+
+def generate(path: Path, megabytes: float) -> None:
+    target = int(megabytes * 1_000_000)
+    written = 0
+    z, e = 0.2, 0.0
+    with path.open("w", encoding="ascii") as f:
+        f.write("; synthetic\nG21\nG90\nM82\nM204 S2000\nG28\n")
+        while written < target:
+            block, e = _layer(z, e)
+            f.write(block)
+            written += len(block)
+            z += 0.2
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=100.0, help="размер синтетического файла")
+    parser.add_argument("--file", help="готовый G-code вместо синтетического")
+    args = parser.parse_args(argv)
+
+    from app.services.gcode import analyze_gcode
+
+    if args.file:
+        path = Path(args.file)
+    else:
+        path = Path(tempfile.mkdtemp(prefix="bench-gcode-")) / "synthetic.gcode"
+        t0 = time.perf_counter()
+        generate(path, args.mb)
+        print(f"generated {path.stat().st_size / 1e6:.0f} MB in {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+
+    size = path.stat().st_size
+    t0 = time.perf_counter()
+    stats = analyze_gcode(path)
+    elapsed = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: КБ
+    print(f"{size / 1e6:.0f} MB, {stats.lines} lines, {stats.moves} moves: {elapsed:.2f} s "
+          f"({size / 1e6 / elapsed:.1f} MB/s), peak RSS {peak_mb:.0f} MB")
+    print(f"print time {stats.print_time_s / 3600:.2f} h, filament {stats.filament_mm / 1000:.1f} m")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Построение клавиатур: каждый раз заново против кэша (app.keyboards).
+
+    python -m benchmarks.keyboards
+    python -m benchmarks.keyboards --names 500 --calls 20000
+
+Для каждой клавиатуры — время вызова и сколько байт аллоцирует один вызов
+(пик tracemalloc; столько же выделял бы каждый апдейт, который её показывает):
+без кэша (исходная функция, __wrapped__) и с кэшем. paged_flip — листание
+справочника названий при приёмке: вызовы по кругу по всем страницам.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+
+def cases(names: int) -> dict[str, tuple[Callable[[int], Any], Callable[[int], Any]]]:
+    from app.keyboards.blocks import blocks_menu_kb, export_menu_kb
+    from app.keyboards.main_menu import main_menu_kb
+    from app.keyboards.printing import print_confirm_kb
+    from app.keyboards.receive import _paged_kb, choices_paged_kb, ra_kb, skip_kb, status_kb
+
+    static = {
+        "status_kb": status_kb,
+        "ra_kb": ra_kb,
+        "skip_kb": skip_kb,
+        "blocks_menu_kb": blocks_menu_kb,
+        "main_menu_kb": main_menu_kb,
+        "print_confirm_kb": print_confirm_kb,
+    }
+    out: dict[str, tuple[Callable[[int], Any], Callable[[int], Any]]] = {
+        name: (lambda i, f=fn: f.__wrapped__(), lambda i, f=fn: f()) for name, fn in static.items()
+    }
+    out["export_menu_kb"] = (lambda i: export_menu_kb.__wrapped__("csv.gz"), lambda i: export_menu_kb("csv.gz"))
+    values = [f"Блок управления БУ-{n:04d}" for n in range(names)]
+    pages = (names + 4) // 5
+    out["paged_flip"] = (
+        lambda i: _paged_kb.__wrapped__(tuple(values), "recv:name", i % pages, 5),
+        lambda i: choices_paged_kb(values, "recv:name", i % pages),
+    )
+    return out
+
+
+def per_call_bytes(fn: Callable[[int], Any], calls: int) -> float:
+    tracemalloc.start()
+    total = 0
+    for i in range(calls):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(i)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / calls
+
+
+def per_call_us(fn: Callable[[int], Any], calls: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - t0) / calls * 1e6
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=200, help="названий в справочнике для paged_flip")
+    parser.add_argument("--calls", type=int, default=5000, help="вызовов на замер времени")
+    args = parser.parse_args(argv)
+
+    print(f"{'keyboard':<18}{'build µs':>10}{'cached µs':>11}{'build B':>10}{'cached B':>10}")
+    for name, (build, cached) in cases(args.names).items():
+        # Прогрев: кэш заполнен, как после первых апдейтов
+        for i in range(args.names):
+            cached(i)
+        row = (
+            per_call_us(build, args.calls),
+            per_call_us(cached, args.calls),
+            per_call_bytes(build, min(args.calls, 1000)),
+            per_call_bytes(cached, min(args.calls, 1000)),
+        )
+        print(f"{name:<18}{row[0]:>10.1f}{row[1]:>11.2f}{row[2]:>10.0f}{row[3]:>10.0f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
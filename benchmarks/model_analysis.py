@@ -0,0 +1,92 @@
+"""Замер анализа моделей (app.services.model_analysis) на синтетических файлах.
+
+    python -m benchmarks.model_analysis --triangles 1000000
+
+Генерирует во временном каталоге бинарный STL, ASCII STL и 3MF (сетка
+треугольников над плоскостью) и печатает время analyze_model() для каждого.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+
+def _grid(triangles: int):  # -> (points (n, 3), faces (m, 3))
+    import numpy as np
+
+    side = max(2, int((triangles / 2) ** 0.5) + 1)
+    xs, ys = np.meshgrid(np.arange(side, dtype=np.float64), np.arange(side, dtype=np.float64))
+    zs = np.sin(xs / 7) * np.cos(ys / 5) * 3
+    points = np.stack([xs.ravel(), ys.ravel(), zs.ravel()], axis=1)
+    idx = np.arange(side * side).reshape(side, side)
+    a, b, c, d = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel(), idx[1:, :-1].ravel(), idx[1:, 1:].ravel()
+    faces = np.concatenate([np.stack([a, b, d], axis=1), np.stack([a, d, c], axis=1)])[:triangles]
+    return points, faces
+
+
+def write_binary_stl(path: Path, points, faces) -> None:
+    import numpy as np
+
+    from app.services.model_analysis import _stl_dtype
+
+    data = np.zeros(len(faces), dtype=_stl_dtype())
+    data["v"] = points[faces].astype(np.float32)
+    with path.open("wb") as f:
+        f.write(b"\0" * 80)
+        f.write(np.uint32(len(faces)).tobytes())
+        f.write(data.tobytes())
+
+
+def write_ascii_stl(path: Path, points, faces) -> None:
+    with path.open("w", encoding="ascii") as f:
+        f.write("solid bench\n")
+        for tri in points[faces]:
+            f.write("facet normal 0 0 0\n outer loop\n")
+            for x, y, z in tri:
+                f.write(f"  vertex {x:.4f} {y:.4f} {z:.4f}\n")
+            f.write(" endloop\nendfacet\n")
+        f.write("endsolid bench\n")
+
+
+def write_3mf(path: Path, points, faces) -> None:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf, zf.open("3D/3dmodel.model", "w") as f:
+        f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n<model unit="millimeter" '
+                b'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+                b'<resources><object id="1" type="model"><mesh><vertices>')
+        f.write("".join(f'<vertex x="{x:.4f}" y="{y:.4f}" z="{z:.4f}"/>' for x, y, z in points).encode())
+        f.write(b"</vertices><triangles>")
+        f.write("".join(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>' for a, b, c in faces).encode())
+        f.write(b'</triangles></mesh></object></resources><build><item objectid="1"/></build></model>')
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--triangles", type=int, default=1_000_000)
+    parser.add_argument("--text-triangles", type=int, default=200_000, help="для ASCII STL и 3MF")
+    args = parser.parse_args(argv)
+
+    from app.services.model_analysis import analyze_model
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-model-"))
+    cases = [
+        ("binary.stl", write_binary_stl, args.triangles),
+        ("ascii.stl", write_ascii_stl, args.text_triangles),
+        ("model.3mf", write_3mf, args.text_triangles),
+    ]
+    for name, writer, triangles in cases:
+        path = tmp / name
+        writer(path, *_grid(triangles))
+        t0 = time.perf_counter()
+        stats = analyze_model(path)
+        ms = (time.perf_counter() - t0) * 1000
+        mb = path.stat().st_size / 1e6
+        print(f"{name:<11} {stats.triangles:>9} triangles, {mb:7.1f} MB: {ms:8.1f} ms "
+              f"(volume {stats.volume_mm3:.0f} mm3, area {stats.area_mm2:.0f} mm2)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
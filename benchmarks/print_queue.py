@@ -0,0 +1,80 @@
+"""Замер планировщика очереди печати (app.services.print_queue).
+
+    python -m benchmarks.print_queue --jobs 5000 --printers 20
+
+Печатает время чистого schedule() и полного assign_pending() на временной SQLite
+(выборка + пакетные UPDATE/INSERT событий), плюс makespan относительно нижней оценки.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+def bench_pure(jobs: int, printers: int, seed: int) -> None:
+    from app.services.print_queue import PendingJob, PrinterSlot, schedule
+
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    pending = [PendingJob(i, rnd.randrange(15, 600) * rnd.randrange(1, 4)) for i in range(jobs)]
+    slots = [PrinterSlot(i, f"Printer-{i}", now) for i in range(printers)]
+    t0 = time.perf_counter()
+    out = schedule(pending, slots)
+    ms = (time.perf_counter() - t0) * 1000
+    makespan = max((s.free_at - now).total_seconds() / 60 for s in slots)
+    lower = max(sum(j.minutes for j in pending) / printers, max(j.minutes for j in pending))
+    print(f"schedule(): {jobs} jobs / {printers} printers -> {len(out)} assignments in {ms:.2f} ms; "
+          f"makespan {makespan:.0f} min (lower bound {lower:.0f}, ratio {makespan / lower:.3f})")
+
+
+async def bench_db(jobs: int, printers: int, seed: int) -> None:
+    from sqlalchemy import insert
+
+    from app.db import base as db_base
+    from app.db.base import init_db, setup_engine
+    from app.db.models import PrintJob, Printer
+    from app.services.print_queue import assign_pending
+    from app.services.printers import printer_registry
+
+    rnd = random.Random(seed)
+    db = Path(tempfile.mkdtemp(prefix="bench-queue-")) / "queue.db"
+    setup_engine(f"sqlite+aiosqlite:///{db}")
+    await init_db()
+    assert db_base.async_session is not None
+    async with db_base.async_session() as session:
+        await session.execute(insert(Printer), [{"name": f"Printer-{i}", "status": "ready"} for i in range(printers)])
+        await session.execute(insert(PrintJob), [
+            {"file_id": f"f{i}", "filename": f"part_{i}.stl", "copies": rnd.randrange(1, 4),
+             "expected_time_min": rnd.randrange(15, 600), "status": "requested"}
+            for i in range(jobs)
+        ])
+        await session.commit()
+    async with db_base.async_session() as session:
+        t0 = time.perf_counter()
+        assignments, _ = await assign_pending(session)
+        await session.commit()
+        ms = (time.perf_counter() - t0) * 1000
+    print(f"assign_pending(): {len(assignments)} jobs assigned and persisted in {ms:.1f} ms")
+    await printer_registry.stop()
+    assert db_base.engine is not None
+    await db_base.engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--printers", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    bench_pure(args.jobs, args.printers, args.seed)
+    asyncio.run(bench_db(args.jobs, args.printers, args.seed))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
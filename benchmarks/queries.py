@@ -0,0 +1,277 @@
+"""Замеры «горячих» запросов из app/handlers на засеянной базе (см. benchmarks.seed).
+
+Каждый запрос выполняется так же, как в хендлере, несколько раз на случайных
+параметрах; результат (min/p50/p95/max, строк) пишется в JSON, а при указании
+--baseline печатается разница с прошлым прогоном.
+
+    python -m benchmarks.queries --db data/bench.db --out bench_queries.json
+    python -m benchmarks.queries --db data/bench.db --baseline bench_queries.json --out new.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+QueryFn = Callable[[AsyncSession, random.Random, dict[str, Any]], Awaitable[int]]
+QUERIES: dict[str, QueryFn] = {}
+# Тяжёлые запросы (полный экспорт) гоняем меньшее число раз
+HEAVY = {"export_stock", "export_all"}
+
+
+def query(name: str) -> Callable[[QueryFn], QueryFn]:
+    def deco(fn: QueryFn) -> QueryFn:
+        QUERIES[name] = fn
+        return fn
+    return deco
+
+
+@query("number_lookup")
+async def q_number_lookup(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """/unit <номер>: блоки по номеру (blocks.cmd_unit)."""
+    from app.db.queries import UNITS_BY_NUMBER
+
+    number = rnd.choice(ctx["numbers"])
+    return len((await session.execute(UNITS_BY_NUMBER, {"number": number})).all())
+
+
+@query("history_page")
+async def q_history_page(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """История блока (blocks.cb_unit_history): карточка + первая страница событий."""
+    from app.services.units import unit_card, unit_history
+
+    unit_id = rnd.choice(ctx["unit_ids"])
+    await unit_card(session, unit_id)
+    events, _ = await unit_history(session, unit_id, 0, 8)
+    return len(events)
+
+
+@query("distinct_names")
+async def q_distinct_names(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """Справочник названий при приёмке (receive.set_number)."""
+    from app.db.models import Unit
+
+    q = select(func.distinct(Unit.name)).where(Unit.name.is_not(None)).order_by(Unit.name.asc())
+    return len((await session.execute(q)).scalars().all())
+
+
+@query("distinct_types")
+async def q_distinct_types(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """Справочник типов при приёмке (receive.proceed_to_type)."""
+    from app.db.models import Unit
+
+    q = select(func.distinct(Unit.type)).where(Unit.type.is_not(None)).order_by(Unit.type.asc())
+    return len((await session.execute(q)).scalars().all())
+
+
+async def _export(session: AsyncSession, include_all: bool) -> int:
+    """Выборка данных для экспорта так же, как в services.export (без сериализации; см. benchmarks.export)."""
+    from app.services.export import iter_export_pages
+
+    rows = 0
+    async for page in iter_export_pages(session, include_all):
+        rows += len(page)
+    return rows
+
+
+@query("export_stock")
+async def q_export_stock(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    return await _export(session, include_all=False)
+
+
+@query("export_all")
+async def q_export_all(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    return await _export(session, include_all=True)
+
+
+@query("export_delta")
+async def q_export_delta(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """/export_delta: блоки, затронутые последними ~1000 событиями (без сериализации)."""
+    from app.services.export import changed_units, iter_delta_pages, last_event_id
+
+    upto = await last_event_id(session)
+    rows = 0
+    async for page in iter_delta_pages(session, await changed_units(session, max(0, upto - 1000), upto)):
+        rows += len(page)
+    return rows
+
+
+@query("machine_units")
+async def q_machine_units(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """/machine <РА> <номер>: первая страница блоков на машине (machines.show_units)."""
+    from app.services.machines import machine_units
+
+    machine, number = rnd.choice(ctx["machines"])
+    units, _ = await machine_units(session, machine, number)
+    return len(units)
+
+
+@query("machine_history")
+async def q_machine_history(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """История выдач на машину: первая и следующая страница (machines.show_history)."""
+    from app.services.machines import machine_issues
+
+    machine, number = rnd.choice(ctx["machines"])
+    issues, has_next = await machine_issues(session, machine, number)
+    if has_next:
+        issues, _ = await machine_issues(session, machine, number, issues[-1].event_id)
+    return len(issues)
+
+
+@query("repair_stats")
+async def q_repair_stats(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """/repair_stats: сводка за 30 дней из repair_stats_daily (repair.cmd_repair_stats)."""
+    from datetime import date, timedelta
+
+    from app.services.repairs import repair_stats
+
+    rows, _ = await repair_stats(session, date.today() - timedelta(days=29))
+    return len(rows)
+
+
+@query("stock_stats")
+async def q_stock_stats(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """/stats: остатки из stock_counts + события за 7 дней из unit_events_daily (stats.cmd_stats)."""
+    from datetime import datetime, timedelta
+
+    from app.services.stats import stock_stats
+
+    stats = await stock_stats(session, datetime.utcnow().date() - timedelta(days=6))
+    return len(stats.by_type) + len(stats.events)
+
+
+@query("printer_list")
+async def q_printer_list(session: AsyncSession, rnd: random.Random, ctx: dict[str, Any]) -> int:
+    """/printers (printing.list_printers): загрузка PrinterRegistry."""
+    from app.db.models import Printer
+
+    q = select(Printer.id, Printer.name, Printer.status, Printer.maintenance_until).order_by(Printer.id)
+    return len((await session.execute(q)).all())
+
+
+async def _context(session: AsyncSession, rnd: random.Random, samples: int) -> dict[str, Any]:
+    from app.db.models import PrintJob, Unit, UnitEvent
+
+    max_id = (await session.execute(select(func.max(Unit.id)))).scalar() or 0
+    ids = [rnd.randrange(1, max_id + 1) for _ in range(samples)] if max_id else []
+    numbers = (await session.execute(select(Unit.number).where(Unit.id.in_(ids)))).scalars().all() if ids else []
+    counts = {}
+    for name, model in (("units", Unit), ("unit_events", UnitEvent), ("print_jobs", PrintJob)):
+        counts[name] = (await session.execute(select(func.count()).select_from(model))).scalar() or 0
+    machines = (
+        await session.execute(
+            select(Unit.machine, Unit.machine_number)
+            .where(Unit.id.in_(ids), Unit.machine.is_not(None), Unit.machine_number.is_not(None))
+        )
+    ).all() if ids else []
+    return {
+        "unit_ids": ids or [0],
+        "numbers": list(numbers) or ["0"],
+        "machines": [tuple(m) for m in machines] or [("RA1", "0")],
+        "counts": counts,
+    }
+
+
+def _summary(times_ms: list[float], rows: int) -> dict[str, Any]:
+    ordered = sorted(times_ms)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return {
+        "runs": len(ordered),
+        "rows": rows,
+        "min_ms": round(ordered[0], 3),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(p95, 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    from app.db import base as db_base
+    from app.db.base import setup_engine
+
+    if not Path(args.db).exists():
+        raise SystemExit(f"{args.db} не найден — сначала: python -m benchmarks.seed --db {args.db}")
+    setup_engine(f"sqlite+aiosqlite:///{args.db}")
+    assert db_base.async_session is not None
+    rnd = random.Random(args.seed)
+    selected = [q for q in (args.only.split(",") if args.only else QUERIES) if q]
+    results: dict[str, Any] = {}
+    async with db_base.async_session() as session:
+        ctx = await _context(session, rnd, max(args.repeat, 10))
+    for name in selected:
+        fn = QUERIES[name]
+        runs = args.heavy_repeat if name in HEAVY else args.repeat
+        times: list[float] = []
+        rows = 0
+        try:
+            for _ in range(runs):
+                # Новая сессия на каждый прогон — как в хендлерах (без тёплой identity map)
+                async with db_base.async_session() as session:
+                    t0 = time.perf_counter()
+                    rows = await fn(session, rnd, ctx)
+                    times.append((time.perf_counter() - t0) * 1000)
+            results[name] = _summary(times, rows)
+        except Exception as exc:  # например, "too many SQL variables" на IN(...) при экспорте
+            results[name] = {"error": f"{type(exc).__name__}: {str(exc).splitlines()[0][:200]}"}
+        print(f"  {name:<16} {results[name]}", file=sys.stderr)
+    assert db_base.engine is not None
+    await db_base.engine.dispose()
+    import sqlalchemy
+
+    return {
+        "meta": {
+            "db": str(args.db),
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "sqlalchemy": sqlalchemy.__version__,
+            "counts": ctx["counts"],
+        },
+        "queries": results,
+    }
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any]) -> None:
+    print(f"{'query':<16}{'base p50':>12}{'p50':>12}{'delta':>10}")
+    for name, cur in report["queries"].items():
+        base = baseline.get("queries", {}).get(name)
+        if not base or "p50_ms" not in base or "p50_ms" not in cur:
+            print(f"{name:<16}{'-':>12}{cur.get('p50_ms', 'err'):>12}{'':>10}")
+            continue
+        delta = (cur["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100 if base["p50_ms"] else 0.0
+        print(f"{name:<16}{base['p50_ms']:>12}{cur['p50_ms']:>12}{delta:>+9.1f}%")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/bench.db")
+    parser.add_argument("--repeat", type=int, default=50, help="прогонов лёгких запросов")
+    parser.add_argument("--heavy-repeat", type=int, default=3, help="прогонов экспорта")
+    parser.add_argument("--only", default="", help="через запятую: " + ",".join(QUERIES))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args(argv)
+    unknown = set(filter(None, args.only.split(","))) - set(QUERIES)
+    if unknown:
+        parser.error(f"unknown queries: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+    else:
+        print(json.dumps(report["queries"], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""ORM-сущности против строк-моделей чтения (колонки + dataclass со slots) на засеянной базе.
+
+    python -m benchmarks.read_models --db data/bench.db
+    python -m benchmarks.read_models --db data/bench.db --page 10000 --repeat 5 --no-export
+
+Для каждого случая — лучшее время из --repeat прогонов и пик аллокаций
+(tracemalloc, отдельным прогоном): страница блоков, страница событий
+(как карточка/история, app.services.units) и чтение всей выгрузки
+(app.services.export.iter_export_pages) без записи файла.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+Case = Callable[[AsyncSession], Awaitable[int]]
+
+
+def units_page(page: int) -> tuple[Case, Case]:
+    from app.db.models import Unit
+    from app.services.units import UnitCard
+
+    async def orm(session: AsyncSession) -> int:
+        units = (await session.execute(select(Unit).order_by(Unit.id).limit(page))).scalars().all()
+        return len([(u.id, u.number, u.name, u.type, u.status, u.machine, u.machine_number) for u in units])
+
+    async def rows(session: AsyncSession) -> int:
+        q = select(
+            Unit.id, Unit.number, Unit.name, Unit.type, Unit.status, Unit.machine, Unit.machine_number
+        ).order_by(Unit.id).limit(page)
+        return len([UnitCard(*r) for r in (await session.execute(q)).all()])
+
+    return orm, rows
+
+
+def events_page(page: int) -> tuple[Case, Case]:
+    from app.db.models import UnitEvent
+    from app.services.units import HistoryEntry
+
+    async def orm(session: AsyncSession) -> int:
+        q = select(UnitEvent).order_by(UnitEvent.id.desc()).limit(page)
+        return len((await session.execute(q)).scalars().all())
+
+    async def rows(session: AsyncSession) -> int:
+        q = select(
+            UnitEvent.id, UnitEvent.timestamp, UnitEvent.event_type, UnitEvent.by_user_name,
+            UnitEvent.destination_machine, UnitEvent.destination_machine_number, UnitEvent.comment,
+        ).order_by(UnitEvent.id.desc()).limit(page)
+        return len([HistoryEntry(*r) for r in (await session.execute(q)).all()])
+
+    return orm, rows
+
+
+def full_export() -> tuple[Case, Case]:
+    from app.db.models import Unit
+    from app.services.export import PAGE_SIZE, ExportRow, _fill_meta, _unit_values, iter_export_pages
+
+    async def orm(session: AsyncSession) -> int:
+        # Прежний способ: select(Unit) страницами, ExportRow из сущностей
+        n = 0
+        after: tuple[str, str, int] | None = None
+        while True:
+            q = select(Unit)
+            if after is not None:
+                q = q.where(tuple_(Unit.number, Unit.name, Unit.id) > after)
+            q = q.order_by(Unit.number, Unit.name, Unit.id).limit(PAGE_SIZE)
+            units = (await session.execute(q)).scalars().all()
+            if not units:
+                return n
+            rows = {u.id: ExportRow(*_unit_values(u)) for u in units}
+            await _fill_meta(session, rows)
+            n += len(rows)
+            after = (units[-1].number, units[-1].name, units[-1].id)
+            session.expunge_all()
+
+    async def rows(session: AsyncSession) -> int:
+        return sum([len(page) async for page in iter_export_pages(session, True)])
+
+    return orm, rows
+
+
+async def measure(case: Case, repeat: int) -> dict[str, Any]:
+    from app.db import base as db_base
+
+    assert db_base.async_session is not None
+    best = float("inf")
+    n = 0
+    for _ in range(repeat):
+        async with db_base.async_session() as session:
+            t0 = time.perf_counter()
+            n = await case(session)
+            best = min(best, time.perf_counter() - t0)
+    async with db_base.async_session() as session:
+        tracemalloc.start()
+        await case(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"rows": n, "ms": best * 1000, "peak_kib": peak / 1024}
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app.db import base as db_base
+    from app.db.base import setup_engine
+
+    setup_engine(f"sqlite+aiosqlite:///{Path(args.db).resolve()}")
+    cases = {"units_page": units_page(args.page), "events_page": events_page(args.page)}
+    if not args.no_export:
+        cases["full_export"] = full_export()
+    print(f"{'case':<13}{'rows':>9}{'orm ms':>10}{'rows ms':>10}{'orm KiB':>11}{'rows KiB':>11}")
+    for name, (orm, rows) in cases.items():
+        a = await measure(orm, args.repeat if name != "full_export" else 1)
+        b = await measure(rows, args.repeat if name != "full_export" else 1)
+        print(f"{name:<13}{b['rows']:>9}{a['ms']:>10.1f}{b['ms']:>10.1f}{a['peak_kib']:>11.0f}{b['peak_kib']:>11.0f}")
+    assert db_base.engine is not None
+    await db_base.engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--page", type=int, default=10000, help="строк на странице")
+    parser.add_argument("--repeat", type=int, default=3, help="прогонов на случай (берётся лучший)")
+    parser.add_argument("--no-export", action="store_true", help="без чтения всей выгрузки")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
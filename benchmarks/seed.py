@@ -0,0 +1,241 @@
+"""Генератор синтетических данных склада в масштабе (до 1M блоков / 10M событий).
+
+Пишет Unit, UnitEvent, Repair, PrintJob, PrintEvent (и немного User/Printer) пакетными
+Core-вставками (executemany) чанками, не держа весь объём в памяти.
+
+    python -m benchmarks.seed --db data/bench.db --units 100000 --events 1000000
+    python -m benchmarks.seed --db data/bench.db --units 1000000 --events 10000000 --print-jobs 200000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterator
+
+from sqlalchemy import func, insert, select, text
+
+BLOCK_NAMES = [
+    "БУД", "БУК", "БУП", "БКУ", "БПР", "БСД", "БИП", "БВК", "БУМ", "БРТ",
+    "БКП", "БУС", "БРН", "БПК", "БДУ", "БЗУ", "БОС", "БУЛ", "БИС", "БЦУ",
+]
+MACHINES = ["RA1", "RA2", "RA3"]
+CONDITIONS = ["Исправный", "Не исправный", "Гарантийный", "На проверку"]
+SURNAMES = ["Иванов", "Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов", "Волков", "Соколов"]
+PRINT_MATERIALS = ["PLA", "PETG", "ABS", "TPU"]
+CHUNK = 20_000
+# executemany берёт набор колонок из первой строки пачки: у всех событий должны быть
+# одни и те же ключи, иначе comment/destination_* у части строк молча теряются
+EVENT_DEFAULTS: dict[str, Any] = {"comment": None, "destination_machine": None, "destination_machine_number": None}
+
+
+def _chunks(rows: Iterator[dict[str, Any]], size: int = CHUNK) -> Iterator[list[dict[str, Any]]]:
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Generator:
+    def __init__(self, units: int, events: int, days: int, seed: int) -> None:
+        self.rnd = random.Random(seed)
+        self.units = units
+        self.events = events
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.start = self.now - timedelta(days=days)
+        self.span_s = int((self.now - self.start).total_seconds())
+        # ~ 120 типов: у каждого названия свой набор модификаций
+        self.types = [f"750-{i:02d}.{j:02d}" for i in range(1, 25) for j in range(1, 6)]
+        # Номера повторяются между названиями; часть с буквенным суффиксом
+        self.number_space = max(units // 3, 10)
+        self.repairs: list[dict[str, Any]] = []
+
+    def _ts(self) -> datetime:
+        return self.start + timedelta(seconds=self.rnd.randrange(self.span_s))
+
+    def _number(self) -> str:
+        n = self.rnd.randrange(1, self.number_space)
+        return f"{n}{self.rnd.choice('АБВ')}" if n % 17 == 0 else str(n)
+
+    def unit_and_events(self, first_id: int, event_budget: float) -> Iterator[tuple[dict[str, Any], list[dict[str, Any]]]]:
+        """Блок + согласованная с ним цепочка событий (received → ремонты → issued)."""
+        rnd = self.rnd
+        for uid in range(first_id, first_id + self.units):
+            accepted = self._ts()
+            surname = rnd.choice(SURNAMES)
+            unit = {
+                "id": uid,
+                "number": self._number(),
+                "name": rnd.choice(BLOCK_NAMES),
+                "type": rnd.choice(self.types),
+                "status": "received",
+                "condition": rnd.choice(CONDITIONS),
+                "machine": rnd.choice(MACHINES) if rnd.random() < 0.6 else None,
+                "machine_number": f"{rnd.randrange(100, 130)}-{rnd.randrange(1, 5):02d}" if rnd.random() < 0.5 else None,
+                "accepted_at": accepted,
+                "master_surname": surname,
+                "created_at": accepted,
+            }
+            events = [{"unit_id": uid, "event_type": "received", "by_user_name": surname, "timestamp": accepted}]
+            # Сколько ещё событий: в среднем event_budget - 1 на блок
+            extra = max(0, int(rnd.expovariate(1 / max(event_budget - 1, 0.01)) + 0.5)) if event_budget > 1 else 0
+            ts = accepted
+            while extra >= 2:
+                opened = ts + timedelta(hours=rnd.randrange(1, 72))
+                closed = opened + timedelta(hours=rnd.randrange(1, 240))
+                who = rnd.choice(SURNAMES)
+                summary = "Неисправность: нет питания. Работы: замена БП"
+                events.append({"unit_id": uid, "event_type": "repair_open", "by_user_name": who, "timestamp": opened})
+                events.append({"unit_id": uid, "event_type": "repair_close", "by_user_name": who,
+                               "timestamp": closed, "comment": summary})
+                self.repairs.append({"unit_id": uid, "opened_at": opened, "closed_at": closed,
+                                     "status": "done", "summary": summary})
+                unit["status"] = "done"
+                ts = closed
+                extra -= 2
+            if extra and unit["status"] == "done":
+                machine = rnd.choice(MACHINES)
+                number = f"{rnd.randrange(100, 130)}-{rnd.randrange(1, 5):02d}"
+                events.append({"unit_id": uid, "event_type": "issued", "by_user_name": rnd.choice(SURNAMES),
+                               "timestamp": ts + timedelta(hours=rnd.randrange(1, 48)),
+                               "destination_machine": machine, "destination_machine_number": number})
+                unit.update(status="issued", machine=machine, machine_number=number)
+            yield unit, [{**EVENT_DEFAULTS, **e} for e in events]
+
+    def print_jobs(self, first_id: int, count: int, printers: list[str]) -> Iterator[tuple[dict[str, Any], list[dict[str, Any]]]]:
+        rnd = self.rnd
+        flow = ["requested", "queued", "printing", "done"]
+        for jid in range(first_id, first_id + count):
+            created = self._ts()
+            depth = rnd.choices([1, 2, 3, 4], weights=[3, 2, 1, 6])[0]
+            status = flow[depth - 1] if rnd.random() > 0.03 else "failed"
+            job = {
+                "id": jid, "user_id": None, "printer_name": rnd.choice(printers),
+                "file_id": f"bench-file-{jid}", "filename": f"part_{jid}.stl",
+                "material": rnd.choice(PRINT_MATERIALS), "copies": rnd.randrange(1, 4),
+                "expected_time_min": rnd.randrange(15, 600), "status": status, "created_at": created,
+            }
+            events = [
+                {"job_id": jid, "event_type": ev, "timestamp": created + timedelta(minutes=10 * k)}
+                for k, ev in enumerate(flow[:depth])
+            ]
+            if status == "failed":
+                events.append({"job_id": jid, "event_type": "failed", "timestamp": created + timedelta(hours=3)})
+            yield job, events
+
+
+async def seed(args: argparse.Namespace) -> dict[str, int]:
+    from app.db import base as db_base
+    from app.db.base import init_db, setup_engine
+    from app.db.models import PrintEvent, PrintJob, Printer, Repair, Unit, UnitEvent, User
+
+    Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+    setup_engine(f"sqlite+aiosqlite:///{args.db}")
+    await init_db()
+    assert db_base.engine is not None
+    gen = Generator(args.units, args.events, args.days, args.seed)
+    totals = {"units": 0, "unit_events": 0, "repairs": 0, "print_jobs": 0, "print_events": 0}
+
+    async with db_base.engine.begin() as conn:
+        # Быстрая загрузка: без fsync на каждую транзакцию
+        await conn.execute(text("PRAGMA synchronous=OFF"))
+        await conn.execute(text("PRAGMA journal_mode=MEMORY"))
+        first_unit = ((await conn.execute(select(func.max(Unit.id)))).scalar() or 0) + 1
+        first_job = ((await conn.execute(select(func.max(PrintJob.id)))).scalar() or 0) + 1
+
+        if not (await conn.execute(select(func.count()).select_from(User))).scalar():
+            await conn.execute(insert(User), [
+                {"tg_id": 900_000 + i, "full_name": f"{s} Иван", "role": "master", "status": "active"}
+                for i, s in enumerate(SURNAMES)
+            ])
+        printers = [f"Printer-{i}" for i in range(args.printers)]
+        existing = set((await conn.execute(select(Printer.name))).scalars().all())
+        new_printers = [{"name": p, "status": "ready"} for p in printers if p not in existing]
+        if new_printers:
+            await conn.execute(insert(Printer), new_printers)
+
+    budget = args.events / args.units if args.units else 0
+    t0 = time.perf_counter()
+    units_buf: list[dict[str, Any]] = []
+    events_buf: list[dict[str, Any]] = []
+
+    async def flush() -> None:
+        async with db_base.engine.begin() as conn:
+            if units_buf:
+                await conn.execute(insert(Unit), units_buf)
+            if events_buf:
+                await conn.execute(insert(UnitEvent), events_buf)
+            if gen.repairs:
+                await conn.execute(insert(Repair), gen.repairs)
+        totals["units"] += len(units_buf)
+        totals["unit_events"] += len(events_buf)
+        totals["repairs"] += len(gen.repairs)
+        units_buf.clear()
+        events_buf.clear()
+        gen.repairs.clear()
+
+    for unit, events in gen.unit_and_events(first_unit, budget):
+        units_buf.append(unit)
+        events_buf.extend(events)
+        if len(units_buf) >= CHUNK:
+            await flush()
+            print(f"\r  units {totals['units']:>9} events {totals['unit_events']:>10}", end="", file=sys.stderr)
+    await flush()
+
+    jobs_buf: list[dict[str, Any]] = []
+    pevents_buf: list[dict[str, Any]] = []
+    for job, events in gen.print_jobs(first_job, args.print_jobs, printers or ["Printer-0"]):
+        jobs_buf.append(job)
+        pevents_buf.extend(events)
+        if len(jobs_buf) >= CHUNK:
+            async with db_base.engine.begin() as conn:
+                await conn.execute(insert(PrintJob), jobs_buf)
+                await conn.execute(insert(PrintEvent), pevents_buf)
+            totals["print_jobs"] += len(jobs_buf)
+            totals["print_events"] += len(pevents_buf)
+            jobs_buf.clear()
+            pevents_buf.clear()
+    if jobs_buf:
+        async with db_base.engine.begin() as conn:
+            await conn.execute(insert(PrintJob), jobs_buf)
+            await conn.execute(insert(PrintEvent), pevents_buf)
+        totals["print_jobs"] += len(jobs_buf)
+        totals["print_events"] += len(pevents_buf)
+
+    from app.db.rollups import rebuild_repair_stats, rebuild_stock_stats
+
+    async with db_base.engine.begin() as conn:
+        # Сводки ведутся хендлерами инкрементально; после массовой вставки — пересчёт
+        await conn.run_sync(rebuild_repair_stats)
+        await conn.run_sync(rebuild_stock_stats)
+        await conn.execute(text("ANALYZE"))
+    await db_base.engine.dispose()
+    print(file=sys.stderr)
+    totals["seconds"] = round(time.perf_counter() - t0, 1)
+    return totals
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/bench.db", help="путь к файлу SQLite")
+    parser.add_argument("--units", type=int, default=100_000, help="сколько блоков добавить (до 1_000_000)")
+    parser.add_argument("--events", type=int, default=1_000_000, help="ориентировочно событий UnitEvent (до 10_000_000)")
+    parser.add_argument("--print-jobs", type=int, default=20_000)
+    parser.add_argument("--printers", type=int, default=12)
+    parser.add_argument("--days", type=int, default=3 * 365, help="глубина истории в днях")
+    parser.add_argument("--seed", type=int, default=1, help="seed генератора (детерминированные данные)")
+    args = parser.parse_args(argv)
+    totals = asyncio.run(seed(args))
+    print(", ".join(f"{k}={v}" for k, v in totals.items()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.batch_receive import parse_batch
+
+NAMES = ["БУД"]
+TYPES = ["750-05.01"]
+
+
+@pytest.mark.parametrize("sep", [";", ",", "\t"])
+def test_mixed_width_rows(sep):
+    text = "\n".join(
+        sep.join(cells)
+        for cells in (
+            ("1234", "БУД", "750-05.01", "ok"),
+            ("1235", "БУД", "750-05.01", "ok", "RA1", "105-01"),
+            ("1236", "буд", "750-05.01"),
+        )
+    )
+    result = parse_batch(text, NAMES, TYPES)
+    assert result.errors == []
+    assert [r.number for r in result.rows] == ["1234", "1235", "1236"]
+    assert result.rows[1].machine_number == "105-01"
+    assert result.rows[2].name == "БУД"  # написание из справочника
+    assert result.rows[2].condition is None
+
+
+def test_tab_three_and_four_fields():
+    result = parse_batch("1234\tБУД\t750-05.01\n1235\tБУД\t750-05.01\tok", NAMES, TYPES)
+    assert result.errors == []
+    assert [r.condition for r in result.rows] == [None, "Исправный"]
+
+
+def test_comma_header_and_quoted_comma():
+    text = 'number,name,type,condition\n1,"Блок, большой",T\n2,БУД,750-05.01,ok'
+    result = parse_batch(text, NAMES, TYPES)
+    assert result.errors == []
+    assert [r.name for r in result.rows] == ["Блок, большой", "БУД"]
+
+
+def test_semicolon_with_quoted_semicolon():
+    result = parse_batch('1;"БУД;2";750-05.01\n2;БУД;750-05.01;ok', NAMES, TYPES)
+    assert result.errors == []
+    assert result.rows[0].name == "БУД;2"
+
+
+def test_too_few_fields_reported():
+    result = parse_batch("1,2\n3,4", NAMES, TYPES)
+    assert result.rows == []
+    assert result.errors == [
+        "Строка 1: ожидается от 3 до 6 полей, получено 2",
+        "Строка 2: ожидается от 3 до 6 полей, получено 2",
+    ]
@@ -0,0 +1,179 @@
+import base64
+
+import pytest
+from aiogram.filters.callback_data import MAX_CALLBACK_LENGTH
+
+from app.keyboards import callbacks
+from app.keyboards.callbacks import (
+    CallbackTokens,
+    ChoiceAction,
+    ChoiceCb,
+    MachineCb,
+    MachineView,
+    UnitAction,
+    UnitCb,
+    is_stale,
+)
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(callbacks.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    store = CallbackTokens(ttl=60, max_size=3)
+    monkeypatch.setattr(callbacks, "callback_tokens", store)
+    return store
+
+
+# ===== varint =====
+
+
+@pytest.mark.parametrize("n", [0, 1, 127, 128, 300, 16383, 16384, 2**31, 2**63 + 5])
+def test_uint_round_trip(n):
+    out = bytearray()
+    callbacks._put_uint(out, n)
+    assert callbacks._get_uint(bytes(out), 0) == (n, len(out))
+
+
+def test_uint_sizes():
+    for n, size in ((0, 1), (127, 1), (128, 2), (16383, 2), (16384, 3)):
+        out = bytearray()
+        callbacks._put_uint(out, n)
+        assert len(out) == size
+
+
+def test_uint_rejects_negative():
+    with pytest.raises(ValueError):
+        callbacks._put_uint(bytearray(), -1)
+
+
+def test_uint_truncated():
+    with pytest.raises(ValueError, match="truncated"):
+        callbacks._get_uint(b"\x80\x80", 0)
+
+
+# ===== pack / unpack =====
+
+
+def test_docstring_example():
+    assert UnitCb(action=UnitAction.history, unit_id=123456, page=2).pack() == "u:AcDEBwI"
+
+
+@pytest.mark.parametrize(
+    "cb",
+    [
+        UnitCb(action=UnitAction.card, unit_id=0),
+        UnitCb(action=UnitAction.machine_clear, unit_id=2**40, page=999),
+        ChoiceCb(scope="recv:name", action=ChoiceAction.tgl, idx=7, page=1),
+        ChoiceCb(scope="ремонт:узел", action=ChoiceAction.done),
+        MachineCb(view=MachineView.history, machine="ЭП-2", cursor=123456789),
+    ],
+)
+def test_pack_round_trip(cb):
+    data = cb.pack()
+    assert len(data.encode()) <= MAX_CALLBACK_LENGTH
+    assert type(cb).unpack(data) == cb
+
+
+def test_pack_is_base64url_without_padding():
+    data = ChoiceCb(scope="x" * 10, action=ChoiceAction.idx, idx=300).pack()
+    prefix, _, body = data.partition(":")
+    assert prefix == "ch"
+    assert "=" not in body
+    blob = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+    assert blob[0] == 10 and blob[1:11] == b"x" * 10
+
+
+def test_unpack_rejects_other_prefix():
+    with pytest.raises(ValueError, match="prefix"):
+        ChoiceCb.unpack(UnitCb(action=UnitAction.card, unit_id=1).pack())
+
+
+@pytest.mark.parametrize("blob", [b"\x06\x01", b"\x00\x01\x00\x00", b"\x00\x80"])
+def test_unpack_rejects_bad_bytes(blob):
+    # Индекс перечисления вне диапазона, лишние байты, обрезанный varint
+    body = base64.urlsafe_b64encode(blob).rstrip(b"=").decode()
+    with pytest.raises(ValueError):
+        UnitCb.unpack(f"u:{body}")
+
+
+# ===== токены =====
+
+
+def test_long_payload_goes_through_token(clock, tokens):
+    cb = MachineCb(view=MachineView.units, machine="M" * 80, cursor=5)
+    data = cb.pack()
+    assert data.startswith("m:.")
+    assert len(data.encode()) <= MAX_CALLBACK_LENGTH
+    assert MachineCb.unpack(data) == cb
+    # Та же нагрузка — тот же токен
+    assert cb.pack() == data
+    assert len(tokens) == 1
+
+
+def test_token_expires(clock, tokens):
+    token = tokens.put("m", b"payload")
+    clock.now += 59
+    assert tokens.get("m", token) == b"payload"
+    clock.now += 1
+    assert tokens.get("m", token) is None
+    assert len(tokens) == 0
+
+
+def test_put_extends_expiry(clock, tokens):
+    token = tokens.put("m", b"payload")
+    clock.now += 50
+    assert tokens.put("m", b"payload") == token
+    clock.now += 50
+    assert tokens.get("m", token) == b"payload"
+
+
+def test_expired_tokens_pruned_on_put(clock, tokens):
+    old = tokens.put("m", b"old")
+    clock.now += 61
+    tokens.put("m", b"new")
+    assert len(tokens) == 1
+    assert tokens.get("m", old) is None
+
+
+def test_eviction_drops_oldest(clock, tokens):
+    first = tokens.put("m", b"1")
+    second = tokens.put("m", b"2")
+    tokens.put("m", b"3")
+    # Повторная выдача переносит запись в конец: вытеснится второй, а не первый
+    tokens.put("m", b"1")
+    tokens.put("m", b"4")
+    assert len(tokens) == 3
+    assert tokens.get("m", first) == b"1"
+    assert tokens.get("m", second) is None
+    # Вытесненная нагрузка получает новый токен
+    assert tokens.put("m", b"2") != second
+
+
+def test_token_bound_to_prefix(clock, tokens):
+    token = tokens.put("m", b"payload")
+    assert tokens.get("u", token) is None
+    assert tokens.get("m", token) == b"payload"
+
+
+def test_stale_button(clock, tokens):
+    data = MachineCb(view=MachineView.numbers, machine="M" * 80).pack()
+    assert not is_stale(data)
+    assert not is_stale(UnitCb(action=UnitAction.card, unit_id=1).pack())
+    clock.now += 61
+    assert is_stale(data)
+    with pytest.raises(ValueError, match="expired"):
+        MachineCb.unpack(data)
@@ -0,0 +1,126 @@
+import csv
+import gzip
+import io
+import random
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from app.services.export import DELTA_FIELDS, FORMATS, DeltaRow, ExportRow, PartWriter
+
+
+def make_rows(n: int, seed: int = 1) -> list[ExportRow]:
+    rnd = random.Random(seed)
+    # Случайные hex-строки плохо сжимаются: частей будет несколько и при gzip
+    return [
+        ExportRow(
+            id=i,
+            number=f"{i:07d}",
+            name=f"Блок <{rnd.getrandbits(64):x}> & \"{i}\"",
+            type="ЭП;тип",
+            status="in_stock",
+            machine="",
+            machine_number="",
+            accepted_at="2026-10-19T10:00:00",
+            created_at="2026-10-19T09:00:00",
+            last_repair_summary=f"{rnd.getrandbits(128):x}\nвторая строка",
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+def read_part(path, fmt: str) -> list[dict[str, str]]:
+    raw = path.read_bytes()
+    if fmt.endswith(".gz"):
+        raw = gzip.decompress(raw)  # проверяет и CRC, и длину из трейлера
+    if fmt.startswith("csv"):
+        text = raw.decode("utf-8")
+        assert text.startswith("\ufeff")
+        return list(csv.DictReader(io.StringIO(text[1:], newline=""), delimiter=";"))
+    root = ET.fromstring(raw)
+    assert root.tag == "units"
+    return [{child.tag: child.text or "" for child in unit} for unit in root]
+
+
+def write(tmp_path, fmt: str, rows, max_bytes: int, **kwargs) -> tuple[PartWriter, list]:
+    writer = PartWriter(tmp_path, "units", fmt, max_bytes, **kwargs)
+    for start in range(0, len(rows), 100):
+        writer.write(rows[start:start + 100])
+    return writer, writer.finish()
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_parts_respect_limit_and_keep_every_row(tmp_path, fmt):
+    rows = make_rows(3000)
+    max_bytes = 96 * 1024
+    writer, parts = write(tmp_path, fmt, rows, max_bytes)
+
+    assert len(parts) > 1
+    assert [p.name for p in parts] == [f"units.part{i:02d}.{fmt}" for i in range(1, len(parts) + 1)]
+    assert writer.rows == len(rows)
+    seen = []
+    for path in parts:
+        assert path.stat().st_size <= max_bytes
+        records = read_part(path, fmt)
+        assert records  # часть не бывает пустой
+        seen += records
+    assert [int(r["id"]) for r in seen] == [r.id for r in rows]
+    assert seen[5]["name"] == rows[5].name
+    assert seen[5]["last_repair_summary"] == rows[5].last_repair_summary
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_single_part_has_plain_name(tmp_path, fmt):
+    _, parts = write(tmp_path, fmt, make_rows(10), 10 * 1024 * 1024)
+    assert [p.name for p in parts] == [f"units.{fmt}"]
+    assert len(read_part(parts[0], fmt)) == 10
+    assert sorted(tmp_path.iterdir()) == parts
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_empty_export_is_header_only(tmp_path, fmt):
+    _, parts = write(tmp_path, fmt, [], 1024)
+    assert len(parts) == 1
+    assert read_part(parts[0], fmt) == []
+
+
+def test_oversized_row_gets_own_part(tmp_path):
+    rows = make_rows(3)
+    rows[1].last_repair_summary = "x" * 4000
+    _, parts = write(tmp_path, "csv", rows, 2048)
+    assert [len(read_part(p, "csv")) for p in parts] == [1, 1, 1]
+    assert parts[1].stat().st_size > 2048
+
+
+def test_small_limit_with_gzip(tmp_path):
+    # Лимит меньше шага сброса компрессора: оценка размера не должна его превысить
+    rows = make_rows(500)
+    _, parts = write(tmp_path, "xml.gz", rows, 8 * 1024)
+    assert all(p.stat().st_size <= 8 * 1024 for p in parts)
+    assert sum(len(read_part(p, "xml.gz")) for p in parts) == 500
+
+
+def test_delta_columns_and_root_attrs(tmp_path):
+    rows = [
+        DeltaRow(id=7, number="7", name="a", type="", status="issued", machine="", machine_number="",
+                 accepted_at="", created_at="", change="delete", event_id=42),
+    ]
+    _, parts = write(tmp_path, "xml", rows, 1024 * 1024, columns=DELTA_FIELDS,
+                     attrs={"after_event_id": "10", "upto_event_id": "42"})
+    root = ET.parse(parts[0]).getroot()
+    assert root.attrib == {"after_event_id": "10", "upto_event_id": "42"}
+    assert [c.tag for c in root[0]] == list(DELTA_FIELDS)
+    assert root[0].findtext("change") == "delete" and root[0].findtext("event_id") == "42"
+
+
+def test_abort_removes_parts(tmp_path):
+    writer = PartWriter(tmp_path, "units", "csv.gz", 16 * 1024)
+    writer.write(make_rows(1000))
+    assert len(writer.parts) > 1
+    writer.abort()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        PartWriter(tmp_path, "units", "json", 1024)
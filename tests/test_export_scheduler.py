@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from app.services.export_scheduler import ExportJob, ExportScheduler, parse_schedule
+
+DAY = datetime(2026, 10, 19)
+
+
+# ===== parse_schedule =====
+
+
+def test_parse_schedule_example():
+    jobs, errors = parse_schedule("stock:csv.gz@1h, all:xml.gz@03:00, delta:csv@15m")
+    assert errors == []
+    assert [(j.scope, j.fmt, j.every, j.at) for j in jobs] == [
+        ("stock", "csv.gz", timedelta(hours=1), None),
+        ("all", "xml.gz", None, time(3, 0)),
+        ("delta", "csv", timedelta(minutes=15), None),
+    ]
+    assert [j.name for j in jobs] == ["stock-csv.gz", "all-xml.gz", "delta-csv"]
+
+
+def test_parse_schedule_defaults_and_case():
+    jobs, errors = parse_schedule(" STOCK@2D ,, delta:xml @ 7:05 ")
+    assert errors == []
+    assert (jobs[0].scope, jobs[0].fmt, jobs[0].every) == ("stock", "xml", timedelta(days=2))
+    assert (jobs[1].scope, jobs[1].fmt, jobs[1].at) == ("delta", "xml", time(7, 5))
+
+
+@pytest.mark.parametrize(
+    "item",
+    ["units:csv@1h", "stock:json@1h", "stock:csv", "stock:csv@", "stock:csv@0m", "stock:csv@5s", "stock:csv@25:00"],
+)
+def test_parse_schedule_rejects(item):
+    jobs, errors = parse_schedule(f"{item}, all:csv@1h")
+    assert errors == [item]
+    assert [j.name for j in jobs] == ["all-csv"]
+
+
+def test_parse_schedule_empty():
+    assert parse_schedule("") == ([], [])
+
+
+# ===== next_run =====
+
+
+@pytest.mark.parametrize(
+    "after, expected",
+    [
+        (DAY, DAY + timedelta(minutes=15)),
+        (DAY + timedelta(minutes=14, seconds=59), DAY + timedelta(minutes=15)),
+        (DAY + timedelta(minutes=15), DAY + timedelta(minutes=30)),
+        (DAY + timedelta(hours=23, minutes=50), DAY + timedelta(days=1)),
+    ],
+)
+def test_next_run_interval_aligned_to_midnight(after, expected):
+    assert ExportJob("stock", "csv", every=timedelta(minutes=15)).next_run(after) == expected
+
+
+def test_next_run_interval_not_dividing_day():
+    job = ExportJob("stock", "csv", every=timedelta(hours=7))
+    assert job.next_run(DAY + timedelta(hours=22)) == DAY + timedelta(hours=28)
+
+
+@pytest.mark.parametrize(
+    "after, expected",
+    [
+        (DAY, DAY + timedelta(hours=3)),
+        (DAY + timedelta(hours=2, minutes=59), DAY + timedelta(hours=3)),
+        (DAY + timedelta(hours=3), DAY + timedelta(days=1, hours=3)),
+        (DAY + timedelta(hours=20), DAY + timedelta(days=1, hours=3)),
+    ],
+)
+def test_next_run_daily(after, expected):
+    assert ExportJob("all", "xml", at=time(3, 0)).next_run(after) == expected
+
+
+# ===== schedule / due =====
+
+
+def scheduler(spec: str) -> ExportScheduler:
+    s = ExportScheduler()
+    assert s.configure(spec, "unused", keep=3, max_bytes=1024) == []
+    return s
+
+
+def test_schedule_sorted_and_stable():
+    s = scheduler("all:xml@03:00, stock:csv@1h, delta:csv@15m")
+    now = DAY + timedelta(hours=2, minutes=20)
+    order = [(job.name, when) for job, when in s.schedule(now)]
+    assert order == [
+        ("delta-csv", DAY + timedelta(hours=2, minutes=30)),
+        ("all-xml", DAY + timedelta(hours=3)),
+        ("stock-csv", DAY + timedelta(hours=3)),
+    ]
+    # Назначенное время не пересчитывается, пока задание не прогнали
+    assert [when for _, when in s.schedule(now + timedelta(hours=5))] == [when for _, when in order]
+
+
+def test_due_keeps_missed_slots():
+    s = scheduler("delta:csv@15m, all:xml@03:00")
+    s.schedule(DAY)
+    assert s.due(DAY + timedelta(minutes=14)) == []
+    # Слот прошёл, пока шла чужая выгрузка: задание всё ещё ждёт, самое раннее — первым
+    late = DAY + timedelta(hours=4)
+    assert [j.name for j in s.due(late)] == ["delta-csv", "all-xml"]
+
+
+def test_run_due_moves_next_due_past_now(monkeypatch):
+    s = scheduler("delta:csv@15m")
+    (job,) = s.jobs
+    job.next_due = datetime.now() - timedelta(hours=3)
+    calls = []
+
+    async def run_job(j, when):
+        calls.append(("run", j.name, when))
+        return []
+
+    async def push(j, parts):
+        calls.append(("push", j.name))
+        return 0
+
+    monkeypatch.setattr(s, "run_job", run_job)
+    monkeypatch.setattr(s, "push", push)
+    due_at = job.next_due
+    asyncio.run(s.run_due(job))
+    assert calls == [("run", "delta-csv", due_at), ("push", "delta-csv")]
+    # Пропущенные слоты не догоняются: следующий — после текущего момента
+    assert datetime.now() < job.next_due <= datetime.now() + timedelta(minutes=15)
+
+
+def test_run_due_reschedules_after_failure(monkeypatch):
+    s = scheduler("stock:csv@1h")
+    (job,) = s.jobs
+    job.next_due = datetime.now() - timedelta(minutes=1)
+
+    async def run_job(j, when):
+        raise RuntimeError("db is gone")
+
+    monkeypatch.setattr(s, "run_job", run_job)
+    asyncio.run(s.run_due(job))
+    assert job.last_result == "ошибка"
+    assert job.next_due > datetime.now()
@@ -0,0 +1,54 @@
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from pydantic import ValidationError
+
+from app.keyboards.blocks import back_to_blocks_kb, blocks_menu_kb, export_menu_kb
+from app.keyboards.frozen import freeze
+from app.keyboards.machines import machines_kb
+from app.keyboards.main_menu import main_menu_kb
+from app.keyboards.printing import print_confirm_kb
+from app.keyboards.receive import batch_confirm_kb, choices_paged_kb, ra_kb, skip_kb, status_kb
+
+CACHED = [
+    blocks_menu_kb,
+    back_to_blocks_kb,
+    lambda: export_menu_kb("csv.gz"),
+    lambda: machines_kb(("RA1", "RA2")),
+    main_menu_kb,
+    print_confirm_kb,
+    status_kb,
+    ra_kb,
+    skip_kb,
+    batch_confirm_kb,
+    lambda: choices_paged_kb(["a", "b", "c"], "recv:name", 0),
+]
+
+
+def rows(markup):
+    return markup.inline_keyboard if isinstance(markup, InlineKeyboardMarkup) else markup.keyboard
+
+
+def sent(markup) -> str:
+    return AiohttpSession().prepare_value(markup, bot=Bot("42:TEST"), files={})
+
+
+@pytest.mark.parametrize("build", CACHED)
+def test_cached_keyboards_are_shared_and_frozen(build):
+    markup = build()
+    assert build() is markup
+    with pytest.raises(ValidationError):
+        rows(markup)[0][0].text = "changed"
+    with pytest.raises(AttributeError):
+        rows(markup)[0].append(rows(markup)[0][0])
+    with pytest.raises(ValidationError):
+        markup.inline_keyboard = [] if isinstance(markup, InlineKeyboardMarkup) else None
+
+
+def test_freeze_sends_same_payload():
+    inline = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="a", callback_data="x")]])
+    reply = ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="b")]], resize_keyboard=True)
+    assert sent(freeze(inline)) == sent(inline)
+    assert sent(freeze(reply)) == sent(reply)
+    assert "null" not in sent(freeze(inline))